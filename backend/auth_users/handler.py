@@ -4,19 +4,26 @@ Routes:
   POST /auth/login          - Login with username/password
   POST /auth/logout         - Logout (delete session)
   POST /auth/change-password - Change own password
-  GET  /users               - List all users (Admin only)
+  GET  /users               - List users, paginated and sorted (Admin only)
   POST /users               - Create user (Admin only)
   PUT  /users/{username}    - Update user (Admin only)
   DELETE /users/{username}  - Delete/disable user (Admin only)
   POST /users/{username}/reset-password - Reset password (Admin only)
+  POST /users/import        - Bulk-create users from JSON, CSV or S3 (Admin only)
 """
 
+import base64
+import binascii
+import csv
+import io
 import json
+import os
 import secrets
 import time
-import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 
-from shared import db
+from shared import access, aws, db, passwords, session_cache, tokens, user_directory
+from shared.metrics import capacity_metrics
 from shared.response import success, error
 from shared.auth_middleware import authenticate, require_auth, require_admin
 
@@ -24,9 +31,35 @@ from shared.auth_middleware import authenticate, require_auth, require_admin
 # Session TTL: 24 hours
 SESSION_TTL_SECONDS = 86400
 
+# Page size cap for GET /users?limit=
+MAX_PAGE_SIZE = 100
 
+# Attributes returned by GET /users (never pull password_hash over the wire)
+USER_LIST_ATTRIBUTES = ['username', 'role', 'status', 'created_at']
+
+ROLES = ('Admin', 'Uploader', 'Reader', 'Viewer')
+
+STORAGE_BUCKET = os.environ.get('STORAGE_BUCKET', 'file-share-storage-dev')
+
+# Bulk import limits. Imported passwords are hashed at the full policy cost
+# (dormant accounts may never log in to be rehashed); throughput comes from
+# the import function's vCPUs and the pending/resubmit path.
+IMPORT_MAX_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', '5000'))
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', str(5 * 1024 * 1024)))
+# Override of the cost for imported hashes; unset means passwords.rounds()
+IMPORT_BCRYPT_ROUNDS = int(os.environ['IMPORT_BCRYPT_ROUNDS']) if os.environ.get(
+    'IMPORT_BCRYPT_ROUNDS') else None
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', str(max(4, 2 * (os.cpu_count() or 1)))))
+# Stop starting new rows this long before the Lambda deadline
+IMPORT_RESERVE_MS = int(os.environ.get('IMPORT_RESERVE_MS', '5000'))
+
+_s3_client = None
+
+
+@capacity_metrics
 def lambda_handler(event, context):
     """Route requests to the appropriate handler."""
+    db.begin_request()
     method = event.get('httpMethod', '')
     resource = event.get('resource', '')
 
@@ -39,6 +72,7 @@ def lambda_handler(event, context):
         ('PUT', '/users/{username}'): _admin(handle_update_user),
         ('DELETE', '/users/{username}'): _admin(handle_delete_user),
         ('POST', '/users/{username}/reset-password'): _admin(handle_reset_password),
+        ('POST', '/users/import'): _admin(handle_import_users),
     }
 
     handler = routes.get((method, resource))
@@ -89,26 +123,16 @@ def handle_login(event, context):
         return error('Invalid credentials', 401)
 
     # Verify password
-    stored_hash = user['password_hash']
-    if isinstance(stored_hash, str):
-        stored_hash = stored_hash.encode('utf-8')
-    if not bcrypt.checkpw(password.encode('utf-8'), stored_hash):
+    if not passwords.verify(password, user['password_hash']):
         return error('Invalid credentials', 401)
+    if passwords.needs_rehash(user['password_hash']):
+        _rehash_password(username, password, user['password_hash'])
 
-    # Create session
-    token = secrets.token_urlsafe(32)
-    now = int(time.time())
-    session_item = {
-        'PK': f'SESSION#{token}',
-        'SK': 'SESSION',
-        'GSI1PK': f'USER#{username}',
-        'GSI1SK': f'SESSION#{token}',
-        'username': username,
-        'role': user['role'],
-        'created_at': now,
-        'ttl': now + SESSION_TTL_SECONDS,
-    }
-    db.put_item(session_item)
+    if tokens.signed_mode():
+        # Stateless: authenticate() verifies the signature, nothing is stored
+        token, _ = tokens.issue(username, user['role'], SESSION_TTL_SECONDS)
+    else:
+        token = _create_session(username, user['role'])
 
     return success({
         'token': token,
@@ -119,10 +143,17 @@ def handle_login(event, context):
 
 
 def handle_logout(event, context):
-    """Delete session from DynamoDB."""
+    """Delete session from DynamoDB.
+
+    A signed token cannot be deleted, so logout revokes all of the user's
+    signed tokens instead.
+    """
     user = event['user']
     token = user['token']
-    db.delete_item(f'SESSION#{token}', 'SESSION')
+    if not tokens.is_signed(token):
+        db.delete_item(f'SESSION#{token}', 'SESSION')
+        session_cache.forget(token)
+    session_cache.revoke_user(user['username'])
     return success({'message': 'Logged out'})
 
 
@@ -148,14 +179,11 @@ def handle_change_password(event, context):
     if not user_record:
         return error('User not found', 404)
 
-    stored_hash = user_record['password_hash']
-    if isinstance(stored_hash, str):
-        stored_hash = stored_hash.encode('utf-8')
-    if not bcrypt.checkpw(current_password.encode('utf-8'), stored_hash):
+    if not passwords.verify(current_password, user_record['password_hash']):
         return error('Current password is incorrect', 400)
 
     # Hash and update new password
-    new_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt(12)).decode('utf-8')
+    new_hash = passwords.hash_password(new_password)
     db.update_item(
         f'USER#{user["username"]}', 'PROFILE',
         'SET password_hash = :ph, force_password_change = :fpc',
@@ -183,20 +211,20 @@ def handle_create_user(event, context):
     if not username or not password or not role:
         return error('Username, password, and role are required', 400)
 
-    if role not in ('Admin', 'Uploader', 'Reader', 'Viewer'):
+    if role not in ROLES:
         return error('Role must be Admin, Uploader, Reader, or Viewer', 400)
 
     if len(password) < 8:
         return error('Password must be at least 8 characters', 400)
 
     # Hash password
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(12)).decode('utf-8')
+    password_hash = passwords.hash_password(password)
 
     now = int(time.time())
     user_item = {
         'PK': f'USER#{username}',
         'SK': 'PROFILE',
-        'GSI1PK': f'ROLE#{role}',
+        'GSI1PK': db.gsi1_key(f'ROLE#{role}', f'USER#{username}'),
         'GSI1SK': f'USER#{username}',
         'username': username,
         'password_hash': password_hash,
@@ -212,6 +240,7 @@ def handle_create_user(event, context):
         if 'ConditionalCheckFailedException' in str(e):
             return error(f'User "{username}" already exists', 409)
         raise
+    db.batch_put(user_directory.rows(user_item))
 
     return success({'message': f'User "{username}" created', 'username': username}, 201)
 
@@ -251,7 +280,7 @@ def handle_update_user(event, context):
         values[':r'] = new_role
         # Update GSI1PK for role-based queries
         update_parts.append('GSI1PK = :gsi1pk')
-        values[':gsi1pk'] = f'ROLE#{new_role}'
+        values[':gsi1pk'] = db.gsi1_key(f'ROLE#{new_role}', f'USER#{target_username}')
 
     if new_status:
         if new_status not in ('active', 'disabled'):
@@ -266,23 +295,22 @@ def handle_update_user(event, context):
 
     update_expr = 'SET ' + ', '.join(update_parts)
 
-    kwargs = {
-        'Key': {'PK': f'USER#{target_username}', 'SK': 'PROFILE'},
-        'UpdateExpression': update_expr,
-        'ExpressionAttributeValues': values,
-        'ReturnValues': 'ALL_NEW'
-    }
-    if attr_names:
-        kwargs['ExpressionAttributeNames'] = attr_names
-
-    table = db._get_table()
-    result = table.update_item(**kwargs)
+    result = db.update_item(
+        f'USER#{target_username}', 'PROFILE',
+        update_expr,
+        values,
+        expression_attr_names=attr_names or None
+    )
 
-    # If user was disabled, invalidate their sessions
+    # If user was disabled, invalidate their sessions; a new role applies to
+    # existing sessions too
     if new_status == 'disabled':
         _invalidate_user_sessions(target_username)
+    elif new_role and new_role != user_record.get('role'):
+        _update_session_roles(target_username, new_role)
 
     updated = result.get('Attributes', {})
+    user_directory.replace(user_record, updated)
     return success({
         'username': target_username,
         'role': updated.get('role'),
@@ -303,55 +331,97 @@ def handle_delete_user(event, context):
     if not user_record:
         return error(f'User "{target_username}" not found', 404)
 
-    # Delete user record
-    db.delete_item(f'USER#{target_username}', 'PROFILE')
-
-    # Invalidate all sessions
-    _invalidate_user_sessions(target_username)
-
-    # Delete all folder assignments for this user
+    # Delete the profile, all sessions and all folder assignments together
+    sessions = db.query(
+        f'USER#{target_username}',
+        sk_begins_with='SESSION#',
+        index_name='GSI1'
+    )
     assignments = db.query(
         f'USER#{target_username}',
         sk_begins_with='ASSIGN#FOLDER#',
         index_name='GSI1'
     )
-    if assignments:
-        keys_to_delete = []
-        for a in assignments:
-            keys_to_delete.append({'PK': a['PK'], 'SK': a['SK']})
-        db.batch_delete(keys_to_delete)
+    keys_to_delete = [{'PK': f'USER#{target_username}', 'SK': 'PROFILE'},
+                      access.key(target_username)] + user_directory.keys(user_record)
+    for item in sessions + assignments:
+        keys_to_delete.append({'PK': item['PK'], 'SK': item['SK']})
+    db.batch_write(deletes=keys_to_delete)
+    # The counter outlives the user until their last token has expired
+    session_cache.revoke_user(target_username, forget_after=SESSION_TTL_SECONDS)
 
     return success({'message': f'User "{target_username}" deleted'})
 
 
 def handle_list_users(event, context):
-    """List all users (Admin only)."""
+    """List users (Admin only).
+
+    Optional query params: role, status, prefix (username), sort (username
+    or created_at), order (asc or desc), limit and next_token. Without a
+    limit, all matching users are returned in one response. Reads come from
+    the user directory (shared.user_directory), or from the role's GSI1
+    partition when a role is given and users are sorted by name.
+    """
     query_params = event.get('queryStringParameters') or {}
     role_filter = query_params.get('role')
     status_filter = query_params.get('status')
+    prefix = query_params.get('prefix') or None
+    sort = query_params.get('sort') or 'username'
+    order = query_params.get('order') or 'asc'
 
-    if role_filter:
-        # Query GSI1 for specific role
-        items = db.query(f'ROLE#{role_filter}', index_name='GSI1')
-    else:
-        # Scan for all users (filter by SK=PROFILE)
-        from boto3.dynamodb.conditions import Attr
-        items = db.scan(filter_expression=Attr('SK').eq('PROFILE'))
-
-    users = []
-    for item in items:
-        if item.get('SK') != 'PROFILE':
-            continue
-        if status_filter and item.get('status') != status_filter:
-            continue
-        users.append({
-            'username': item.get('username'),
-            'role': item.get('role'),
-            'status': item.get('status'),
-            'created_at': item.get('created_at'),
-        })
-
-    return success({'users': users})
+    try:
+        limit = db.parse_limit(query_params.get('limit'), MAX_PAGE_SIZE)
+    except ValueError:
+        return error('limit must be a positive integer', 400)
+    next_token = query_params.get('next_token')
+
+    if sort not in user_directory.SORTS:
+        return error('sort must be username or created_at', 400)
+    if order not in ('asc', 'desc'):
+        return error('order must be asc or desc', 400)
+    if status_filter and status_filter not in user_directory.STATUSES:
+        return error('Status must be active or disabled', 400)
+    if prefix and sort != 'username':
+        return error('prefix can only be used with sort=username', 400)
+
+    from boto3.dynamodb.conditions import Attr
+    try:
+        if role_filter and sort == 'username':
+            # Query GSI1 for specific role (sorted by USER#<username>)
+            pk = f'ROLE#{role_filter}'
+            filter_expression = Attr('status').eq(status_filter) if status_filter else None
+            sk_prefix = f'USER#{prefix}' if prefix else None
+            if limit:
+                items, next_token = db.query_page(
+                    pk, sk_begins_with=sk_prefix, index_name='GSI1',
+                    filter_expression=filter_expression, attributes=USER_LIST_ATTRIBUTES,
+                    limit=limit, scan_forward=order == 'asc', start_token=next_token)
+            else:
+                items = db.iter_query(
+                    pk, sk_begins_with=sk_prefix, index_name='GSI1',
+                    filter_expression=filter_expression, attributes=USER_LIST_ATTRIBUTES,
+                    scan_forward=order == 'asc')
+        else:
+            # 'role' is a DynamoDB reserved word; boto3 aliases it
+            items, next_token = user_directory.page(
+                status=status_filter, sort=sort, prefix=prefix,
+                descending=order == 'desc',
+                filter_expression=Attr('role').eq(role_filter) if role_filter else None,
+                limit=limit, start_token=next_token)
+    except ValueError:
+        return error('Invalid next_token', 400)
+
+    users = [{
+        'username': item.get('username'),
+        'role': item.get('role'),
+        'status': item.get('status'),
+        'created_at': item.get('created_at'),
+    } for item in items]
+
+    body = {'users': users}
+    if limit:
+        body['next_token'] = next_token
+    return success(body)
 
 
 def handle_reset_password(event, context):
@@ -365,7 +435,7 @@ def handle_reset_password(event, context):
 
     # Generate temp password
     temp_password = secrets.token_urlsafe(12)
-    password_hash = bcrypt.hashpw(temp_password.encode('utf-8'), bcrypt.gensalt(12)).decode('utf-8')
+    password_hash = passwords.hash_password(temp_password)
 
     db.update_item(
         f'USER#{target_username}', 'PROFILE',
@@ -379,12 +449,262 @@ def handle_reset_password(event, context):
     })
 
 
+# ============================================================
+# Bulk import
+# ============================================================
+
+def handle_import_users(event, context):
+    """Create many users at once (Admin only).
+
+    The body is {"users": [{username, password, role, folders}]}, CSV
+    (Content-Type: text/csv, columns username,password,role,folders with
+    folders separated by ';'), or {"s3_key": ...} naming a .csv or .json
+    object in the storage bucket. Every row is validated, and checked for
+    existing users and unknown folders, before any password is hashed.
+
+    Rows are hashed and written on IMPORT_WORKERS threads. Rows not started
+    by IMPORT_RESERVE_MS before the deadline come back as "pending"; the
+    import is safe to resubmit, since existing users are reported, not
+    overwritten.
+    """
+    rows, message = _read_import_rows(event)
+    if message:
+        return error(message, 400)
+    if not rows:
+        return error('No users to import', 400)
+    if len(rows) > IMPORT_MAX_ROWS:
+        return error(f'At most {IMPORT_MAX_ROWS} users can be imported at once', 400)
+
+    results = []
+    candidates = []
+    seen = set()
+    for number, row in enumerate(rows, start=1):
+        result, user = _check_import_row(number, row, seen)
+        results.append(result)
+        if user:
+            candidates.append((result, user))
+
+    # Existing users and unknown folders, one BatchGetItem per 100 keys
+    profiles = db.get_items([(f'USER#{user["username"]}', 'PROFILE') for _, user in candidates])
+    folder_ids = sorted({fid for _, user in candidates for fid in user['folders']})
+    found = {fid for fid, folder in zip(folder_ids, db.get_items(
+        [(f'FOLDER#{fid}', 'META') for fid in folder_ids])) if folder}
+    ready = []
+    for (result, user), profile in zip(candidates, profiles):
+        missing = [fid for fid in user['folders'] if fid not in found]
+        if profile:
+            result.update(status='exists', error='User already exists')
+        elif missing:
+            result.update(status='invalid', error=f'Folder "{missing[0]}" not found')
+        else:
+            ready.append((result, user))
+
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    deadline = (time.monotonic() + (remaining() - IMPORT_RESERVE_MS) / 1000
+                if remaining else None)
+    now = int(time.time())
+    directory_rows = []
+
+    def create(job):
+        result, user = job
+        if deadline is not None and time.monotonic() > deadline:
+            result.update(status='pending', error='Not processed before the time limit')
+            return
+        username = user['username']
+        item = {
+            'PK': f'USER#{username}',
+            'SK': 'PROFILE',
+            'GSI1PK': db.gsi1_key(f'ROLE#{user["role"]}', f'USER#{username}'),
+            'GSI1SK': f'USER#{username}',
+            'username': username,
+            'password_hash': passwords.hash_password(user['password'], IMPORT_BCRYPT_ROUNDS),
+            'role': user['role'],
+            'status': 'active',
+            'force_password_change': True,
+            'created_at': now,
+        }
+        try:
+            db.put_item(item, condition_expression='attribute_not_exists(PK)')
+        except Exception as e:
+            if 'ConditionalCheckFailedException' in str(e):
+                result.update(status='exists', error='User already exists')
+                return
+            raise
+        result['status'] = 'created'
+        directory_rows.extend(user_directory.rows(item))
+        if user['folders']:
+            # A user of the same name may have left an access set behind
+            access.invalidate(username)
+
+    if ready:
+        with ThreadPoolExecutor(max_workers=min(IMPORT_WORKERS, len(ready))) as pool:
+            list(pool.map(create, ready))
+
+    assignments = [{
+        'PK': f'FOLDER#{fid}',
+        'SK': f'ASSIGN#{user["username"]}',
+        'GSI1PK': f'USER#{user["username"]}',
+        'GSI1SK': f'ASSIGN#FOLDER#{fid}',
+        'username': user['username'],
+        'folder_id': fid,
+        'assigned_at': now,
+    } for result, user in ready if result['status'] == 'created' for fid in user['folders']]
+    db.batch_put(directory_rows + assignments)
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return success({'summary': summary, 'assignments': len(assignments), 'results': results})
+
+
+def _check_import_row(number, row, seen):
+    """Validate one import row: (result, user) with user None if it is rejected."""
+    username = str(row.get('username') or '').strip()
+    result = {'row': number, 'username': username}
+    password = row.get('password') or ''
+    role = row.get('role') or ''
+    folders = row.get('folders') or []
+    if isinstance(folders, str):
+        folders = [fid.strip() for fid in folders.split(';') if fid.strip()]
+
+    if not username or not password or not role:
+        message = 'Username, password, and role are required'
+    elif not isinstance(password, str) or len(password) < 8:
+        message = 'Password must be at least 8 characters'
+    elif role not in ROLES:
+        message = 'Role must be Admin, Uploader, Reader, or Viewer'
+    elif not isinstance(folders, list) or not all(isinstance(f, str) for f in folders):
+        message = 'folders must be a list of folder IDs'
+    elif username in seen:
+        result.update(status='duplicate', error='Username appears earlier in the import')
+        return result, None
+    else:
+        seen.add(username)
+        return result, {'username': username, 'password': password, 'role': role,
+                        'folders': list(dict.fromkeys(folders))}
+    result.update(status='invalid', error=message)
+    return result, None
+
+
+def _read_import_rows(event):
+    """Rows from the request body or the S3 object it names: (rows, error message)."""
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        try:
+            body = base64.b64decode(body, validate=True).decode('utf-8')
+        except (binascii.Error, UnicodeDecodeError):
+            return None, 'Body is not valid base64-encoded UTF-8'
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    if headers.get('content-type', '').startswith('text/csv'):
+        return _parse_import_csv(body), None
+
+    try:
+        data = json.loads(body or '{}')
+    except json.JSONDecodeError:
+        return None, 'Invalid JSON'
+    if not isinstance(data, dict):
+        return None, 'Body must be a JSON object'
+    if data.get('s3_key'):
+        return _read_import_object(str(data['s3_key']))
+    return _import_json_rows(data.get('users'))
+
+
+def _read_import_object(key):
+    """Rows from a .csv or .json object in the storage bucket."""
+    s3 = _get_s3()
+    try:
+        head = s3.head_object(Bucket=STORAGE_BUCKET, Key=key)
+    except Exception:
+        return None, f'Import file "{key}" not found'
+    if head['ContentLength'] > IMPORT_MAX_BYTES:
+        return None, f'Import file is larger than {IMPORT_MAX_BYTES} bytes'
+    try:
+        text = s3.get_object(Bucket=STORAGE_BUCKET, Key=key)['Body'].read().decode('utf-8')
+    except UnicodeDecodeError:
+        return None, f'Import file "{key}" is not UTF-8 text'
+    if key.lower().endswith('.csv'):
+        return _parse_import_csv(text), None
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None, 'Import file is not valid JSON or CSV'
+    return _import_json_rows(data.get('users') if isinstance(data, dict) else data)
+
+
+def _import_json_rows(users):
+    if not isinstance(users, list) or not all(isinstance(u, dict) for u in users):
+        return None, 'users must be a list of objects'
+    return users, None
+
+
+def _parse_import_csv(text):
+    rows = []
+    for row in csv.DictReader(io.StringIO(text)):
+        # Extra cells land under None; passwords are taken verbatim
+        fields = {name.strip().lower(): value or '' for name, value in row.items() if name}
+        rows.append({name: value if name == 'password' else value.strip()
+                     for name, value in fields.items()})
+    return rows
+
+
+def _get_s3():
+    """Lazy-init S3 client."""
+    global _s3_client
+    if _s3_client is None:
+        s3_endpoint = os.environ.get('S3_ENDPOINT')
+        if s3_endpoint:
+            # Local testing with MinIO
+            _s3_client = aws.get_client(
+                's3', endpoint_url=s3_endpoint,
+                access_key=os.environ.get('S3_ACCESS_KEY', 'minioadmin'),
+                secret_key=os.environ.get('S3_SECRET_KEY', 'minioadmin'),
+            )
+        else:
+            _s3_client = aws.get_client('s3')
+    return _s3_client
+
+
 # ============================================================
 # Helper functions
 # ============================================================
 
+def _rehash_password(username, password, old_hash):
+    """Re-hash a just-verified password at the current cost.
+
+    Conditional on the old hash, so a concurrent password change wins.
+    """
+    try:
+        db.update_item(
+            f'USER#{username}', 'PROFILE',
+            'SET password_hash = :ph',
+            {':ph': passwords.hash_password(password), ':old': old_hash},
+            condition_expression='password_hash = :old'
+        )
+    except Exception as e:
+        if 'ConditionalCheckFailedException' not in str(e):
+            raise
+
+
+def _create_session(username, role):
+    """Store a new opaque session and return its token."""
+    token = secrets.token_urlsafe(32)
+    now = int(time.time())
+    session_item = {
+        'PK': f'SESSION#{token}',
+        'SK': 'SESSION',
+        'GSI1PK': f'USER#{username}',
+        'GSI1SK': f'SESSION#{token}',
+        'username': username,
+        'role': role,
+        'created_at': now,
+        'ttl': now + SESSION_TTL_SECONDS,
+    }
+    db.put_item(session_item)
+    return token
+
+
 def _invalidate_user_sessions(username):
-    """Delete all sessions for a given user."""
+    """Delete all sessions for a given user, including cached copies."""
     sessions = db.query(
         f'USER#{username}',
         sk_begins_with='SESSION#',
@@ -393,3 +713,16 @@ def _invalidate_user_sessions(username):
     if sessions:
         keys_to_delete = [{'PK': s['PK'], 'SK': s['SK']} for s in sessions]
         db.batch_delete(keys_to_delete)
+    session_cache.revoke_user(username)
+
+
+def _update_session_roles(username, role):
+    """Rewrite a user's sessions with a new role and drop them from session caches."""
+    sessions = db.query(
+        f'USER#{username}',
+        sk_begins_with='SESSION#',
+        index_name='GSI1'
+    )
+    if sessions:
+        db.batch_put([dict(s, role=role) for s in sessions])
+    session_cache.revoke_user(username)
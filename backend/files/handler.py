@@ -9,14 +9,14 @@ Routes:
   GET    /files/search              - Search files (Unit 5)
 """
 
+import itertools
 import json
 import os
 import time
 import uuid
 
-import boto3
-
-from shared import db
+from shared import access, aws, db, folder_cache
+from shared.metrics import capacity_metrics
 from shared.response import success, error
 from shared.auth_middleware import require_auth, require_admin, check_folder_access
 
@@ -25,6 +25,11 @@ STORAGE_BUCKET = os.environ.get('STORAGE_BUCKET', 'file-share-storage-dev')
 UPLOAD_URL_TTL = int(os.environ.get('UPLOAD_URL_TTL', '900'))
 DOWNLOAD_URL_TTL = int(os.environ.get('DOWNLOAD_URL_TTL', '900'))
 MAX_FILE_SIZE = 1 * 1024 * 1024 * 1024  # 1 GB
+MAX_SEARCH_LIMIT = 500
+
+# Attributes needed to render a search result
+SEARCH_ATTRIBUTES = ['file_id', 'file_name', 'file_size', 'uploaded_by',
+                     'uploaded_at', 'folder_id']
 
 _s3_client = None
 
@@ -36,19 +41,20 @@ def _get_s3():
         s3_endpoint = os.environ.get('S3_ENDPOINT')
         if s3_endpoint:
             # Local testing with MinIO
-            session = boto3.Session(
-                aws_access_key_id=os.environ.get('S3_ACCESS_KEY', 'minioadmin'),
-                aws_secret_access_key=os.environ.get('S3_SECRET_KEY', 'minioadmin'),
-                region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+            _s3_client = aws.get_client(
+                's3', endpoint_url=s3_endpoint,
+                access_key=os.environ.get('S3_ACCESS_KEY', 'minioadmin'),
+                secret_key=os.environ.get('S3_SECRET_KEY', 'minioadmin'),
             )
-            _s3_client = session.client('s3', endpoint_url=s3_endpoint)
         else:
-            _s3_client = boto3.client('s3')
+            _s3_client = aws.get_client('s3')
     return _s3_client
 
 
+@capacity_metrics
 def lambda_handler(event, context):
     """Route requests to the appropriate handler."""
+    db.begin_request()
     method = event.get('httpMethod', '')
     resource = event.get('resource', '')
 
@@ -85,7 +91,7 @@ def handle_list_files(event, context):
     folder_id = event.get('pathParameters', {}).get('folderId', '')
 
     # Check folder exists
-    folder = db.get_item(f'FOLDER#{folder_id}', 'META')
+    folder = folder_cache.get(folder_id)
     if not folder:
         return error('Folder not found', 404)
 
@@ -135,7 +141,7 @@ def handle_get_upload_url(event, context):
         return error('Forbidden', 403)
 
     # Check folder access
-    folder = db.get_item(f'FOLDER#{folder_id}', 'META')
+    folder = folder_cache.get(folder_id)
     if not folder:
         return error('Folder not found', 404)
 
@@ -310,76 +316,83 @@ def handle_search_files(event, context):
 
     query_lower = query.lower()
 
+    try:
+        limit = db.parse_limit(query_params.get('limit'), MAX_SEARCH_LIMIT)
+    except ValueError:
+        return error('limit must be a positive integer', 400)
+
     if user['role'] == 'Admin':
-        # Admin: search all files via scan
+        # Admin: search all files via scan, streamed page by page
         from boto3.dynamodb.conditions import Attr
-        all_items = db.scan(
-            filter_expression=Attr('SK').begins_with('FILE#')
+        all_items = db.iter_scan(
+            filter_expression=Attr('SK').begins_with('FILE#'),
+            attributes=SEARCH_ATTRIBUTES
         )
     else:
         # Non-admin: only search files in accessible folders
-        assignments = db.query(
-            f'USER#{user["username"]}',
-            sk_begins_with='ASSIGN#FOLDER#',
-            index_name='GSI1'
-        )
-        accessible_ids = set()
-        for a in assignments:
-            parts = a['GSI1SK'].split('#')
-            if len(parts) >= 3:
-                fid = parts[2]
-                _collect_folder_ids(fid, accessible_ids)
+        accessible_ids = sorted(access.folder_ids(user['username']))
 
         if not accessible_ids:
             return success({'files': [], 'query': query})
 
-        # Query files from each accessible folder
-        all_items = []
-        for fid in accessible_ids:
-            items = db.query(f'FOLDER#{fid}', sk_begins_with='FILE#')
-            all_items.extend(items)
+        # Query files from each accessible folder, lazily
+        all_items = itertools.chain.from_iterable(
+            db.iter_query(f'FOLDER#{fid}', sk_begins_with='FILE#',
+                          attributes=SEARCH_ATTRIBUTES)
+            for fid in accessible_ids
+        )
+
+    # Filter by name (case-insensitive partial match); stop reading one
+    # match past `limit` so we can tell whether results were truncated
+    matches = (item for item in all_items
+               if query_lower in item.get('file_name', '').lower())
+    matches = list(itertools.islice(matches, limit + 1 if limit else None))
+    truncated = bool(limit) and len(matches) > limit
+    if truncated:
+        matches = matches[:limit]
+
+    # Load every folder on the matched paths up front, one batch per level
+    _prefetch_folder_chains({item.get('folder_id', '') for item in matches})
 
-    # Filter by name (case-insensitive partial match)
     results = []
-    for item in all_items:
-        file_name = item.get('file_name', '')
-        if query_lower in file_name.lower():
-            folder_id = item.get('folder_id', '')
-            results.append({
-                'file_id': item.get('file_id'),
-                'name': file_name,
-                'size': item.get('file_size'),
-                'uploaded_by': item.get('uploaded_by'),
-                'uploaded_at': item.get('uploaded_at'),
-                'folder_id': folder_id,
-                'folder_path': _get_folder_path(folder_id),
-            })
-
-    return success({'files': results, 'query': query})
-
-
-def _collect_folder_ids(folder_id, result_set):
-    """Collect a folder ID and all its descendant IDs."""
-    if folder_id in result_set:
-        return
-    result_set.add(folder_id)
-    children = db.query(f'PARENT#{folder_id}', index_name='GSI1')
-    for child in children:
-        if child.get('SK') == 'META':
-            child_id = child['PK'].replace('FOLDER#', '')
-            _collect_folder_ids(child_id, result_set)
+    for item in matches:
+        folder_id = item.get('folder_id', '')
+        results.append({
+            'file_id': item.get('file_id'),
+            'name': item.get('file_name', ''),
+            'size': item.get('file_size'),
+            'uploaded_by': item.get('uploaded_by'),
+            'uploaded_at': item.get('uploaded_at'),
+            'folder_id': folder_id,
+            'folder_path': _get_folder_path(folder_id),
+        })
+
+    body = {'files': results, 'query': query}
+    if limit:
+        body['truncated'] = truncated
+    return success(body)
+
+
+def _prefetch_folder_chains(folder_ids):
+    """Batch-load folders and any ancestors their paths need, one BatchGetItem per level.
+
+    Folders storing their ancestor chain need nothing more; older ones pull
+    in their parents. Folders already in the folder cache cost nothing, and
+    subsequent _get_folder_path calls are served from the cache.
+    """
+    seen = set()
+    pending = set(folder_ids) - {'', 'ROOT'}
+    while pending:
+        seen |= pending
+        folders = folder_cache.get_many(pending)
+        pending = {f.get('parent_id') for f in folders
+                   if f and 'ancestor_ids' not in f} - seen - {None, '', 'ROOT'}
 
 
 def _get_folder_path(folder_id):
-    """Build a folder path string by walking up the parent chain."""
-    parts = []
-    current_id = folder_id
-    visited = set()
-    while current_id and current_id != 'ROOT' and current_id not in visited:
-        visited.add(current_id)
-        folder = db.get_item(f'FOLDER#{current_id}', 'META')
-        if not folder:
-            break
-        parts.insert(0, folder.get('name', current_id))
-        current_id = folder.get('parent_id')
-    return '/' + '/'.join(parts) if parts else '/'
+    """Build a folder path string from the folder's stored ancestor names."""
+    folder = folder_cache.get(folder_id) if folder_id and folder_id != 'ROOT' else None
+    if not folder:
+        return '/'
+    _, names = folder_cache.ancestry(folder)
+    return '/' + '/'.join(names + [folder.get('name', folder_id)])
@@ -2,36 +2,71 @@
 
 Routes:
   GET    /folders                                - List folders (filtered by role)
+  GET    /folders/{folderId}/children             - One level of folders, by name (or ROOT)
   POST   /folders                                - Create folder (Admin only)
   PUT    /folders/{folderId}                     - Rename folder (Admin only)
-  DELETE /folders/{folderId}                     - Delete folder + cascade (Admin only)
+  DELETE /folders/{folderId}                     - Delete folder + cascade, S3 objects too (Admin only)
   GET    /folders/{folderId}/assignments          - List assignments (Admin only)
   POST   /folders/{folderId}/assignments          - Assign users (Admin only)
   DELETE /folders/{folderId}/assignments/{username} - Unassign user (Admin only)
+  POST   /folders/assignments                    - Assign/unassign users x folders in bulk (Admin only)
 """
 
 import json
+import os
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-from shared import db
+from shared import (access, aws, closure, db, folder_cache, folder_children,
+                    traversal)
+from shared.metrics import capacity_metrics
 from shared.response import success, error
 from shared.auth_middleware import require_auth, require_admin
 
 
+STORAGE_BUCKET = os.environ.get('STORAGE_BUCKET', 'file-share-storage-dev')
+
+# Page size (default and cap) for GET /folders/{folderId}/children
+MAX_CHILDREN_PAGE = 200
+
+# Folders read and deleted together in one cascade step
+CASCADE_STEP_FOLDERS = int(os.environ.get('CASCADE_STEP_FOLDERS', '50'))
+# Stop starting new cascade steps this long before the Lambda deadline
+CASCADE_RESERVE_MS = int(os.environ.get('CASCADE_RESERVE_MS', '5000'))
+# Unfinished cascade checkpoints expire after this long
+CASCADE_CHECKPOINT_TTL = 7 * 24 * 3600
+# Tries at renaming a folder whose child count keeps changing underneath it
+RENAME_ATTEMPTS = 3
+
+# Most user x folder pairs one POST /folders/assignments may name
+MAX_ASSIGNMENT_PAIRS = int(os.environ.get('MAX_ASSIGNMENT_PAIRS', '10000'))
+ASSIGNMENT_ACTIONS = ('assign', 'unassign')
+
+# Keys per S3 DeleteObjects call (the API's maximum)
+S3_DELETE_BATCH = 1000
+CASCADE_COUNTS = ('folders', 'files', 'items', 'objects', 'objects_failed')
+
+_s3_client = None
+
+
+@capacity_metrics
 def lambda_handler(event, context):
     """Route requests to the appropriate handler."""
+    db.begin_request()
     method = event.get('httpMethod', '')
     resource = event.get('resource', '')
 
     routes = {
         ('GET', '/folders'): _auth(handle_list_folders),
+        ('GET', '/folders/{folderId}/children'): _auth(handle_list_children),
         ('POST', '/folders'): _admin(handle_create_folder),
         ('PUT', '/folders/{folderId}'): _admin(handle_update_folder),
         ('DELETE', '/folders/{folderId}'): _admin(handle_delete_folder),
         ('GET', '/folders/{folderId}/assignments'): _admin(handle_list_assignments),
         ('POST', '/folders/{folderId}/assignments'): _admin(handle_assign_users),
         ('DELETE', '/folders/{folderId}/assignments/{username}'): _admin(handle_unassign_user),
+        ('POST', '/folders/assignments'): _admin(handle_bulk_assignments),
     }
 
     handler = routes.get((method, resource))
@@ -52,6 +87,23 @@ def _admin(handler):
     return require_auth(require_admin(handler))
 
 
+def _get_s3():
+    """Lazy-init S3 client."""
+    global _s3_client
+    if _s3_client is None:
+        s3_endpoint = os.environ.get('S3_ENDPOINT')
+        if s3_endpoint:
+            # Local testing with MinIO
+            _s3_client = aws.get_client(
+                's3', endpoint_url=s3_endpoint,
+                access_key=os.environ.get('S3_ACCESS_KEY', 'minioadmin'),
+                secret_key=os.environ.get('S3_SECRET_KEY', 'minioadmin'),
+            )
+        else:
+            _s3_client = aws.get_client('s3')
+    return _s3_client
+
+
 # ============================================================
 # Folder CRUD handlers
 # ============================================================
@@ -69,30 +121,64 @@ def handle_create_folder(event, context):
     if not name:
         return error('Folder name is required', 400)
 
-    # Validate parent exists (if not ROOT)
+    # Validate parent exists (if not ROOT) and extend its ancestor chain
+    ancestor_ids, ancestor_names = [], []
+    parent = None
     if parent_id != 'ROOT':
         parent = db.get_item(f'FOLDER#{parent_id}', 'META')
         if not parent:
             return error('Parent folder not found', 404)
+        ancestor_ids, ancestor_names = folder_cache.ancestry(parent)
+        ancestor_ids.append(parent_id)
+        ancestor_names.append(parent.get('name'))
 
-    # Check for duplicate name at same level
-    siblings = db.query(f'PARENT#{parent_id}', index_name='GSI1')
-    for sibling in siblings:
-        if sibling.get('SK') == 'META' and sibling.get('name') == name:
-            return error(f'A folder named "{name}" already exists at this level', 409)
+    # Siblings from before the listing-row backfill may hold no claim
+    if not folder_children.migrated() and folder_children.legacy_conflict(parent_id, name):
+        return error(f'A folder named "{name}" already exists at this level', 409)
 
     folder_id = str(uuid.uuid4())[:8]
     now = int(time.time())
     folder_item = {
         'PK': f'FOLDER#{folder_id}',
         'SK': 'META',
-        'GSI1PK': f'PARENT#{parent_id}',
+        'GSI1PK': db.gsi1_key(f'PARENT#{parent_id}', f'FOLDER#{folder_id}'),
         'GSI1SK': f'FOLDER#{folder_id}',
         'name': name,
         'parent_id': parent_id,
+        'ancestor_ids': ancestor_ids,
+        'ancestor_names': ancestor_names,
         'created_at': now,
     }
-    db.put_item(folder_item)
+    # The listing row claims the name among its siblings, in the same
+    # transaction as the folder (and a check that the parent still exists).
+    # Its closure rows go in too, ROOT row first, as many as the transaction
+    # takes, so the folder is never committed without them.
+    actions = [
+        {'Put': {'Item': folder_item, 'ConditionExpression': 'attribute_not_exists(PK)'}},
+        folder_children.claim(folder_item),
+    ]
+    if parent:
+        actions.append({'ConditionCheck': {
+            'Key': {'PK': parent['PK'], 'SK': 'META'},
+            'ConditionExpression': 'attribute_exists(PK)'}})
+    closure_rows = closure.rows(folder_id, ancestor_ids, folder_item)
+    room = db.TRANSACT_WRITE_LIMIT - len(actions)
+    actions.extend({'Put': {'Item': row}} for row in closure_rows[:room])
+    try:
+        db.transact_write(actions)
+    except Exception as e:
+        reasons = db.cancellation_reasons(e)
+        if reasons[1:2] == ['ConditionalCheckFailed']:
+            return error(f'A folder named "{name}" already exists at this level', 409)
+        if reasons[2:3] == ['ConditionalCheckFailed']:
+            return error('Parent folder not found', 404)
+        raise
+    if closure_rows[room:]:
+        db.batch_put(closure_rows[room:])
+    folder_children.adjust_count(parent, 1)
+    folder_cache.bump_generation()
+    # Only users assigned at or above the parent can reach the new folder
+    access.invalidate_many(access.assigned_users(ancestor_ids))
 
     return success({
         'folder_id': folder_id,
@@ -120,22 +206,34 @@ def handle_update_folder(event, context):
         return error('Folder not found', 404)
 
     parent_id = folder.get('parent_id', 'ROOT')
-
-    # Check for sibling name conflict
-    siblings = db.query(f'PARENT#{parent_id}', index_name='GSI1')
-    for sibling in siblings:
-        if (sibling.get('SK') == 'META'
-                and sibling.get('name') == new_name
-                and sibling.get('PK') != f'FOLDER#{folder_id}'):
-            return error(f'A folder named "{new_name}" already exists at this level', 409)
-
-    # Update name ('name' is a DynamoDB reserved word)
-    db.update_item(
-        f'FOLDER#{folder_id}', 'META',
-        'SET #n = :n',
-        {':n': new_name},
-        expression_attr_names={'#n': 'name'}
-    )
+    if (not folder_children.migrated()
+            and folder_children.legacy_conflict(parent_id, new_name, folder_id)):
+        return error(f'A folder named "{new_name}" already exists at this level', 409)
+
+    # Rename and move the name's claim in one transaction ('name' is a
+    # DynamoDB reserved word). A race on the old row's child_count is retried.
+    for attempt in range(RENAME_ATTEMPTS):
+        actions = [{'Update': {
+            'Key': {'PK': f'FOLDER#{folder_id}', 'SK': 'META'},
+            'UpdateExpression': 'SET #n = :n',
+            'ExpressionAttributeNames': {'#n': 'name'},
+            'ExpressionAttributeValues': {':n': new_name},
+            'ConditionExpression': 'attribute_exists(PK)'}}]
+        actions.extend(folder_children.rename_actions(folder, new_name))
+        try:
+            db.transact_write(actions)
+            break
+        except Exception as e:
+            reasons = db.cancellation_reasons(e)
+            if reasons[:1] == ['ConditionalCheckFailed']:
+                return error('Folder not found', 404)
+            if reasons[1:2] == ['ConditionalCheckFailed']:
+                return error(f'A folder named "{new_name}" already exists at this level', 409)
+            if reasons[2:3] != ['ConditionalCheckFailed'] or attempt + 1 == RENAME_ATTEMPTS:
+                raise
+    closure.rename(folder_id, folder_cache.ancestry(folder)[0], new_name)
+    _propagate_rename(folder, new_name)
+    folder_cache.bump_generation()
 
     return success({
         'folder_id': folder_id,
@@ -145,16 +243,34 @@ def handle_update_folder(event, context):
 
 
 def handle_delete_folder(event, context):
-    """Delete a folder with cascade (Admin only)."""
+    """Delete a folder with cascade (Admin only).
+
+    A subtree too big for one invocation comes back as 202 with the counts
+    so far; repeating the request carries on from the checkpoint.
+    """
     folder_id = event.get('pathParameters', {}).get('folderId', '')
 
     folder = db.get_item(f'FOLDER#{folder_id}', 'META')
     if not folder:
         return error('Folder not found', 404)
 
-    _cascade_delete_folder(folder_id)
+    done, deleted = _cascade_delete_folder(folder, context)
+    folder_cache.bump_generation()
+    # Users assigned inside the subtree are invalidated as it is deleted;
+    # those assigned above it lose what has gone so far
+    access.invalidate_many(access.assigned_users(folder_cache.ancestry(folder)[0]))
+    if not done:
+        return success({
+            'message': 'Folder delete in progress; repeat the request to continue',
+            'folder_id': folder_id,
+            'deleted': deleted,
+        }, 202)
 
-    return success({'message': f'Folder deleted'})
+    parent_id = folder.get('parent_id', 'ROOT')
+    if parent_id != 'ROOT':
+        folder_children.adjust_count(folder_cache.get(parent_id), -1)
+
+    return success({'message': 'Folder deleted', 'deleted': deleted})
 
 
 def handle_list_folders(event, context):
@@ -169,6 +285,96 @@ def handle_list_folders(event, context):
     return success({'folders': folders})
 
 
+def handle_list_children(event, context):
+    """One level of the folder tree, sorted by name (ROOT for the top level).
+
+    Query params: limit (default and cap MAX_CHILDREN_PAGE) and next_token.
+    Non-Admin users see the children of folders they can reach; at ROOT
+    they see the top folders of their visible tree. Below ROOT the response
+    also describes the folder itself, with breadcrumbs from its stored
+    ancestor chain (limited to the folders the user can reach).
+    """
+    user = event['user']
+    folder_id = event.get('pathParameters', {}).get('folderId', '')
+    query_params = event.get('queryStringParameters') or {}
+    try:
+        limit = db.parse_limit(query_params.get('limit'), MAX_CHILDREN_PAGE) or MAX_CHILDREN_PAGE
+    except ValueError:
+        return error('limit must be a positive integer', 400)
+    next_token = query_params.get('next_token')
+
+    admin = user['role'] == 'Admin'
+    current = None
+    if folder_id != 'ROOT':
+        visible = None if admin else access.folder_ids(user['username'])
+        folder = folder_cache.get(folder_id)
+        if not folder:
+            return error('Folder not found', 404)
+        if visible is not None and folder_id not in visible:
+            return error('Forbidden', 403)
+        ids, names = folder_cache.ancestry(folder)
+        breadcrumbs = [{'folder_id': fid, 'name': name}
+                       for fid, name in zip(ids + [folder_id], names + [folder.get('name')])
+                       if visible is None or fid in visible]
+        current = {
+            'folder_id': folder_id,
+            'name': folder.get('name'),
+            'parent_id': folder.get('parent_id', 'ROOT'),
+            'breadcrumbs': breadcrumbs,
+        }
+
+    try:
+        if not admin and folder_id == 'ROOT':
+            rows, next_token = _visible_top_folders(
+                access.top_folder_ids(user['username']), limit, next_token)
+        else:
+            # Everything beneath a reachable folder is reachable too
+            rows, next_token = folder_children.page(folder_id, limit, next_token)
+    except ValueError:
+        return error('Invalid next_token', 400)
+
+    children = [{
+        'folder_id': row.get('folder_id'),
+        'name': row.get('name'),
+        'parent_id': row.get('parent_id', 'ROOT'),
+        'created_at': row.get('created_at'),
+        'child_count': row.get('child_count', 0),
+        'has_children': row.get('child_count', 0) > 0,
+    } for row in rows]
+    return success({'folder_id': folder_id, 'folder': current, 'children': children,
+                    'next_token': next_token})
+
+
+def _visible_top_folders(top_ids, limit, start_token):
+    """Listing rows for the top of a non-Admin tree, by name, paged by cursor.
+
+    These are the reachable folders whose parent is not reachable, which
+    need not share a parent, so they come from the access set rather than
+    one CHILDREN# partition. Only the top folders' METAs are read, never
+    the rest of the visible tree; the token holds the last (name, ID)
+    returned, so folders created or removed between pages do not shift it.
+    """
+    after = None
+    if start_token:
+        cursor = db.decode_token(start_token)
+        after = (cursor.get('name'), cursor.get('folder_id'))
+        if not all(isinstance(part, str) for part in after):
+            raise ValueError('Invalid pagination token')
+    ids = sorted(top_ids)
+    tops = sorted(((folder_children.normalize(f.get('name', '')), f['PK'][len('FOLDER#'):], f)
+                   for f in folder_cache.get_many(ids) if f),
+                  key=lambda entry: entry[:2])
+    if after:
+        tops = [entry for entry in tops if entry[:2] > after]
+    chosen = [folder for _, _, folder in tops[:limit]]
+    rows = [row or folder_children.row(folder)
+            for folder, row in zip(chosen, folder_children.get_many(chosen))]
+    if len(tops) <= limit:
+        return rows, None
+    name, fid, _ = tops[limit - 1]
+    return rows, db.encode_token({'name': name, 'folder_id': fid})
+
+
 # ============================================================
 # Assignment handlers
 # ============================================================
@@ -191,14 +397,16 @@ def handle_assign_users(event, context):
     if not folder:
         return error('Folder not found', 404)
 
+    # Verify users exist (one BatchGetItem per 100 usernames)
+    profiles = db.get_items([(f'USER#{username}', 'PROFILE') for username in usernames])
+
     now = int(time.time())
-    for username in usernames:
-        # Verify user exists
-        user = db.get_item(f'USER#{username}', 'PROFILE')
+    assignment_items = []
+    for username, user in zip(usernames, profiles):
         if not user:
             continue
 
-        assignment_item = {
+        assignment_items.append({
             'PK': f'FOLDER#{folder_id}',
             'SK': f'ASSIGN#{username}',
             'GSI1PK': f'USER#{username}',
@@ -206,8 +414,11 @@ def handle_assign_users(event, context):
             'username': username,
             'folder_id': folder_id,
             'assigned_at': now,
-        }
-        db.put_item(assignment_item)
+        })
+    db.batch_put(assignment_items)
+    # Access sets rebuild on their next read
+    assigned = [item['username'] for item in assignment_items]
+    access.invalidate_many(assigned, {username: [folder_id] for username in assigned})
 
     return success({'message': f'Users assigned to folder'})
 
@@ -223,10 +434,103 @@ def handle_unassign_user(event, context):
         return error('Assignment not found', 404)
 
     db.delete_item(f'FOLDER#{folder_id}', f'ASSIGN#{username}')
+    # The set rebuilds on its next read
+    access.invalidate(username)
 
     return success({'message': f'User unassigned from folder'})
 
 
+def handle_bulk_assignments(event, context):
+    """Assign and unassign many users across many folders at once (Admin only).
+
+    Body: {"assign": {"usernames": [...], "folder_ids": [...]}, "unassign": {...}},
+    each action taking one block or a list of them; every user x folder
+    pair of a block is one change. Users, folders and current assignments
+    are read with BatchGetItem and the changes written with one parallel
+    batch write. Each pair's result has a status: assigned, unassigned,
+    exists (already assigned), missing (nothing to unassign), duplicate
+    (named again) or invalid (with an error).
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except json.JSONDecodeError:
+        return error('Invalid JSON', 400)
+    if not isinstance(body, dict):
+        return error('Body must be a JSON object', 400)
+
+    try:
+        pairs = _assignment_pairs(body)
+    except ValueError as e:
+        return error(str(e), 400)
+    if not pairs:
+        return error('At least one username and folder_id is required', 400)
+
+    usernames = list(dict.fromkeys(username for _, username, _ in pairs))
+    folder_ids = list(dict.fromkeys(folder_id for _, _, folder_id in pairs))
+    keys = list(dict.fromkeys((username, folder_id) for _, username, folder_id in pairs))
+    profiles = dict(zip(usernames, db.get_items(
+        [(f'USER#{username}', 'PROFILE') for username in usernames])))
+    folders = dict(zip(folder_ids, db.get_items(
+        [(f'FOLDER#{folder_id}', 'META') for folder_id in folder_ids])))
+    existing = dict(zip(keys, db.get_items(
+        [(f'FOLDER#{folder_id}', f'ASSIGN#{username}') for username, folder_id in keys])))
+
+    actions = {}
+    for action, username, folder_id in pairs:
+        actions.setdefault((username, folder_id), set()).add(action)
+
+    now = int(time.time())
+    results = []
+    puts, deletes = [], []
+    changed = set()
+    assigned = {}
+    seen = set()
+    for action, username, folder_id in pairs:
+        result = {'username': username, 'folder_id': folder_id, 'action': action}
+        results.append(result)
+        pair = (username, folder_id)
+        if len(actions[pair]) > 1:
+            result.update(status='invalid', error='Pair is both assigned and unassigned')
+        elif pair in seen:
+            result.update(status='duplicate', error='Pair named more than once')
+        elif not profiles[username]:
+            result.update(status='invalid', error='User not found')
+        elif not folders[folder_id]:
+            result.update(status='invalid', error='Folder not found')
+        elif action == 'assign' and existing[pair]:
+            result['status'] = 'exists'
+        elif action == 'assign':
+            puts.append({
+                'PK': f'FOLDER#{folder_id}',
+                'SK': f'ASSIGN#{username}',
+                'GSI1PK': f'USER#{username}',
+                'GSI1SK': f'ASSIGN#FOLDER#{folder_id}',
+                'username': username,
+                'folder_id': folder_id,
+                'assigned_at': now,
+            })
+            result['status'] = 'assigned'
+            changed.add(username)
+            assigned.setdefault(username, []).append(folder_id)
+        elif not existing[pair]:
+            result['status'] = 'missing'
+        else:
+            deletes.append({'PK': f'FOLDER#{folder_id}', 'SK': f'ASSIGN#{username}'})
+            result['status'] = 'unassigned'
+            changed.add(username)
+        seen.add(pair)
+
+    if puts or deletes:
+        db.batch_write(puts=puts, deletes=deletes)
+    # Access sets rebuild on their next read
+    access.invalidate_many(changed, assigned)
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return success({'summary': summary, 'results': results})
+
+
 def handle_list_assignments(event, context):
     """List users assigned to a folder (Admin only)."""
     folder_id = event.get('pathParameters', {}).get('folderId', '')
@@ -256,117 +560,222 @@ def handle_list_assignments(event, context):
 # Helper functions
 # ============================================================
 
-def _cascade_delete_folder(folder_id):
-    """Recursively delete a folder and all its contents."""
-    keys_to_delete = []
-
-    # 1. Collect file records for this folder
-    file_items = db.query(f'FOLDER#{folder_id}', sk_begins_with='FILE#')
-    for item in file_items:
-        keys_to_delete.append({'PK': item['PK'], 'SK': item['SK']})
-
-    # 2. Collect assignment records
-    assign_items = db.query(f'FOLDER#{folder_id}', sk_begins_with='ASSIGN#')
-    for item in assign_items:
-        keys_to_delete.append({'PK': item['PK'], 'SK': item['SK']})
-
-    # 3. Collect child folders and recurse
-    children = db.query(f'PARENT#{folder_id}', index_name='GSI1')
-    for child in children:
-        if child.get('SK') == 'META':
-            child_id = child['PK'].replace('FOLDER#', '')
-            _cascade_delete_folder(child_id)
-
-    # 4. Delete the folder META record
-    keys_to_delete.append({'PK': f'FOLDER#{folder_id}', 'SK': 'META'})
+def _assignment_pairs(body):
+    """[(action, username, folder_id)] for every pair in a bulk assignment body.
+
+    Raises ValueError for a malformed block or too many pairs.
+    """
+    pairs = []
+    for action in ASSIGNMENT_ACTIONS:
+        blocks = body.get(action) or []
+        if isinstance(blocks, dict):
+            blocks = [blocks]
+        if not isinstance(blocks, list):
+            raise ValueError(f'{action} must be an object or a list of objects')
+        for block in blocks:
+            usernames = block.get('usernames') if isinstance(block, dict) else None
+            folder_ids = block.get('folder_ids') if isinstance(block, dict) else None
+            if not isinstance(usernames, list) or not isinstance(folder_ids, list) or not all(
+                    isinstance(value, str) and value for value in usernames + folder_ids):
+                raise ValueError(f'Each {action} block needs usernames and folder_ids lists')
+            if len(pairs) + len(usernames) * len(folder_ids) > MAX_ASSIGNMENT_PAIRS:
+                raise ValueError(f'At most {MAX_ASSIGNMENT_PAIRS} user/folder pairs per request')
+            pairs.extend((action, username, folder_id)
+                         for username in usernames for folder_id in folder_ids)
+    return pairs
+
+
+def _propagate_rename(folder, new_name):
+    """Rewrite the renamed folder's entry in every descendant's ancestor_names.
+
+    The folder sits at the same index in each descendant's chain (its own
+    depth). Each update is conditional on the ID at that index, so items
+    with a stale or missing chain are left for the backfill to fix.
+    """
+    folder_id = folder['PK'].replace('FOLDER#', '')
+    depth = len(folder_cache.ancestry(folder)[0])
+
+    def rename_in(descendant_id):
+        try:
+            db.update_item(
+                f'FOLDER#{descendant_id}', 'META',
+                f'SET ancestor_names[{depth}] = :n',
+                {':n': new_name, ':id': folder_id},
+                condition_expression=f'ancestor_ids[{depth}] = :id'
+            )
+        except Exception as e:
+            if 'ConditionalCheckFailedException' not in str(e):
+                raise
+
+    descendants = closure.subtree_ids(folder_id, folder_cache.ancestry(folder)[0])
+    if descendants:
+        with ThreadPoolExecutor(max_workers=min(16, len(descendants))) as pool:
+            list(pool.map(rename_in, descendants))
+
+
+def _cascade_delete_folder(folder, context=None):
+    """Delete a folder, everything beneath it and its files' S3 objects.
+
+    Works through the subtree deepest first, CASCADE_STEP_FOLDERS folders
+    per step. The folder itself goes last, so if the deadline nears (or the
+    invocation dies) it is still there and deleting it again picks up what
+    is left. Every call makes at least one step.
+
+    The subtree is listed once, from the closure rows checked against GSI1.
+    When it takes more than one step, the steps are saved as PLAN#<n> items
+    next to a CASCADE#<folder_id> STATE checkpoint holding the running
+    counts, and each finished step removes its item. A resumed call reads
+    the remaining steps back and only asks the closure rows for folders
+    created under the subtree since.
+    Returns (done, counts).
+    """
+    folder_id = folder['PK'].replace('FOLDER#', '')
+    checkpoint = db.get_item(f'CASCADE#{folder_id}', 'STATE', consistent_read=True) or {}
+    counts = {name: checkpoint.get(name, 0) for name in CASCADE_COUNTS}
+
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    deadline = (time.monotonic() + (remaining() - CASCADE_RESERVE_MS) / 1000
+                if remaining else None)
+
+    plan = []
+    if checkpoint:
+        plan = list(db.iter_query(f'CASCADE#{folder_id}', sk_begins_with='PLAN#',
+                                  consistent_read=True))
+    if plan:
+        planned = {fid for item in plan for fid in item['folder_ids']}
+        added = [(depth, fid) for fid, depth in closure.iter_descendants(folder_id)
+                 if fid not in planned]
+        if added:
+            # Deepest first, ahead of the planned steps that hold their parents
+            plan.insert(0, {'folder_ids': [fid for _, fid in sorted(added, reverse=True)]})
+    else:
+        # Deepest first: an interrupted run never leaves a folder under a deleted parent
+        folder_ids = closure.subtree_ids(folder_id, folder_cache.ancestry(folder)[0],
+                                         verify=True)[::-1]
+        folder_ids.append(folder_id)
+        plan = [{'PK': f'CASCADE#{folder_id}', 'SK': f'PLAN#{n:06d}',
+                 'folder_ids': folder_ids[start:start + CASCADE_STEP_FOLDERS]}
+                for n, start in enumerate(range(0, len(folder_ids), CASCADE_STEP_FOLDERS))]
+        if len(plan) > 1:
+            expires = int(time.time()) + CASCADE_CHECKPOINT_TTL
+            checkpoint = dict(counts, PK=f'CASCADE#{folder_id}', SK='STATE', ttl=expires)
+            db.batch_put([dict(step, ttl=expires) for step in plan] + [checkpoint])
+
+    for n, step in enumerate(plan):
+        if n and deadline is not None and time.monotonic() > deadline:
+            return False, counts
+        # The whole step may be re-run if the call dies before its item goes
+        _cascade_step(step['folder_ids'], folder, counts)
+        if checkpoint:
+            done = [{'PK': step['PK'], 'SK': step['SK']}] if 'PK' in step else []
+            if n + 1 < len(plan):
+                db.batch_write(puts=[dict(checkpoint, **counts)], deletes=done)
+            else:
+                db.batch_write(deletes=done + [{'PK': f'CASCADE#{folder_id}', 'SK': 'STATE'}])
+    return True, counts
+
+
+def _cascade_step(folder_ids, top, counts):
+    """Delete some folders' partitions, S3 objects, closure and listing rows.
+
+    Users assigned to those folders have their access sets invalidated.
+    """
+    top_id = top['PK'][len('FOLDER#'):]
+    others = [fid for fid in folder_ids if fid != top_id]
+    found = dict(zip(others, db.get_items([(f'FOLDER#{fid}', 'META') for fid in others])))
+    metas = [top if fid == top_id else found[fid] for fid in folder_ids]
+    with ThreadPoolExecutor(max_workers=min(16, len(folder_ids))) as pool:
+        partitions = list(pool.map(lambda fid: db.query(f'FOLDER#{fid}'), folder_ids))
 
-    # 5. Batch delete all collected records
-    if keys_to_delete:
-        db.batch_delete(keys_to_delete)
+    keys_to_delete = []
+    s3_keys = []
+    assigned = set()
+    for fid, meta, items in zip(folder_ids, metas, partitions):
+        for item in items:
+            keys_to_delete.append({'PK': item['PK'], 'SK': item['SK']})
+            if item['SK'].startswith('ASSIGN#'):
+                assigned.add(item['username'])
+            if item['SK'].startswith('FILE#'):
+                counts['files'] += 1
+                if item.get('s3_key'):
+                    s3_keys.append(item['s3_key'])
+        if meta:
+            counts['folders'] += 1
+            keys_to_delete.extend(closure.keys(fid, folder_cache.ancestry(meta)[0]))
+            keys_to_delete.extend(folder_children.keys(meta))
+
+    deleted, failed = _delete_objects(s3_keys)
+    counts['objects'] += deleted
+    counts['objects_failed'] += failed
+    db.batch_write(deletes=keys_to_delete)
+    access.invalidate_many(assigned)
+    counts['items'] += len(keys_to_delete)
+
+
+def _delete_objects(s3_keys):
+    """Remove S3 objects with parallel DeleteObjects calls; returns (deleted, failed)."""
+    batches = [s3_keys[i:i + S3_DELETE_BATCH] for i in range(0, len(s3_keys), S3_DELETE_BATCH)]
+    if not batches:
+        return 0, 0
+
+    def delete(batch):
+        try:
+            response = _get_s3().delete_objects(Bucket=STORAGE_BUCKET, Delete={
+                'Objects': [{'Key': key} for key in batch], 'Quiet': True})
+        except Exception:
+            return 0, len(batch)  # Best effort, as for single-file deletes
+        failed = len(response.get('Errors', []))
+        return len(batch) - failed, failed
+
+    with ThreadPoolExecutor(max_workers=min(8, len(batches))) as pool:
+        results = list(pool.map(delete, batches))
+    return sum(d for d, _ in results), sum(f for _, f in results)
 
 
 def _build_full_tree():
-    """Build the complete folder tree (Admin view)."""
-    # Get all root folders
-    root_items = db.query('PARENT#ROOT', index_name='GSI1')
-    folders = []
-    for item in root_items:
-        if item.get('SK') != 'META':
-            continue
-        folder_id = item['PK'].replace('FOLDER#', '')
-        folders.append(_build_folder_node(folder_id, item))
-    return folders
-
-
-def _build_folder_node(folder_id, folder_item):
-    """Build a folder node with children."""
-    node = {
-        'folder_id': folder_id,
-        'name': folder_item.get('name'),
-        'parent_id': folder_item.get('parent_id', 'ROOT'),
-        'created_at': folder_item.get('created_at'),
-        'children': [],
-    }
-
-    # Get children
-    children = db.query(f'PARENT#{folder_id}', index_name='GSI1')
-    for child in children:
-        if child.get('SK') != 'META':
-            continue
-        child_id = child['PK'].replace('FOLDER#', '')
-        node['children'].append(_build_folder_node(child_id, child))
-
-    return node
+    """Build the complete folder tree (Admin view) from the ROOT closure rows.
+
+    One paginated query; rows predating the snapshot attributes fall back to
+    the folder's META item. Until the closure backfill has run, folders
+    from before the closure rows have none, so the tree is walked over GSI1.
+    """
+    if not closure.migrated():
+        found, _ = traversal.descendants('ROOT')
+        folder_ids = [fid for fid, _ in found]
+        return _tree_from_flat({fid: folder for fid, folder
+                                in zip(folder_ids, folder_cache.get_many(folder_ids))
+                                if folder})
+    folders = {row['folder_id']: row for row in closure.iter_tree()}
+    legacy = [fid for fid, row in folders.items() if 'name' not in row]
+    for fid, folder in zip(legacy, folder_cache.get_many(legacy)):
+        if folder:
+            folders[fid] = folder
+        else:
+            del folders[fid]
+    return _tree_from_flat(folders)
 
 
 def _build_filtered_tree(username):
     """Build a folder tree filtered by user assignments (non-Admin view)."""
-    # Get user's directly assigned folder IDs
-    assignments = db.query(
-        f'USER#{username}',
-        sk_begins_with='ASSIGN#FOLDER#',
-        index_name='GSI1'
-    )
-    assigned_ids = set()
-    for a in assignments:
-        parts = a['GSI1SK'].split('#')
-        if len(parts) >= 3:
-            assigned_ids.add(parts[2])
-
-    if not assigned_ids:
+    # Assigned folders and all their descendants, from the user's access set
+    folder_ids = sorted(access.folder_ids(username))
+    if not folder_ids:
         return []
 
-    # For each assigned folder, include it and all its descendants
     visible_folders = {}
-    for fid in assigned_ids:
-        _collect_folder_and_descendants(fid, visible_folders)
+    for fid, folder in zip(folder_ids, folder_cache.get_many(folder_ids)):
+        if folder:
+            visible_folders[fid] = folder
 
     # Build tree structure from visible folders
     return _tree_from_flat(visible_folders)
 
 
-def _collect_folder_and_descendants(folder_id, result):
-    """Collect a folder and all its descendants into result dict."""
-    if folder_id in result:
-        return
-
-    folder = db.get_item(f'FOLDER#{folder_id}', 'META')
-    if not folder:
-        return
-
-    result[folder_id] = folder
-
-    # Get children
-    children = db.query(f'PARENT#{folder_id}', index_name='GSI1')
-    for child in children:
-        if child.get('SK') != 'META':
-            continue
-        child_id = child['PK'].replace('FOLDER#', '')
-        _collect_folder_and_descendants(child_id, result)
-
-
 def _tree_from_flat(folder_map):
-    """Convert a flat dict of folders into a tree structure."""
+    """Convert a flat dict of folders into a tree structure.
+
+    Iterative and O(n): one pass builds the nodes, one links them.
+    """
     nodes = {}
     for fid, item in folder_map.items():
         nodes[fid] = {
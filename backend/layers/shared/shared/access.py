@@ -0,0 +1,207 @@
+"""Materialized effective-access sets.
+
+A non-admin user can reach every folder they are assigned to and everything
+beneath it. Working that out means reading the user's assignments and then
+walking the tree, so the result is stored per user:
+
+    PK: USER#<username>   SK: ACCESS
+    folder_ids       list of reachable folder IDs, or
+    folder_ids_z     the same, newline-joined and zlib-compressed, once the
+                     list passes COMPRESS_BYTES
+    tree_generation  folder_cache.tree_generation() the set was built under
+    access_version   bumped by invalidate() when the user's assignments change
+    built_version    the access_version the set was built from
+    top_ids[_z]      the reachable folders whose parent is not reachable (the
+                     top of the user's tree), stored like folder_ids
+    pending          folder IDs assigned since, which GSI1 may not show yet
+
+A set is current when built_version == access_version and its
+tree_generation matches the folder tree. Creating or deleting a folder only
+affects users assigned to it or above it, so folders.handler invalidates
+just those (assigned_users over the folder's ancestor chain, then
+invalidate_many); tree_generation stays as a fallback that makes every set
+stale at once, for tree changes made outside the handlers. Stale or
+missing sets are rebuilt on read. The rebuild's write is conditional on
+access_version, so a rebuild racing an assignment change can never
+overwrite the newer state with an older one.
+
+Rebuilds only trust strongly consistent reads. The user's assignments are
+listed from GSI1, which can lag, so that list plus pending is checked
+against the assignment rows themselves (FOLDER#<id>/ASSIGN#<username>):
+an assignment just removed is dropped and one just added is kept. Pending
+IDs that GSI1 has caught up with are cleared as the set is stored.
+"""
+
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.types import Binary
+
+from shared import closure, db, folder_cache
+
+
+ACCESS_SK = 'ACCESS'
+
+# Store the ID list compressed once it is larger than this
+COMPRESS_BYTES = 2048
+
+
+def _indexed_folder_ids(username):
+    """Folder IDs GSI1 lists as assigned to the user (eventually consistent)."""
+    assignments = db.query(
+        f'USER#{username}',
+        sk_begins_with='ASSIGN#FOLDER#',
+        index_name='GSI1'
+    )
+    assigned = set()
+    for a in assignments:
+        # GSI1SK format: ASSIGN#FOLDER#<folder_id>
+        parts = a['GSI1SK'].split('#')
+        if len(parts) >= 3:
+            assigned.add(parts[2])
+    return assigned
+
+
+def _assigned_folder_ids(username, candidates):
+    """The candidate folder IDs whose assignment row exists (consistent read)."""
+    candidates = sorted(candidates)
+    rows = db.get_items([(f'FOLDER#{fid}', f'ASSIGN#{username}') for fid in candidates],
+                        consistent_read=True)
+    return {fid for fid, row in zip(candidates, rows) if row}
+
+
+def _with_descendants(folder_ids):
+    """(reachable, tops): the given folders (those that exist) plus everything
+    beneath them, and those of the given folders with no given ancestor."""
+    folders = [f for f in db.get_items([(f'FOLDER#{fid}', 'META') for fid in folder_ids],
+                                       consistent_read=True) if f]
+    given = {f['PK'][len('FOLDER#'):] for f in folders}
+    found, tops = set(), set()
+    for folder in folders:
+        fid = folder['PK'][len('FOLDER#'):]
+        ancestor_ids = folder_cache.ancestry(folder)[0]
+        found.add(fid)
+        found.update(closure.subtree_ids(fid, ancestor_ids, consistent_read=True))
+        if given.isdisjoint(ancestor_ids):
+            tops.add(fid)
+    return found, tops
+
+
+def _encode(folder_ids, name='folder_ids'):
+    """Attribute values for an ID set: (name to SET, name to REMOVE, value)."""
+    ids = sorted(folder_ids)
+    joined = '\n'.join(ids).encode('utf-8')
+    if len(joined) > COMPRESS_BYTES:
+        return f'{name}_z', name, zlib.compress(joined)
+    return name, f'{name}_z', ids
+
+
+def _decode(item, name='folder_ids'):
+    if f'{name}_z' in item:
+        data = item[f'{name}_z']
+        if isinstance(data, Binary):
+            data = data.value
+        text = zlib.decompress(data).decode('utf-8')
+        return frozenset(text.split('\n')) if text else frozenset()
+    return frozenset(item.get(name, []))
+
+
+def _current(item, tree_generation):
+    return (item is not None
+            and item.get('tree_generation') == tree_generation
+            and item.get('built_version') == item.get('access_version', 0)
+            and any(name in item for name in ('folder_ids', 'folder_ids_z'))
+            and any(name in item for name in ('top_ids', 'top_ids_z')))
+
+
+def _rebuild(username, item, tree_generation):
+    """Recompute a user's set and store it unless it was invalidated meanwhile."""
+    version = (item or {}).get('access_version', 0)
+    pending = set((item or {}).get('pending', ()))
+    indexed = _indexed_folder_ids(username)
+    assigned = _assigned_folder_ids(username, indexed | pending)
+    folder_ids, tops = _with_descendants(assigned)
+    name, stale_name, value = _encode(folder_ids)
+    top_name, stale_top_name, top_value = _encode(tops, 'top_ids')
+    expression = (f'SET {name} = :ids, {top_name} = :tops, tree_generation = :tg, '
+                  f'built_version = :v, access_version = if_not_exists(access_version, :v) '
+                  f'REMOVE {stale_name}, {stale_top_name}')
+    values = {':ids': value, ':tops': top_value, ':tg': tree_generation, ':v': version}
+    # GSI1 now agrees with the assignment rows on these
+    settled = {fid for fid in pending if (fid in indexed) == (fid in assigned)}
+    if settled:
+        expression += ' DELETE pending :settled'
+        values[':settled'] = settled
+    try:
+        db.update_item(
+            f'USER#{username}', ACCESS_SK, expression, values,
+            condition_expression='attribute_not_exists(access_version) OR access_version = :v'
+        )
+    except Exception as e:
+        if 'ConditionalCheckFailedException' not in str(e):
+            raise
+    return frozenset(folder_ids), frozenset(tops)
+
+
+def _load(username):
+    """(folder_ids, top_ids) of the user, rebuilt first if stale."""
+    tree_generation = folder_cache.tree_generation()
+    item = db.get_item(f'USER#{username}', ACCESS_SK, consistent_read=True)
+    if _current(item, tree_generation):
+        return _decode(item), _decode(item, 'top_ids')
+    return _rebuild(username, item, tree_generation)
+
+
+def folder_ids(username):
+    """Every folder ID the user can reach through assignments (a frozenset)."""
+    return _load(username)[0]
+
+
+def top_folder_ids(username):
+    """The reachable folder IDs whose parent is not reachable (a frozenset).
+
+    These are the top folders of the user's tree; they need not share a parent.
+    """
+    return _load(username)[1]
+
+
+def invalidate(username, assigned=()):
+    """Mark a user's set stale. Call after their assignments change.
+
+    assigned: folder IDs just assigned to the user, kept as pending until
+    GSI1 lists them.
+    """
+    if assigned:
+        db.update_item(f'USER#{username}', ACCESS_SK, 'ADD access_version :one, pending :f',
+                       {':one': 1, ':f': set(assigned)})
+    else:
+        db.update_item(f'USER#{username}', ACCESS_SK, 'ADD access_version :one', {':one': 1})
+
+
+def invalidate_many(usernames, assigned=None):
+    """invalidate() several users in parallel.
+
+    assigned: optional {username: folder IDs just assigned to them}.
+    """
+    usernames = list(usernames)
+    assigned = assigned or {}
+    if usernames:
+        with ThreadPoolExecutor(max_workers=min(16, len(usernames))) as pool:
+            list(pool.map(lambda username: invalidate(username, assigned.get(username, ())),
+                          usernames))
+
+
+def assigned_users(folder_ids):
+    """Usernames assigned directly to any of the given folders."""
+    folder_ids = list(folder_ids)
+    if not folder_ids:
+        return set()
+    with ThreadPoolExecutor(max_workers=min(16, len(folder_ids))) as pool:
+        partitions = pool.map(
+            lambda fid: db.query(f'FOLDER#{fid}', sk_begins_with='ASSIGN#'), folder_ids)
+        return {item['username'] for items in partitions for item in items}
+
+
+def key(username):
+    """Table key of a user's access item (for deleting it with the user)."""
+    return {'PK': f'USER#{username}', 'SK': ACCESS_SK}
@@ -1,7 +1,8 @@
 """Authorization middleware — session validation and role enforcement."""
 
 import json
-from shared import db
+from shared import access, rate_limit, session_cache, tokens
+from shared.metrics import route_name
 from shared.response import error
 
 
@@ -19,11 +20,18 @@ def authenticate(event):
     """Validate session token, return user context or None.
 
     Returns dict: {"username": str, "role": str} or None if invalid.
+    Signed tokens are verified in-process; opaque ones are looked up through
+    the warm-container session_cache.
     """
     token = _extract_token(event)
     if not token:
         return None
-    session = db.get_item(f'SESSION#{token}', 'SESSION')
+    if tokens.is_signed(token):
+        claims = tokens.verify(token)
+        if not claims:
+            return None
+        return {'username': claims['username'], 'role': claims['role'], 'token': token}
+    session = session_cache.get(token)
     if not session:
         return None
     return {
@@ -34,11 +42,20 @@ def authenticate(event):
 
 
 def require_auth(handler):
-    """Decorator: rejects unauthenticated requests with 401."""
+    """Decorator: rejects unauthenticated requests with 401.
+
+    Requests over the caller's rate limits (shared.rate_limit) are refused
+    with 429 and Retry-After before the handler does any work.
+    """
     def wrapper(event, context):
         user = authenticate(event)
         if not user:
             return error('Unauthorized', 401)
+        wait = rate_limit.check(user['username'], user['role'], route_name(event))
+        if wait:
+            return error('Too many requests', 429,
+                         headers={'Retry-After': rate_limit.retry_after(wait),
+                                  'Access-Control-Expose-Headers': 'Retry-After'})
         event['user'] = user
         return handler(event, context)
     return wrapper
@@ -58,33 +75,6 @@ def check_folder_access(username, folder_id):
     """Check if a user has access to a folder (direct or via parent inheritance).
 
     Returns True if the user is assigned to the folder or any of its ancestors.
+    One read of the user's materialized access set (see shared.access).
     """
-    # Get user's directly assigned folder IDs
-    assignments = db.query(
-        f'USER#{username}',
-        sk_begins_with='ASSIGN#FOLDER#',
-        index_name='GSI1'
-    )
-    assigned_folder_ids = set()
-    for a in assignments:
-        # GSI1SK format: ASSIGN#FOLDER#<folder_id>
-        parts = a['GSI1SK'].split('#')
-        if len(parts) >= 3:
-            assigned_folder_ids.add(parts[2])
-
-    if not assigned_folder_ids:
-        return False
-
-    # Walk up the parent chain from the target folder
-    current_id = folder_id
-    visited = set()
-    while current_id and current_id != 'ROOT' and current_id not in visited:
-        if current_id in assigned_folder_ids:
-            return True
-        visited.add(current_id)
-        folder = db.get_item(f'FOLDER#{current_id}', 'META')
-        if not folder:
-            break
-        current_id = folder.get('parent_id')
-
-    return False
+    return folder_id in access.folder_ids(username)
@@ -0,0 +1,137 @@
+"""Shared boto3 sessions and tuned clients for all handlers.
+
+Every AWS client/resource in the layer is built here so they share one
+botocore configuration:
+  - a connection pool large enough for the parallel batch fan-out in
+    shared.db (AWS_MAX_POOL_CONNECTIONS, default 50; botocore's default is 10)
+  - TCP keep-alive, so warm containers reuse connections between invocations
+  - adaptive retry mode (AWS_RETRY_MODE, AWS_MAX_ATTEMPTS including the
+    first try), which adds client-side rate limiting on top of exponential
+    backoff when DynamoDB or S3 throttle
+Sessions are cached per credential set (access key, secret key, region), so
+DynamoDB and S3 reuse the same session (and its credential resolution)
+within a container; clients and resources are cached per service, endpoint,
+overrides and that same credential set, so different credentials never
+share a client.
+
+Clients are thread-safe and shared. Resources are not: a DynamoDB resource
+turns condition objects into expressions with one placeholder counter per
+client, so two threads building requests at once can swap each other's
+#n0/:v0 values. Each thread therefore gets its own resource, and a thread's
+resources go to an idle list when it ends, for the next thread (typically
+the next ThreadPoolExecutor worker) to reuse.
+"""
+
+import os
+import threading
+from collections import defaultdict
+
+import boto3
+from botocore.config import Config
+
+
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50'))
+RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'adaptive')
+MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '8'))
+CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+
+# boto3 session/client creation is not thread-safe
+_lock = threading.Lock()
+_sessions = {}
+_clients = {}
+# Resources not held by any thread, per cache key
+_idle = defaultdict(list)
+_local = threading.local()
+
+
+class _Lease:
+    """A thread's resources, moved to the idle list when the thread ends."""
+
+    def __init__(self):
+        self.resources = {}
+
+    def __del__(self):
+        # Runs as the thread's locals are dropped; list.append is atomic
+        for key, resource in self.resources.items():
+            _idle[key].append(resource)
+
+
+def client_config(**overrides):
+    """Build the shared botocore Config. Overrides: retry_mode, max_attempts,
+    max_pool_connections, connect_timeout, read_timeout."""
+    return Config(
+        max_pool_connections=overrides.get('max_pool_connections', MAX_POOL_CONNECTIONS),
+        tcp_keepalive=True,
+        connect_timeout=overrides.get('connect_timeout', CONNECT_TIMEOUT),
+        read_timeout=overrides.get('read_timeout', READ_TIMEOUT),
+        retries={
+            'mode': overrides.get('retry_mode', RETRY_MODE),
+            'total_max_attempts': overrides.get('max_attempts', MAX_ATTEMPTS),
+        },
+    )
+
+
+def _credentials_key(access_key, secret_key, region=None):
+    return (access_key, secret_key, region or os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+
+
+def get_session(access_key=None, secret_key=None, region=None):
+    """Return a cached boto3 Session for the given (or default) credentials."""
+    key = _credentials_key(access_key, secret_key, region)
+    region = key[2]
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            if access_key:
+                session = boto3.Session(
+                    aws_access_key_id=access_key,
+                    aws_secret_access_key=secret_key,
+                    region_name=region,
+                )
+            else:
+                session = boto3.Session(region_name=region)
+            _sessions[key] = session
+        return session
+
+
+def get_client(service, endpoint_url=None, access_key=None, secret_key=None, **overrides):
+    """Return a cached low-level client built with the shared config."""
+    key = (service, endpoint_url, _credentials_key(access_key, secret_key),
+           tuple(sorted(overrides.items())))
+    client = _clients.get(key)
+    if client is None:
+        session = get_session(access_key, secret_key)
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = session.client(service, endpoint_url=endpoint_url,
+                                        config=client_config(**overrides))
+                _clients[key] = client
+    return client
+
+
+def get_resource(service, endpoint_url=None, access_key=None, secret_key=None,
+                 setup=None, **overrides):
+    """Return this thread's service resource built with the shared config.
+
+    setup(resource), if given, runs once on each resource built.
+    """
+    key = (service, endpoint_url, _credentials_key(access_key, secret_key), setup,
+           tuple(sorted(overrides.items())))
+    lease = getattr(_local, 'lease', None)
+    if lease is None:
+        lease = _local.lease = _Lease()
+    resource = lease.resources.get(key)
+    if resource is None:
+        try:
+            resource = _idle[key].pop()
+        except IndexError:
+            session = get_session(access_key, secret_key)
+            with _lock:
+                resource = session.resource(service, endpoint_url=endpoint_url,
+                                            config=client_config(**overrides))
+            if setup:
+                setup(resource)
+        lease.resources[key] = resource
+    return resource
@@ -0,0 +1,149 @@
+"""Closure-table rows for the folder tree.
+
+Every folder has one row per ancestor, ROOT included:
+
+    PK: ANCESTOR#<ancestor_id>   SK: DESC#<depth:04d>#<folder_id>
+
+where depth is how many levels below the ancestor the folder sits (1 for a
+direct child). All descendants of a folder are then one paginated query on
+its ANCESTOR# partition, shallowest first, instead of a GSI1 query per
+folder. folders.handler writes the rows on create and deletes them with the
+folder; scripts/backfill_folder_closure.py builds them for existing trees.
+
+subtree_ids() falls back to walking the GSI1 parent links (shared.traversal)
+for a folder that has no rows yet, so subtree operations stay correct on a
+tree that has not been backfilled.
+
+The ROOT rows also carry the folder's SNAPSHOT_ATTRIBUTES (name, parent_id,
+created_at), so the whole tree is one paginated query (iter_tree) with no
+META reads. Renames update them through rename(). Until the backfill has
+recorded with mark_migrated() that every folder has its rows, migrated() is
+false and the admin tree is walked over GSI1 instead.
+"""
+
+import time
+
+from shared import db, traversal
+
+
+SNAPSHOT_ATTRIBUTES = ['name', 'parent_id', 'created_at']
+# Written by the backfill once every folder has its closure rows
+MIGRATION_PK = 'SYSTEM#FOLDER_CLOSURE'
+MIGRATION_SK = 'BACKFILL'
+
+_migrated = False
+
+
+def _row_key(ancestor_id, depth, folder_id):
+    return {'PK': f'ANCESTOR#{ancestor_id}', 'SK': f'DESC#{depth:04d}#{folder_id}'}
+
+
+def _ancestors_with_depth(ancestor_ids):
+    """[(ancestor_id, depth)] for a folder whose chain (root first) is ancestor_ids."""
+    chain = ['ROOT'] + list(ancestor_ids)
+    return [(ancestor_id, len(chain) - i) for i, ancestor_id in enumerate(chain)]
+
+
+def rows(folder_id, ancestor_ids, folder=None):
+    """Closure items for a folder, given its ancestor chain (root first, parent last).
+
+    folder: the META item, whose SNAPSHOT_ATTRIBUTES go on the ROOT row.
+    """
+    items = []
+    for ancestor_id, depth in _ancestors_with_depth(ancestor_ids):
+        item = _row_key(ancestor_id, depth, folder_id)
+        item.update({'folder_id': folder_id, 'depth': depth})
+        if ancestor_id == 'ROOT' and folder:
+            item.update({name: folder[name] for name in SNAPSHOT_ATTRIBUTES if name in folder})
+        items.append(item)
+    return items
+
+
+def keys(folder_id, ancestor_ids):
+    """Table keys of a folder's closure rows (for deleting them)."""
+    return [_row_key(ancestor_id, depth, folder_id)
+            for ancestor_id, depth in _ancestors_with_depth(ancestor_ids)]
+
+
+def iter_descendants(folder_id, max_depth=None, consistent_read=False):
+    """Lazily yield (descendant_id, depth) under a folder (or 'ROOT'), shallowest first."""
+    for row in db.iter_query(f'ANCESTOR#{folder_id}', sk_begins_with='DESC#',
+                             attributes=['folder_id', 'depth'],
+                             consistent_read=consistent_read):
+        if max_depth is not None and row['depth'] > max_depth:
+            return
+        yield row['folder_id'], row['depth']
+
+
+def descendant_ids(folder_id):
+    """Every folder ID beneath a folder (or 'ROOT'), shallowest first."""
+    return [fid for fid, _ in iter_descendants(folder_id)]
+
+
+def subtree_ids(folder_id, ancestor_ids, verify=False, consistent_read=False):
+    """Every folder ID beneath a folder, shallowest first.
+
+    From the closure rows when the folder has them; otherwise (a folder
+    from before the closure table, not yet backfilled) by walking GSI1.
+    verify: walk GSI1 as well and add any folder the closure rows miss
+    (one whose rows were never written), for deletes that must not leave
+    anything behind.
+    consistent_read: read the closure rows strongly consistently (the GSI1
+    walk cannot be).
+    """
+    key = _row_key('ROOT', len(ancestor_ids) + 1, folder_id)
+    if db.get_item(key['PK'], key['SK'], consistent_read=consistent_read) is None:
+        found, _ = traversal.descendants(folder_id)
+        return [fid for fid, _ in found]
+    depths = dict(iter_descendants(folder_id, consistent_read=consistent_read))
+    if verify:
+        found, _ = traversal.descendants(folder_id)
+        for fid, depth in found:
+            depths.setdefault(fid, depth)
+    return sorted(depths, key=depths.get)
+
+
+def iter_tree():
+    """Lazily yield the ROOT row of every folder, shallowest first.
+
+    Each has folder_id plus the SNAPSHOT_ATTRIBUTES (absent on rows written
+    before they were added, until the backfill rewrites them).
+    """
+    return db.iter_query('ANCESTOR#ROOT', sk_begins_with='DESC#',
+                         attributes=['folder_id'] + SNAPSHOT_ATTRIBUTES)
+
+
+def rename(folder_id, ancestor_ids, name):
+    """Update the name on a folder's ROOT row (if the row exists)."""
+    key = _row_key('ROOT', len(ancestor_ids) + 1, folder_id)
+    try:
+        # 'name' is a DynamoDB reserved word
+        db.update_item(key['PK'], key['SK'], 'SET #n = :n', {':n': name},
+                       condition_expression='attribute_exists(PK)',
+                       expression_attr_names={'#n': 'name'})
+    except Exception as e:
+        if 'ConditionalCheckFailedException' not in str(e):
+            raise
+
+
+def migrated():
+    """Whether the backfill has recorded that every folder has its closure rows.
+
+    Cached once true; until then each call reads the marker item.
+    """
+    global _migrated
+    if not _migrated:
+        _migrated = db.get_item(MIGRATION_PK, MIGRATION_SK) is not None
+    return _migrated
+
+
+def mark_migrated():
+    """Record that every folder has its closure rows (run by the backfill)."""
+    db.put_item({'PK': MIGRATION_PK, 'SK': MIGRATION_SK, 'completed_at': int(time.time())})
+
+
+@db.on_use_backend
+def clear():
+    """Forget the migration marker (done automatically when db.use_backend() is called)."""
+    global _migrated
+    _migrated = False
@@ -1,73 +1,368 @@
-"""DynamoDB client with Decimal-safe serialization."""
+"""DynamoDB client that reads numbers as native int/float (no Decimal)."""
 
+import base64
+import heapq
+import itertools
 import os
-import boto3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
 from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.transform import TransformationInjector
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 from decimal import Decimal
 import json
 
+from shared import aws
+
 
 TABLE_NAME = os.environ.get('TABLE_NAME', 'FileShareTable-dev')
 
+# DynamoDB per-call limits
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+TRANSACT_WRITE_LIMIT = 100
+MAX_BATCH_RETRIES = 8
+
+# Concurrent BatchWriteItem calls per batch_write()
+BATCH_WRITE_WORKERS = int(os.environ.get('DB_BATCH_WORKERS', '8'))
+
+# Every call asks for consumed capacity broken down by table and index
+RETURN_CAPACITY = 'INDEXES'
+
+# Opt-in access tracing: unset/empty is off, 'stdout' (or '1') prints one
+# trace line per request, anything else is a file path to append to.
+# See trace_calls() and scripts/access_report.py.
+TRACE = os.environ.get('DB_TRACE', '')
+
+# Write sharding for hot GSI1 partitions, e.g. "PARENT#ROOT=4,ROLE#*=4":
+# an exact GSI1PK or a 'PREFIX*' pattern, and its shard count. See gsi1_key().
+GSI1_SHARDS = os.environ.get('GSI1_SHARDS', '')
+
+# A backend set with use_backend() (or the memory engine), shared by all
+# threads; DynamoDB resources come per thread from shared.aws instead
 _dynamodb = None
-_table = None
+# This thread's Table and the resource it came from
+_tables = threading.local()
+
+# Request-scoped identity map: (PK, SK) -> item, or None for a known miss.
+# Reset by begin_request() at the start of every invocation so a warm
+# container never serves another request's reads.
+_identity_map = {}
+
+# Request-scoped capacity totals: (table name, index name or None) ->
+# {'read': RCUs, 'write': WCUs}. Batch writes report from worker threads.
+_capacity = {}
+# Request-scoped list of traced calls (only filled when TRACE is set)
+_trace = []
+_stats_lock = threading.Lock()
+
+# Callbacks run by begin_request() and use_backend(), for request-scoped
+# state and warm caches kept by other layer modules
+_request_hooks = []
+_backend_hooks = []
+
+
+def _get_resource():
+    """Lazy-init the storage backend.
+
+    A backend is any object exposing the slice of the boto3 DynamoDB service
+    resource used in this module: Table(name) with get_item/put_item/
+    delete_item/update_item/query/scan, batch_get_item, batch_write_item and
+    meta.client.transact_write_items, returning numbers as int/float.
+    DB_BACKEND=memory selects the
+    in-process engine in shared.memory_backend; the default is DynamoDB
+    (or DynamoDB Local via DYNAMODB_ENDPOINT), with one resource per thread
+    since boto3 resources are not thread-safe (see shared.aws).
+    """
+    global _dynamodb
+    if _dynamodb is not None:
+        return _dynamodb
+    if os.environ.get('DB_BACKEND') == 'memory':
+        from shared.memory_backend import MemoryDynamoDB
+        _dynamodb = MemoryDynamoDB()
+        return _dynamodb
+    endpoint_url = os.environ.get('DYNAMODB_ENDPOINT')
+    if endpoint_url:
+        # Local DynamoDB: dummy credentials avoid SAM local's injected
+        # session token
+        return aws.get_resource('dynamodb', endpoint_url=endpoint_url,
+                                access_key='dummy', secret_key='dummy',
+                                setup=_use_native_numbers)
+    return aws.get_resource('dynamodb', setup=_use_native_numbers)
+
+
+class NativeDeserializer(TypeDeserializer):
+    """Deserialize DynamoDB numbers straight to int/float instead of Decimal.
+
+    Items then need no per-value conversion before JSON encoding. Numbers in
+    this table are timestamps, sizes and counters, well inside float range.
+    """
+    def _deserialize_n(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+
+
+class NativeSerializer(TypeSerializer):
+    """Serializer that also accepts floats, so items read back can be re-written."""
+    def _is_number(self, value):
+        if isinstance(value, float):
+            return True
+        return super()._is_number(value)
+
+    def _serialize_n(self, value):
+        if isinstance(value, float):
+            value = Decimal(repr(value))
+        return super()._serialize_n(value)
+
+
+def _use_native_numbers(resource):
+    """Swap the resource's value (de)serializers for the native-number ones."""
+    injector = TransformationInjector(serializer=NativeSerializer(),
+                                      deserializer=NativeDeserializer())
+    events = resource.meta.client.meta.events
+    events.unregister('before-parameter-build.dynamodb',
+                      unique_id='dynamodb-attr-value-input')
+    events.register('before-parameter-build.dynamodb',
+                    injector.inject_attribute_value_input,
+                    unique_id='dynamodb-attr-value-input')
+    events.unregister('after-call.dynamodb', unique_id='dynamodb-attr-value-output')
+    events.register('after-call.dynamodb', injector.inject_attribute_value_output,
+                    unique_id='dynamodb-attr-value-output')
 
 
 def _get_table():
-    """Lazy-init DynamoDB table resource."""
-    global _dynamodb, _table
-    if _table is None:
-        endpoint_url = os.environ.get('DYNAMODB_ENDPOINT')
-        if endpoint_url:
-            # Local DynamoDB: use a fresh Session with dummy credentials
-            # to avoid SAM local's injected session token
-            session = boto3.Session(
-                aws_access_key_id='dummy',
-                aws_secret_access_key='dummy',
-                region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
-            )
-            _dynamodb = session.resource('dynamodb', endpoint_url=endpoint_url)
-        else:
-            _dynamodb = boto3.resource('dynamodb')
-        _table = _dynamodb.Table(TABLE_NAME)
-    return _table
+    """Lazy-init this thread's DynamoDB table resource."""
+    resource = _get_resource()
+    if getattr(_tables, 'resource', None) is not resource:
+        _tables.table = resource.Table(TABLE_NAME)
+        _tables.resource = resource
+    return _tables.table
+
+
+def use_backend(resource):
+    """Swap the storage backend (e.g. a MemoryDynamoDB) and reset cached state.
+
+    None goes back to the backend chosen by the environment.
+    """
+    global _dynamodb
+    _dynamodb = resource
+    _identity_map.clear()
+    _capacity.clear()
+    _trace.clear()
+    for hook in _backend_hooks:
+        hook()
+
+
+def begin_request():
+    """Reset request-scoped state. Call at the top of every lambda_handler."""
+    _identity_map.clear()
+    _capacity.clear()
+    _trace.clear()
+    for hook in _request_hooks:
+        hook()
+
+
+def on_begin_request(hook):
+    """Register a no-argument callback to run at every begin_request()."""
+    if hook not in _request_hooks:
+        _request_hooks.append(hook)
+    return hook
+
+
+def on_use_backend(hook):
+    """Register a no-argument callback to run when use_backend() swaps backends."""
+    if hook not in _backend_hooks:
+        _backend_hooks.append(hook)
+    return hook
+
+
+def consumed_capacity():
+    """Capacity consumed since begin_request(), per (table, index) pair.
+
+    index is None for the base table. Returns a copy:
+        {('FileShareTable-dev', None): {'read': 2.5, 'write': 4.0}, ...}
+    """
+    with _stats_lock:
+        return {key: dict(units) for key, units in _capacity.items()}
+
+
+def trace_calls():
+    """Calls traced since begin_request() (empty unless DB_TRACE is set).
+
+    Each call is a dict with op ('GetItem', 'Query', 'BatchWriteItem', ...)
+    and, where they apply: index, pk (partition key), prefix (the key's
+    'TYPE#' prefix), sk_prefix, items returned/written, scanned, units
+    consumed, partitions ({pk: count} for batch calls) and cached (served
+    from the identity map without a table read).
+    """
+    with _stats_lock:
+        return list(_trace)
+
+
+def key_prefix(pk):
+    """The entity-type prefix of a key: 'PARENT#ROOT' -> 'PARENT#'."""
+    head, sep, _ = pk.partition('#')
+    return head + sep
+
 
+def _track(response, kind, op=None, **trace):
+    """Add a response's ConsumedCapacity to the request totals ('read' or 'write').
 
-class DecimalEncoder(json.JSONEncoder):
-    """JSON encoder that handles DynamoDB Decimal types."""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            if obj % 1 == 0:
-                return int(obj)
-            return float(obj)
-        return super().default(obj)
+    Single-item calls return one entry; batch and transaction calls return a
+    list with one entry per table. With INDEXES, each entry splits into the
+    base table and its global secondary indexes. With DB_TRACE on, the call
+    is also recorded (op plus the trace fields; see trace_calls()).
+    """
+    consumed = response.get('ConsumedCapacity') or []
+    if not consumed and not TRACE:
+        return response
+    field = f'{kind.title()}CapacityUnits'
+    call_units = 0
+    with _stats_lock:
+        for entry in consumed if isinstance(consumed, list) else [consumed]:
+            table = entry.get('TableName', TABLE_NAME)
+            call_units += entry.get(field, entry.get('CapacityUnits', 0))
+            parts = [(None, entry.get('Table', entry))]
+            parts.extend((entry.get('GlobalSecondaryIndexes') or {}).items())
+            for index, units in parts:
+                totals = _capacity.setdefault((table, index), {'read': 0, 'write': 0})
+                totals[kind] += units.get(field, units.get('CapacityUnits', 0))
+        if TRACE and op:
+            _trace.append(_trace_entry(op, response, kind, call_units, trace))
+    return response
 
 
-def to_json(obj):
-    """Serialize object to JSON string, handling Decimals."""
-    return json.dumps(obj, cls=DecimalEncoder)
+def _trace_entry(op, response, kind, units, trace):
+    """Build one trace record from a response and the call's key details."""
+    entry = {'op': op}
+    if trace.get('pk'):
+        entry['pk'] = trace['pk']
+        entry['prefix'] = key_prefix(trace['pk'])
+    for name in ('index', 'sk_prefix', 'partitions', 'items', 'cached'):
+        if trace.get(name) is not None:
+            entry[name] = trace[name]
+    if 'items' not in entry:
+        if 'Items' in response:
+            entry['items'] = len(response['Items'])
+            entry['scanned'] = response.get('ScannedCount', len(response['Items']))
+        elif op == 'GetItem':
+            entry['items'] = 1 if response.get('Item') else 0
+        elif 'Responses' in response:
+            entry['items'] = sum(len(found) for found in response['Responses'].values())
+    entry['rcu' if kind == 'read' else 'wcu'] = units
+    return entry
+
+
+def _partitions(keys):
+    """Count keys per partition for a batch call's trace record."""
+    counts = {}
+    for pk in keys:
+        counts[pk] = counts.get(pk, 0) + 1
+    return counts
+
+
+def _forget(pk, sk):
+    """Drop a key from the identity map after a write."""
+    _identity_map.pop((pk, sk), None)
+
+
+def _backoff(attempt):
+    """Exponential backoff delay in seconds for batch retries."""
+    return min(0.05 * (2 ** attempt), 2.0)
 
 
 def put_item(item, condition_expression=None):
     """Put an item into the table."""
     table = _get_table()
-    kwargs = {'Item': item}
+    kwargs = {'Item': item, 'ReturnConsumedCapacity': RETURN_CAPACITY}
     if condition_expression:
         kwargs['ConditionExpression'] = condition_expression
-    return table.put_item(**kwargs)
+    _forget(item['PK'], item['SK'])
+    return _track(table.put_item(**kwargs), 'write', 'PutItem', pk=item['PK'], items=1)
+
 
+def get_item(pk, sk, consistent_read=False):
+    """Get a single item by PK and SK.
 
-def get_item(pk, sk):
-    """Get a single item by PK and SK."""
+    Repeated reads of the same key within a request are served from the
+    identity map. consistent_read=True always reads the table (strongly
+    consistent) and refreshes the identity map.
+    """
+    key = (pk, sk)
+    if key in _identity_map and not consistent_read:
+        if TRACE:
+            _track({}, 'read', 'GetItem', pk=pk, cached=True,
+                   items=1 if _identity_map[key] else 0)
+        return _identity_map[key]
     table = _get_table()
-    response = table.get_item(Key={'PK': pk, 'SK': sk})
-    return response.get('Item')
+    kwargs = {'Key': {'PK': pk, 'SK': sk}, 'ReturnConsumedCapacity': RETURN_CAPACITY}
+    if consistent_read:
+        kwargs['ConsistentRead'] = True
+    response = _track(table.get_item(**kwargs), 'read', 'GetItem', pk=pk)
+    item = response.get('Item')
+    _identity_map[key] = item
+    return item
+
+
+def get_items(keys, consistent_read=False):
+    """Get many items by (PK, SK) tuples, coalesced into BatchGetItem calls.
+
+    Returns a list aligned with keys, with None where no item exists.
+    Keys already loaded in this request are not re-read (unless
+    consistent_read), and duplicates are fetched once.
+    """
+    pending = []
+    for key in dict.fromkeys(tuple(k) for k in keys):
+        if key not in _identity_map or consistent_read:
+            pending.append(key)
+    for start in range(0, len(pending), BATCH_GET_SIZE):
+        _batch_get(pending[start:start + BATCH_GET_SIZE], consistent_read)
+    return [_identity_map.get(tuple(k)) for k in keys]
+
+
+def _batch_get(keys, consistent_read=False):
+    """Fetch up to 100 keys into the identity map, retrying unprocessed keys."""
+    dynamodb = _get_resource()
+    request = {TABLE_NAME: {'Keys': [{'PK': pk, 'SK': sk} for pk, sk in keys]}}
+    if consistent_read:
+        request[TABLE_NAME]['ConsistentRead'] = True
+    found = {}
+    attempt = 0
+    while request:
+        response = _track(dynamodb.batch_get_item(
+            RequestItems=request, ReturnConsumedCapacity=RETURN_CAPACITY), 'read',
+            'BatchGetItem',
+            partitions=_partitions(key['PK'] for key in request[TABLE_NAME]['Keys']))
+        for item in response.get('Responses', {}).get(TABLE_NAME, []):
+            found[(item['PK'], item['SK'])] = item
+        request = response.get('UnprocessedKeys') or {}
+        if request:
+            attempt += 1
+            if attempt > MAX_BATCH_RETRIES:
+                raise RuntimeError('BatchGetItem still had unprocessed keys after retries')
+            time.sleep(_backoff(attempt))
+    for key in keys:
+        _identity_map[key] = found.get(key)
+
+
+def prime(items):
+    """Seed the identity map with full items already read (e.g. by a query)."""
+    for item in items:
+        _identity_map[(item['PK'], item['SK'])] = item
 
 
 def delete_item(pk, sk):
     """Delete a single item by PK and SK."""
     table = _get_table()
-    return table.delete_item(Key={'PK': pk, 'SK': sk})
+    _forget(pk, sk)
+    return _track(table.delete_item(Key={'PK': pk, 'SK': sk},
+                                    ReturnConsumedCapacity=RETURN_CAPACITY), 'write',
+                  'DeleteItem', pk=pk, items=1)
 
 
 def update_item(pk, sk, update_expression, expression_values,
@@ -78,18 +373,166 @@ def update_item(pk, sk, update_expression, expression_values,
         'Key': {'PK': pk, 'SK': sk},
         'UpdateExpression': update_expression,
         'ExpressionAttributeValues': expression_values,
-        'ReturnValues': 'ALL_NEW'
+        'ReturnValues': 'ALL_NEW',
+        'ReturnConsumedCapacity': RETURN_CAPACITY,
     }
     if condition_expression:
         kwargs['ConditionExpression'] = condition_expression
     if expression_attr_names:
         kwargs['ExpressionAttributeNames'] = expression_attr_names
-    return table.update_item(**kwargs)
+    _forget(pk, sk)
+    return _track(table.update_item(**kwargs), 'write', 'UpdateItem', pk=pk, items=1)
 
 
 def query(pk, sk_begins_with=None, index_name=None, filter_expression=None):
-    """Query items by PK and optional SK prefix."""
-    table = _get_table()
+    """Query items by PK and optional SK prefix.
+
+    Sharded GSI1 keys are read from every shard in parallel and merged.
+    """
+    partitions = _gsi1_read_partitions(pk, index_name)
+    if len(partitions) == 1:
+        return list(iter_query(pk, sk_begins_with, index_name, filter_expression))
+
+    def read_shard(partition):
+        return list(_iter_partition(partition, sk_begins_with, index_name,
+                                    filter_expression, None, None, True, False, None))
+    with ThreadPoolExecutor(max_workers=len(partitions)) as pool:
+        shards = list(pool.map(read_shard, partitions))
+    return list(heapq.merge(*shards, key=_gsi1_order))
+
+
+def scan(filter_expression=None):
+    """Scan the entire table with an optional filter."""
+    return list(iter_scan(filter_expression))
+
+
+def iter_query(pk, sk_begins_with=None, index_name=None, filter_expression=None,
+               attributes=None, limit=None, scan_forward=True,
+               consistent_read=False, start_token=None):
+    """Lazily yield items for a query, fetching one page at a time.
+
+    attributes: optional list of attribute names to project.
+    limit: stop after this many items (also the page size when unfiltered).
+    start_token: resume token previously returned by query_page().
+    Sharded GSI1 keys are merged across shards in sort-key order.
+    """
+    partitions = _gsi1_read_partitions(pk, index_name)
+    if len(partitions) == 1:
+        return _iter_partition(pk, sk_begins_with, index_name, filter_expression,
+                               attributes, limit, scan_forward, consistent_read,
+                               start_token)
+    positions = _decode_shard_token(start_token)
+    shards = [
+        _iter_partition(partition, sk_begins_with, index_name, filter_expression,
+                        attributes, None, scan_forward, consistent_read,
+                        _shard_start(positions, partition))
+        for partition in partitions if positions.get(partition, True) is not None
+    ]
+    merged = heapq.merge(*shards, key=_gsi1_order, reverse=not scan_forward)
+    return itertools.islice(merged, limit) if limit else merged
+
+
+def _iter_partition(pk, sk_begins_with, index_name, filter_expression, attributes,
+                    limit, scan_forward, consistent_read, start_token):
+    """iter_query for one physical partition key."""
+    kwargs = _query_kwargs(pk, sk_begins_with, index_name, filter_expression,
+                           attributes, scan_forward, consistent_read)
+    return _iter_items(_reader('Query', _get_table().query, pk, sk_begins_with),
+                       kwargs, limit, start_token)
+
+
+def iter_scan(filter_expression=None, attributes=None, limit=None,
+              consistent_read=False, start_token=None):
+    """Lazily yield items for a full-table scan, fetching one page at a time."""
+    kwargs = _scan_kwargs(filter_expression, attributes, consistent_read)
+    return _iter_items(_reader('Scan', _get_table().scan), kwargs, limit, start_token)
+
+
+def parse_limit(value, maximum):
+    """An optional page-size query param: None if absent, else capped at maximum.
+
+    Raises ValueError unless it is a positive integer.
+    """
+    if value is None or value == '':
+        return None
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
+
+
+def query_page(pk, sk_begins_with=None, index_name=None, filter_expression=None,
+               attributes=None, limit=50, scan_forward=True,
+               consistent_read=False, start_token=None):
+    """Return (items, next_token) for one page of up to `limit` query results.
+
+    next_token is an opaque string to pass back as start_token, or None when
+    the query is exhausted.
+    """
+    partitions = _gsi1_read_partitions(pk, index_name)
+    if len(partitions) > 1:
+        return _sharded_page(partitions, sk_begins_with, index_name, filter_expression,
+                             attributes, limit, scan_forward, start_token)
+    kwargs = _query_kwargs(pk, sk_begins_with, index_name, filter_expression,
+                           attributes, scan_forward, consistent_read)
+    return _read_page(_reader('Query', _get_table().query, pk, sk_begins_with),
+                      kwargs, limit, start_token, _key_names(index_name))
+
+
+def iter_query_many(pks, sk_begins_with=None, index_name=None, filter_expression=None,
+                    attributes=None, limit=None, scan_forward=True):
+    """iter_query over several partition keys, merged into one sort-key order."""
+    shards = [iter_query(pk, sk_begins_with, index_name, filter_expression, attributes,
+                         scan_forward=scan_forward) for pk in pks]
+    merged = heapq.merge(*shards, key=_merge_order(index_name), reverse=not scan_forward)
+    return itertools.islice(merged, limit) if limit else merged
+
+
+def query_page_many(pks, sk_begins_with=None, index_name=None, filter_expression=None,
+                    attributes=None, limit=50, scan_forward=True, start_token=None):
+    """query_page over several partition keys, merged into one sort-key order.
+
+    The token records where each partition stopped, like a sharded query.
+    """
+    partitions = [p for pk in pks for p in _gsi1_read_partitions(pk, index_name)]
+    return _sharded_page(partitions, sk_begins_with, index_name, filter_expression,
+                         attributes, limit, scan_forward, start_token)
+
+
+def scan_page(filter_expression=None, attributes=None, limit=50,
+              consistent_read=False, start_token=None):
+    """Return (items, next_token) for one page of up to `limit` scan results."""
+    kwargs = _scan_kwargs(filter_expression, attributes, consistent_read)
+    return _read_page(_reader('Scan', _get_table().scan), kwargs, limit, start_token,
+                      _key_names(None))
+
+
+def encode_token(key):
+    """Encode a LastEvaluatedKey as an opaque, URL-safe resume token."""
+    raw = json.dumps(key, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    """Decode a resume token. Raises ValueError if it is malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError('Invalid pagination token') from e
+    if not isinstance(key, dict):
+        raise ValueError('Invalid pagination token')
+    return key
+
+
+def _key_names(index_name):
+    """Attributes that make up LastEvaluatedKey for the table or an index."""
+    if index_name:
+        return ('PK', 'SK', 'GSI1PK', 'GSI1SK')
+    return ('PK', 'SK')
+
+
+def _query_kwargs(pk, sk_begins_with, index_name, filter_expression,
+                  attributes, scan_forward, consistent_read):
     key_condition = Key('PK').eq(pk)
     if index_name:
         key_condition = Key('GSI1PK').eq(pk)
@@ -98,41 +541,342 @@ def query(pk, sk_begins_with=None, index_name=None, filter_expression=None):
     elif sk_begins_with:
         key_condition = key_condition & Key('SK').begins_with(sk_begins_with)
 
-    kwargs = {'KeyConditionExpression': key_condition}
+    kwargs = {'KeyConditionExpression': key_condition,
+              'ReturnConsumedCapacity': RETURN_CAPACITY}
     if index_name:
         kwargs['IndexName'] = index_name
     if filter_expression:
         kwargs['FilterExpression'] = filter_expression
+    if not scan_forward:
+        kwargs['ScanIndexForward'] = False
+    if consistent_read:
+        kwargs['ConsistentRead'] = True
+    if attributes:
+        _add_projection(kwargs, attributes, _key_names(index_name))
+    return kwargs
 
-    items = []
+
+def _scan_kwargs(filter_expression, attributes, consistent_read):
+    kwargs = {'ReturnConsumedCapacity': RETURN_CAPACITY}
+    if filter_expression:
+        kwargs['FilterExpression'] = filter_expression
+    if consistent_read:
+        kwargs['ConsistentRead'] = True
+    if attributes:
+        _add_projection(kwargs, attributes, _key_names(None))
+    return kwargs
+
+
+def _add_projection(kwargs, attributes, key_names):
+    """Project only the given attributes (plus keys, needed for resume tokens).
+
+    Every name goes through a placeholder since many common attribute names
+    (name, role, status, ttl) are DynamoDB reserved words.
+    """
+    wanted = list(dict.fromkeys(list(key_names) + list(attributes)))
+    names = {f'#p{i}': attr for i, attr in enumerate(wanted)}
+    kwargs['ProjectionExpression'] = ', '.join(names)
+    kwargs['ExpressionAttributeNames'] = names
+
+
+def _reader(op, read, pk=None, sk_prefix=None):
+    """Wrap a Table.query/scan so every page read is tracked."""
+    def read_page(**kwargs):
+        return _track(read(**kwargs), 'read', op, pk=pk, sk_prefix=sk_prefix,
+                      index=kwargs.get('IndexName'))
+    return read_page
+
+
+def _iter_items(read, kwargs, limit, start_token):
+    """Yield items across pages until exhausted or `limit` items are yielded."""
+    if limit and 'FilterExpression' not in kwargs:
+        # Limit caps items *evaluated*; with a filter, let pages run full size
+        kwargs['Limit'] = limit
+    if start_token:
+        kwargs['ExclusiveStartKey'] = decode_token(start_token)
+    count = 0
     while True:
-        response = table.query(**kwargs)
-        items.extend(response.get('Items', []))
+        response = read(**kwargs)
+        for item in response.get('Items', []):
+            yield item
+            count += 1
+            if limit and count >= limit:
+                return
         if 'LastEvaluatedKey' not in response:
-            break
+            return
         kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
-    return items
 
 
-def scan(filter_expression=None):
-    """Scan the entire table with an optional filter."""
-    table = _get_table()
-    kwargs = {}
-    if filter_expression:
-        kwargs['FilterExpression'] = filter_expression
+def _read_page(read, kwargs, limit, start_token, key_names):
+    """Collect up to `limit` items and a token that resumes right after them.
+
+    Pages can come back short when a filter drops items, so reading continues
+    across pages. If the limit is hit mid-page, the token is built from the
+    last returned item's key instead of the page's LastEvaluatedKey.
+    """
+    if 'FilterExpression' not in kwargs:
+        kwargs['Limit'] = limit
+    if start_token:
+        kwargs['ExclusiveStartKey'] = decode_token(start_token)
     items = []
     while True:
-        response = table.scan(**kwargs)
-        items.extend(response.get('Items', []))
+        response = read(**kwargs)
+        page = response.get('Items', [])
+        for i, item in enumerate(page):
+            items.append(item)
+            if len(items) >= limit:
+                if i == len(page) - 1 and 'LastEvaluatedKey' not in response:
+                    return items, None
+                return items, encode_token({k: item[k] for k in key_names if k in item})
         if 'LastEvaluatedKey' not in response:
-            break
+            return items, None
         kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
-    return items
+
+
+# ============================================================
+# GSI1 write sharding
+# ============================================================
+#
+# A sharded logical key such as PARENT#ROOT is written as PARENT#ROOT#<n>,
+# n = crc32(GSI1SK) % shards, so each item always lands on the same shard.
+# Reads fan out over every shard plus the unsuffixed key, which keeps items
+# written before sharding was enabled visible until
+# scripts/migrate_gsi1_shards.py re-keys them.
+
+def parse_shards(spec):
+    """'PARENT#ROOT=4,ROLE#*=4' -> ({'PARENT#ROOT': 4}, [('ROLE#', 4)])."""
+    exact = {}
+    prefixes = []
+    for rule in filter(None, (part.strip() for part in spec.split(','))):
+        key, _, count = rule.rpartition('=')
+        if not key or not count.isdigit():
+            raise ValueError(f'Invalid GSI1_SHARDS rule: {rule!r}')
+        if key.endswith('*'):
+            prefixes.append((key[:-1], int(count)))
+        else:
+            exact[key] = int(count)
+    # Longest prefix wins
+    prefixes.sort(key=lambda rule: len(rule[0]), reverse=True)
+    return exact, prefixes
+
+
+_shard_rules = parse_shards(GSI1_SHARDS)
+
+
+def configure_shards(spec):
+    """Replace the GSI1 sharding rules (same format as GSI1_SHARDS)."""
+    global _shard_rules
+    _shard_rules = parse_shards(spec)
+
+
+def shard_count(pk, rules=None):
+    """Number of write shards for a logical GSI1PK (1 = not sharded).
+
+    rules: parse_shards() output to check instead of the configured rules.
+    """
+    exact, prefixes = rules or _shard_rules
+    if pk in exact:
+        return exact[pk]
+    for prefix, count in prefixes:
+        if pk.startswith(prefix):
+            return count
+    return 1
+
+
+def gsi1_key(pk, sort_key):
+    """The GSI1PK to write for an item with logical partition pk and GSI1SK sort_key."""
+    count = shard_count(pk)
+    if count <= 1:
+        return pk
+    return f'{pk}#{zlib.crc32(sort_key.encode("utf-8")) % count}'
+
+
+def gsi1_partitions(pk):
+    """Every physical GSI1PK a logical key's items can be stored under."""
+    count = shard_count(pk)
+    if count <= 1:
+        return [pk]
+    return [pk] + [f'{pk}#{n}' for n in range(count)]
+
+
+def _gsi1_read_partitions(pk, index_name):
+    if index_name != 'GSI1':
+        return [pk]
+    return gsi1_partitions(pk)
+
+
+def _gsi1_order(item):
+    """Merge order for items from different shards: index sort key, then table key."""
+    return (item.get('GSI1SK', ''), item['PK'], item['SK'])
+
+
+def _table_order(item):
+    return (item['SK'], item['PK'])
+
+
+def _merge_order(index_name):
+    return _gsi1_order if index_name else _table_order
+
+
+def _decode_shard_token(token):
+    """Per-shard positions from a sharded query_page token.
+
+    Maps partition -> ExclusiveStartKey, or None once that shard is exhausted;
+    shards not listed start from the beginning.
+    """
+    if not token:
+        return {}
+    positions = decode_token(token).get('shards')
+    if not isinstance(positions, dict):
+        raise ValueError('Invalid pagination token')
+    return positions
+
+
+def _shard_start(positions, partition):
+    position = positions.get(partition)
+    return encode_token(position) if position else None
+
+
+def _sharded_page(partitions, sk_begins_with, index_name, filter_expression,
+                  attributes, limit, scan_forward, start_token):
+    """query_page across shards: read a page from each in parallel, merge, cut.
+
+    The token records where every shard stopped, so the next page resumes
+    each one independently.
+    """
+    positions = _decode_shard_token(start_token)
+    live = [p for p in partitions if positions.get(p, True) is not None]
+    key_names = _key_names(index_name)
+
+    def read_shard(partition):
+        kwargs = _query_kwargs(partition, sk_begins_with, index_name, filter_expression,
+                               attributes, scan_forward, False)
+        return _read_page(_reader('Query', _get_table().query, partition, sk_begins_with),
+                          kwargs, limit, _shard_start(positions, partition), key_names)
+
+    with ThreadPoolExecutor(max_workers=len(live) or 1) as pool:
+        pages = dict(zip(live, pool.map(read_shard, live)))
+
+    tagged = [[(item, partition) for item in items]
+              for partition, (items, _) in pages.items()]
+    order = _merge_order(index_name)
+    merged = heapq.merge(*tagged, key=lambda pair: order(pair[0]),
+                         reverse=not scan_forward)
+    taken = list(itertools.islice(merged, limit))
+
+    last = {}
+    used = {}
+    for item, partition in taken:
+        last[partition] = item
+        used[partition] = used.get(partition, 0) + 1
+    for partition, (items, next_token) in pages.items():
+        if used.get(partition, 0) == len(items) and not next_token:
+            positions[partition] = None
+        elif partition in last:
+            positions[partition] = {k: last[partition][k] for k in key_names
+                                    if k in last[partition]}
+    items = [item for item, _ in taken]
+    if all(positions.get(p, True) is None for p in partitions):
+        return items, None
+    return items, encode_token({'shards': positions})
 
 
 def batch_delete(keys):
     """Batch delete items. Keys is a list of {'PK': ..., 'SK': ...} dicts."""
-    table = _get_table()
-    with table.batch_writer() as batch:
-        for key in keys:
-            batch.delete_item(Key=key)
+    batch_write(deletes=keys)
+
+
+def batch_put(items):
+    """Batch put items (unconditional; last write wins)."""
+    batch_write(puts=items)
+
+
+def batch_write(puts=None, deletes=None):
+    """Write a mix of puts and deletes with parallel 25-item BatchWriteItem calls.
+
+    Requests for the same key are collapsed (the later one wins) since
+    BatchWriteItem rejects duplicate keys in one call. UnprocessedItems are
+    retried with exponential backoff; raises RuntimeError if any remain.
+    """
+    requests = {}
+    for item in puts or []:
+        requests[(item['PK'], item['SK'])] = {'PutRequest': {'Item': item}}
+    for key in deletes or []:
+        requests[(key['PK'], key['SK'])] = {
+            'DeleteRequest': {'Key': {'PK': key['PK'], 'SK': key['SK']}}
+        }
+    for pk, sk in requests:
+        _forget(pk, sk)
+
+    requests = list(requests.values())
+    chunks = [requests[i:i + BATCH_WRITE_SIZE]
+              for i in range(0, len(requests), BATCH_WRITE_SIZE)]
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            _write_chunk(chunk)
+        return
+    workers = min(BATCH_WRITE_WORKERS, len(chunks))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # list() re-raises the first chunk failure
+        list(pool.map(_write_chunk, chunks))
+
+
+def _write_chunk(chunk):
+    """Send one BatchWriteItem call, retrying UnprocessedItems with backoff."""
+    dynamodb = _get_resource()
+    request = {TABLE_NAME: chunk}
+    attempt = 0
+    while request:
+        response = _track(dynamodb.batch_write_item(
+            RequestItems=request, ReturnConsumedCapacity=RETURN_CAPACITY), 'write',
+            'BatchWriteItem', items=len(request[TABLE_NAME]),
+            partitions=_partitions(_request_key(r)['PK'] for r in request[TABLE_NAME]))
+        request = response.get('UnprocessedItems') or {}
+        if request:
+            attempt += 1
+            if attempt > MAX_BATCH_RETRIES:
+                raise RuntimeError('BatchWriteItem still had unprocessed items after retries')
+            time.sleep(_backoff(attempt))
+
+
+def _request_key(request):
+    """The key of a BatchWriteItem PutRequest/DeleteRequest."""
+    if 'PutRequest' in request:
+        return request['PutRequest']['Item']
+    return request['DeleteRequest']['Key']
+
+
+def transact_write(actions):
+    """Apply up to 100 writes atomically with TransactWriteItems.
+
+    Each action is a dict with exactly one of 'Put', 'Update', 'Delete' or
+    'ConditionCheck', holding the usual request parameters with plain Python
+    values, e.g.
+        {'Put': {'Item': item, 'ConditionExpression': 'attribute_not_exists(PK)'}}
+        {'Delete': {'Key': {'PK': pk, 'SK': sk}}}
+    TableName is filled in. If any condition fails the whole transaction is
+    cancelled and botocore raises TransactionCanceledException, whose message
+    lists the per-action reasons (e.g. ConditionalCheckFailed).
+    """
+    if len(actions) > TRANSACT_WRITE_LIMIT:
+        raise ValueError(f'transact_write takes at most {TRANSACT_WRITE_LIMIT} actions')
+    transact_items = []
+    for action in actions:
+        (op, params), = action.items()
+        params = dict(params, TableName=TABLE_NAME)
+        key = params.get('Key') or params.get('Item')
+        _forget(key['PK'], key['SK'])
+        transact_items.append({op: params})
+    # The resource's client applies the same Python <-> AttributeValue
+    # conversion as the Table API, so plain values work here
+    return _track(_get_resource().meta.client.transact_write_items(
+        TransactItems=transact_items, ReturnConsumedCapacity=RETURN_CAPACITY), 'write',
+        'TransactWriteItems', items=len(transact_items),
+        partitions=_partitions((p.get('Key') or p.get('Item'))['PK']
+                               for action in transact_items for p in action.values()))
+
+
+def cancellation_reasons(exc):
+    """Per-action reason codes of a cancelled transact_write ('None' where it passed)."""
+    response = getattr(exc, 'response', None) or {}
+    return [reason.get('Code', 'None') for reason in response.get('CancellationReasons', [])]
@@ -0,0 +1,139 @@
+"""Warm-container cache of folder META items.
+
+Folder metadata changes only when folders.handler creates, renames or
+deletes a folder, but ancestor walks read it on almost every request. This
+cache keeps META items (and known misses) in an LRU that survives across
+invocations of the same container.
+
+The whole cache is validated by one item, FOLDER_GENERATION, whose counter
+the folder handlers bump after every folder mutation (bump_generation).
+A second counter on the same item, 'tree_generation', moves only when
+folders are created or deleted; shared.access uses it to tell when
+effective-access sets are out of date.
+The first cache access in a request reads the counter with a strongly
+consistent GetItem; if it moved, the cache is dropped. Cache fills use
+consistent reads too, so an item cached under a generation is never older
+than that generation.
+"""
+
+import os
+from collections import OrderedDict
+
+from shared import db
+
+
+GENERATION_PK = 'SYSTEM#FOLDER_GENERATION'
+GENERATION_SK = 'META'
+
+MAX_ENTRIES = int(os.environ.get('FOLDER_CACHE_SIZE', '10000'))
+
+# folder_id -> META item, or None for a folder known not to exist
+_cache = OrderedDict()
+# Counter value the cached items belong to
+_generation = None
+# Tree-structure counter read with it
+_tree_generation = None
+# Whether the counter has been checked during the current request
+_validated = False
+
+
+@db.on_begin_request
+def _reset_request():
+    global _validated
+    _validated = False
+
+
+def _validate():
+    """Check the generation counter once per request; drop the cache if it moved."""
+    global _generation, _tree_generation, _validated
+    if _validated:
+        return
+    counter = db.get_item(GENERATION_PK, GENERATION_SK, consistent_read=True) or {}
+    generation = counter.get('generation', 0)
+    if generation != _generation:
+        _cache.clear()
+        _generation = generation
+    _tree_generation = counter.get('tree_generation', 0)
+    _validated = True
+
+
+def tree_generation():
+    """The tree-structure counter (moves when folders are created or deleted)."""
+    _validate()
+    return _tree_generation
+
+
+def _store(folder_id, item):
+    _cache[folder_id] = item
+    _cache.move_to_end(folder_id)
+    while len(_cache) > MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def get(folder_id):
+    """Return a folder's META item, or None if it does not exist."""
+    _validate()
+    if folder_id in _cache:
+        _cache.move_to_end(folder_id)
+        return _cache[folder_id]
+    item = db.get_item(f'FOLDER#{folder_id}', 'META', consistent_read=True)
+    _store(folder_id, item)
+    return item
+
+
+def get_many(folder_ids):
+    """Return META items aligned with folder_ids, batch-loading the misses."""
+    _validate()
+    missing = [fid for fid in dict.fromkeys(folder_ids) if fid not in _cache]
+    if missing:
+        items = db.get_items([(f'FOLDER#{fid}', 'META') for fid in missing],
+                             consistent_read=True)
+        for fid, item in zip(missing, items):
+            _store(fid, item)
+    return [get(fid) for fid in folder_ids]
+
+
+def ancestry(folder):
+    """(ancestor_ids, ancestor_names) of a META item, from the root down to its parent.
+
+    Comes straight from the item's stored chain; folders written before
+    chains were stored (see scripts/backfill_folder_ancestors.py) are walked
+    up to the nearest folder that has one.
+    """
+    if 'ancestor_ids' in folder:
+        return list(folder['ancestor_ids']), list(folder.get('ancestor_names', []))
+    ids, names = [], []
+    current_id = folder.get('parent_id')
+    while current_id and current_id != 'ROOT' and current_id not in ids:
+        parent = get(current_id)
+        if not parent:
+            break
+        ids.append(current_id)
+        names.append(parent.get('name', current_id))
+        if 'ancestor_ids' in parent:
+            return (list(parent['ancestor_ids']) + ids[::-1],
+                    list(parent.get('ancestor_names', [])) + names[::-1])
+        current_id = parent.get('parent_id')
+    return ids[::-1], names[::-1]
+
+
+def bump_generation(structural=False):
+    """Invalidate every container's cache. Call after any folder mutation.
+
+    structural: folders were created or deleted (not just renamed).
+    """
+    expression = 'ADD generation :one'
+    if structural:
+        expression += ', tree_generation :one'
+    db.update_item(GENERATION_PK, GENERATION_SK, expression, {':one': 1})
+    clear()
+
+
+@db.on_use_backend
+def clear():
+    """Drop the local cache (done automatically when db.use_backend() is called)."""
+    global _generation, _tree_generation, _validated
+    _cache.clear()
+    _generation = None
+    _tree_generation = None
+    _validated = False
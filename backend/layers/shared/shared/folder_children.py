@@ -0,0 +1,159 @@
+"""Name-sorted child listings for the lazy folder browser.
+
+Every folder has one row in its parent's listing partition:
+
+    PK: CHILDREN#<parent_id>   SK: NAME#<normalized name>
+
+holding folder_id, name, parent_id, created_at and child_count (how many
+folders sit directly beneath it). One level of the tree, sorted by name and
+with a has-children flag per entry, is then one paginated query.
+
+The row is also the folder's claim on its name among its siblings.
+folders.handler writes it with claim() in the same transaction as the
+folder's META item, and swaps it with rename_actions() on rename, so a
+duplicate name cancels the transaction in constant time, even when two
+writes race.
+
+folders.handler keeps the rows current on create, rename and delete, and
+scripts/backfill_folder_children.py builds them for existing trees. Until
+that has run (and recorded so with mark_migrated()), folders created earlier
+may have no row, or one keyed by their unnormalized name: create and rename
+then also check siblings over GSI1 (legacy_conflict()), and rows are looked
+up under both keys (keys()).
+"""
+
+import time
+import unicodedata
+
+from shared import db
+
+
+ATTRIBUTES = ['folder_id', 'name', 'parent_id', 'created_at', 'child_count']
+# Written by the backfill once every folder has a normalized row
+MIGRATION_PK = 'SYSTEM#FOLDER_CHILDREN'
+MIGRATION_SK = 'BACKFILL'
+
+_migrated = False
+
+
+def normalize(name):
+    """A folder name as compared for uniqueness (Unicode NFC, so different
+    encodings of the same text collide)."""
+    return unicodedata.normalize('NFC', name)
+
+
+def key(folder):
+    """Table key of a folder's row in its parent's listing (from its META item)."""
+    return {'PK': f'CHILDREN#{folder.get("parent_id", "ROOT")}',
+            'SK': f'NAME#{normalize(folder["name"])}'}
+
+
+def keys(folder):
+    """key(folder), then the unnormalized-name key a pre-backfill row may still use."""
+    k = key(folder)
+    legacy = {'PK': k['PK'], 'SK': f'NAME#{folder["name"]}'}
+    return [k] if legacy == k else [k, legacy]
+
+
+def row(folder, child_count=0):
+    """A folder's listing row, given its META item."""
+    item = key(folder)
+    item.update({
+        'folder_id': folder['PK'][len('FOLDER#'):],
+        'name': folder['name'],
+        'parent_id': folder.get('parent_id', 'ROOT'),
+        'created_at': folder.get('created_at'),
+        'child_count': child_count,
+    })
+    return item
+
+
+def adjust_count(folder, delta):
+    """Add delta to a folder's child_count (no-op for ROOT or a missing row)."""
+    if folder is None:
+        return
+    for k in keys(folder):
+        try:
+            db.update_item(k['PK'], k['SK'], 'ADD child_count :d', {':d': delta},
+                           condition_expression='attribute_exists(PK)')
+            return
+        except Exception as e:
+            if 'ConditionalCheckFailedException' not in str(e):
+                raise
+
+
+def claim(folder):
+    """transact_write action putting a new folder's row; fails if the name is taken."""
+    return {'Put': {'Item': row(folder), 'ConditionExpression': 'attribute_not_exists(PK)'}}
+
+
+def rename_actions(folder, new_name):
+    """transact_write actions moving a folder's row to new_name, keeping its child_count.
+
+    The new row's put fails if a sibling holds the name; the old row's
+    delete fails if its child_count changed after it was read here.
+    """
+    for old in keys(folder):
+        current = db.get_item(old['PK'], old['SK'], consistent_read=True)
+        if current:
+            break
+    else:
+        old = key(folder)
+    count = current.get('child_count', 0) if current else 0
+    new = row(dict(folder, name=new_name), count)
+    if new['SK'] == old['SK']:
+        return [{'Put': {'Item': new}}]
+    delete = {'Key': old}
+    if current:
+        delete.update(ConditionExpression='child_count = :c',
+                      ExpressionAttributeValues={':c': count})
+    return [{'Put': {'Item': new, 'ConditionExpression': 'attribute_not_exists(PK)'}},
+            {'Delete': delete}]
+
+
+def migrated():
+    """Whether the backfill has recorded that every folder has a normalized row.
+
+    Cached once true; until then each call reads the marker item.
+    """
+    global _migrated
+    if not _migrated:
+        _migrated = db.get_item(MIGRATION_PK, MIGRATION_SK) is not None
+    return _migrated
+
+
+def mark_migrated():
+    """Record that every folder has a normalized row (run by the backfill)."""
+    db.put_item({'PK': MIGRATION_PK, 'SK': MIGRATION_SK, 'completed_at': int(time.time())})
+
+
+def legacy_conflict(parent_id, name, folder_id=None):
+    """Whether another folder under parent_id already has name, checked over GSI1.
+
+    For use before migrated(): such a sibling may have no listing row to
+    claim the name.
+    """
+    wanted = normalize(name)
+    return any(item.get('SK') == 'META' and item['PK'] != f'FOLDER#{folder_id}'
+               and normalize(item.get('name', '')) == wanted
+               for item in db.iter_query(f'PARENT#{parent_id}', index_name='GSI1',
+                                         attributes=['PK', 'SK', 'name']))
+
+
+def page(parent_id, limit=100, start_token=None):
+    """(rows, next_token) for one page of a folder's (or ROOT's) children, by name."""
+    return db.query_page(f'CHILDREN#{parent_id}', sk_begins_with='NAME#',
+                         attributes=ATTRIBUTES, limit=limit, start_token=start_token)
+
+
+def get_many(folders):
+    """The listing rows of several folders (META items), None where missing."""
+    keys = [key(f) for f in folders]
+    return db.get_items([(k['PK'], k['SK']) for k in keys])
+
+
+@db.on_use_backend
+def clear():
+    """Forget the migration marker (done automatically when db.use_backend() is called)."""
+    global _migrated
+    _migrated = False
@@ -0,0 +1,1142 @@
+"""In-process DynamoDB stand-in for local runs, tests and profiling.
+
+Implements the slice of the boto3 DynamoDB *service resource* that shared.db
+uses, with the same request/response shapes and plain Python values:
+
+    resource.Table(name).get_item / put_item / delete_item / update_item /
+                         query / scan
+    resource.batch_get_item / batch_write_item
+    resource.meta.client.transact_write_items
+
+Each table keeps its partitions in sorted structures (bisect over sort keys),
+so queries, begins_with ranges and paginated scans cost O(log n + page)
+rather than a full pass. GSI1 is maintained on every write. Condition,
+filter, key-condition, projection and update expressions are parsed from the
+same strings/objects boto3 accepts. Numbers come back as int/float, the
+same as shared.db's NativeDeserializer produces for real DynamoDB.
+ReturnConsumedCapacity is honoured with estimates from the item sizes
+(4 KB read units, 1 KB write units, GSI writes and doubled transactions).
+Selected in shared.db with DB_BACKEND=memory or
+db.use_backend(MemoryDynamoDB()).
+"""
+
+import bisect
+import re
+import threading
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import Binary
+from botocore.exceptions import ClientError
+
+
+# DynamoDB caps a query/scan page at 1 MB of item data
+MAX_PAGE_BYTES = 1024 * 1024
+
+# Secondary indexes: name -> (hash key attribute, range key attribute)
+DEFAULT_INDEXES = {'GSI1': ('GSI1PK', 'GSI1SK')}
+
+
+def _client_error(code, message, operation, **extra):
+    response = {'Error': {'Code': code, 'Message': message}}
+    response.update(extra)
+    return ClientError(response, operation)
+
+
+def _validation_error(message, operation):
+    return _client_error('ValidationException', message, operation)
+
+
+# ============================================================
+# Values
+# ============================================================
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _normalize(value):
+    """Convert a Python value to what a read returns (Decimal becomes int/float)."""
+    if isinstance(value, bool) or value is None or isinstance(value, (str, int)):
+        return value
+    if isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            raise TypeError('Infinity and NaN not supported')
+        return value
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return Binary(bytes(value))
+    if isinstance(value, Binary):
+        return value
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        if not value:
+            raise _validation_error(
+                'One or more parameter values were invalid: An set may not be empty',
+                'PutItem')
+        return {_normalize(v) for v in value}
+    raise TypeError(f'Unsupported type "{type(value)}" for value "{value}"')
+
+
+def _copy(value):
+    """Copy a stored value so callers can never mutate the store."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def _value_size(value):
+    """Approximate DynamoDB storage size of a value in bytes."""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bool, type(None))):
+        return 1
+    if _is_number(value):
+        return len(repr(value)) // 2 + 2
+    if isinstance(value, Binary):
+        return len(value.value)
+    if isinstance(value, dict):
+        return 3 + sum(len(k) + 1 + _value_size(v) for k, v in value.items())
+    if isinstance(value, (list, set)):
+        return 3 + sum(1 + _value_size(v) for v in value)
+    return 8
+
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes (names plus values)."""
+    return sum(len(k.encode('utf-8')) + _value_size(v) for k, v in item.items())
+
+
+# ============================================================
+# Capacity estimates
+# ============================================================
+
+def read_units(size, consistent=False):
+    """RCUs to read `size` bytes: 4 KB units, halved when eventually consistent."""
+    units = max(1, -(-size // 4096))
+    return units if consistent else units / 2
+
+
+def write_units(size):
+    """WCUs to write an item of `size` bytes: 1 KB units."""
+    return max(1, -(-size // 1024))
+
+
+def _consumed(mode, table_name, kind, table_units, index_units=None):
+    """Build a ConsumedCapacity entry, or None when it was not requested.
+
+    kind is 'Read' or 'Write'; index_units maps index name -> units.
+    """
+    if mode not in ('TOTAL', 'INDEXES'):
+        return None
+    index_units = index_units or {}
+    total = table_units + sum(index_units.values())
+    entry = {'TableName': table_name, 'CapacityUnits': total,
+             f'{kind}CapacityUnits': total}
+    if mode == 'INDEXES':
+        entry['Table'] = {'CapacityUnits': table_units, f'{kind}CapacityUnits': table_units}
+        if index_units:
+            entry['GlobalSecondaryIndexes'] = {
+                name: {'CapacityUnits': units, f'{kind}CapacityUnits': units}
+                for name, units in index_units.items()
+            }
+    return entry
+
+
+def _add_units(target, source):
+    for name, value in source.items():
+        if isinstance(value, dict):
+            _add_units(target.setdefault(name, {}), value)
+        elif name != 'TableName':
+            target[name] = target.get(name, 0) + value
+
+
+def _scale_units(entry, factor):
+    if entry is None:
+        return None
+    return {name: _scale_units(value, factor) if isinstance(value, dict)
+            else value if name == 'TableName' else value * factor
+            for name, value in entry.items()}
+
+
+def _sum_consumed(entries):
+    """Merge per-item entries into one per table, as batch calls report them."""
+    merged = {}
+    for entry in entries:
+        if entry:
+            _add_units(merged.setdefault(entry['TableName'],
+                                         {'TableName': entry['TableName']}), entry)
+    return list(merged.values())
+
+
+def _respond(response, consumed):
+    if consumed:
+        response['ConsumedCapacity'] = consumed
+    return response
+
+
+# ============================================================
+# Expression parsing
+# ============================================================
+
+_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<op><>|<=|>=|=|<|>|\(|\)|,|\.|\[|\]|\+|-)
+      | (?P<name>\#[A-Za-z0-9_]+)
+      | (?P<value>:[A-Za-z0-9_]+)
+      | (?P<number>\d+)
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )''', re.VERBOSE)
+
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'REMOVE', 'ADD', 'DELETE'}
+
+
+def _tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f'Invalid expression near: {expression[pos:]!r}')
+        pos = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'word' and text.upper() in _KEYWORDS:
+            tokens.append(('kw', text.upper()))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser for condition, update and projection expressions.
+
+    Produces small tuple ASTs:
+        ('path', [part, ...])      part is an attribute name or list index
+        ('value', value)
+        ('size', path)
+        ('cmp', op, left, right) / ('between', x, lo, hi) / ('in', x, [..])
+        ('and', a, b) / ('or', a, b) / ('not', a)
+        ('func', name, [args])
+        ('arith', op, left, right)
+    """
+
+    def __init__(self, expression, names, values):
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    # -- token helpers --
+    def peek(self, offset=0):
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def accept(self, kind, text=None):
+        token = self.peek()
+        if token[0] == kind and (text is None or token[1] == text):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, kind, text=None):
+        if not self.accept(kind, text):
+            raise ValueError(f'Expected {text or kind}, got {self.peek()[1]!r}')
+
+    def done(self):
+        return self.pos >= len(self.tokens)
+
+    # -- operands --
+    def name(self):
+        kind, text = self.take()
+        if kind == 'name':
+            if text not in self.names:
+                raise ValueError(f'Undefined attribute name placeholder {text}')
+            return self.names[text]
+        if kind == 'word':
+            return text
+        raise ValueError(f'Expected attribute name, got {text!r}')
+
+    def path(self):
+        parts = [self.name()]
+        while True:
+            if self.accept('op', '.'):
+                parts.append(self.name())
+            elif self.accept('op', '['):
+                kind, text = self.take()
+                if kind != 'number':
+                    raise ValueError('Expected list index')
+                parts.append(int(text))
+                self.expect('op', ']')
+            else:
+                return ('path', parts)
+
+    def operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.pos += 1
+            if text not in self.values:
+                raise ValueError(f'Undefined attribute value placeholder {text}')
+            return ('value', _normalize(self.values[text]))
+        if kind == 'word' and self.peek(1) == ('op', '('):
+            self.pos += 2
+            args = [self.value_expr()]
+            while self.accept('op', ','):
+                args.append(self.value_expr())
+            self.expect('op', ')')
+            if text == 'size':
+                return ('size', args[0])
+            return ('func', text, args)
+        return self.path()
+
+    def value_expr(self):
+        left = self.operand()
+        kind, text = self.peek()
+        if kind == 'op' and text in ('+', '-'):
+            self.pos += 1
+            return ('arith', text, left, self.operand())
+        return left
+
+    # -- conditions --
+    def condition(self):
+        node = self.conjunction()
+        while self.accept('kw', 'OR'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.accept('kw', 'AND'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.accept('kw', 'NOT'):
+            return ('not', self.negation())
+        return self.predicate()
+
+    def predicate(self):
+        if self.accept('op', '('):
+            node = self.condition()
+            self.expect('op', ')')
+            return node
+        left = self.operand()
+        if left[0] == 'func':
+            return left
+        kind, text = self.peek()
+        if kind == 'op' and text in ('=', '<>', '<', '<=', '>', '>='):
+            self.pos += 1
+            return ('cmp', text, left, self.operand())
+        if self.accept('kw', 'BETWEEN'):
+            low = self.operand()
+            self.expect('kw', 'AND')
+            return ('between', left, low, self.operand())
+        if self.accept('kw', 'IN'):
+            self.expect('op', '(')
+            options = [self.operand()]
+            while self.accept('op', ','):
+                options.append(self.operand())
+            self.expect('op', ')')
+            return ('in', left, options)
+        raise ValueError(f'Invalid condition near {text!r}')
+
+    # -- update expressions --
+    def update(self):
+        actions = []
+        while not self.done():
+            kind, clause = self.take()
+            if kind != 'kw' or clause not in ('SET', 'REMOVE', 'ADD', 'DELETE'):
+                raise ValueError(f'Invalid update clause {clause!r}')
+            while True:
+                target = self.path()
+                if clause == 'SET':
+                    self.expect('op', '=')
+                    actions.append(('SET', target, self.value_expr()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', target, None))
+                else:
+                    actions.append((clause, target, self.operand()))
+                if not self.accept('op', ','):
+                    break
+        return actions
+
+    def projection(self):
+        paths = [self.path()]
+        while self.accept('op', ','):
+            paths.append(self.path())
+        return paths
+
+
+def _parse(expression, names, values, kind='condition'):
+    parser = _Parser(expression, names, values)
+    node = getattr(parser, kind)()
+    if not parser.done():
+        raise ValueError(f'Unexpected token {parser.peek()[1]!r}')
+    return node
+
+
+# ============================================================
+# Expression evaluation
+# ============================================================
+
+_MISSING = object()
+
+
+def _resolve(item, path):
+    current = item
+    for part in path[1]:
+        if isinstance(part, int):
+            if not isinstance(current, list) or part >= len(current):
+                return _MISSING
+            current = current[part]
+        else:
+            if not isinstance(current, dict) or part not in current:
+                return _MISSING
+            current = current[part]
+    return current
+
+
+def _operand(item, node):
+    kind = node[0]
+    if kind == 'value':
+        return node[1]
+    if kind == 'path':
+        return _resolve(item, node)
+    if kind == 'size':
+        value = _operand(item, node[1])
+        if value is _MISSING:
+            return _MISSING
+        if isinstance(value, Binary):
+            return len(value.value)
+        return len(value)
+    if kind == 'arith':
+        left, right = _operand(item, node[2]), _operand(item, node[3])
+        if not _is_number(left) or not _is_number(right):
+            raise ValueError('An operand in the update expression has an incorrect data type')
+        return left + right if node[1] == '+' else left - right
+    if kind == 'func':
+        name, args = node[1], node[2]
+        if name == 'if_not_exists':
+            existing = _operand(item, args[0])
+            return _operand(item, args[1]) if existing is _MISSING else existing
+        if name == 'list_append':
+            left, right = _operand(item, args[0]), _operand(item, args[1])
+            return list(left) + list(right)
+    raise ValueError(f'Unsupported operand {node!r}')
+
+
+def _comparable(a, b):
+    return (isinstance(a, str) and isinstance(b, str)) or \
+        (_is_number(a) and _is_number(b)) or \
+        (isinstance(a, Binary) and isinstance(b, Binary))
+
+
+def _type_name(value):
+    if isinstance(value, str):
+        return 'S'
+    if isinstance(value, bool):
+        return 'BOOL'
+    if _is_number(value):
+        return 'N'
+    if isinstance(value, Binary):
+        return 'B'
+    if value is None:
+        return 'NULL'
+    if isinstance(value, dict):
+        return 'M'
+    if isinstance(value, list):
+        return 'L'
+    if isinstance(value, set):
+        sample = next(iter(value))
+        return {'S': 'SS', 'N': 'NS', 'B': 'BS'}[_type_name(sample)]
+    return '?'
+
+
+def _evaluate(item, node):
+    kind = node[0]
+    if kind == 'and':
+        return _evaluate(item, node[1]) and _evaluate(item, node[2])
+    if kind == 'or':
+        return _evaluate(item, node[1]) or _evaluate(item, node[2])
+    if kind == 'not':
+        return not _evaluate(item, node[1])
+    if kind == 'cmp':
+        op = node[1]
+        left, right = _operand(item, node[2]), _operand(item, node[3])
+        if left is _MISSING or right is _MISSING:
+            return op == '<>' and not (left is _MISSING and right is _MISSING)
+        if op == '=':
+            return left == right and _type_name(left) == _type_name(right)
+        if op == '<>':
+            return left != right or _type_name(left) != _type_name(right)
+        if not _comparable(left, right):
+            return False
+        if isinstance(left, Binary):
+            left, right = left.value, right.value
+        return {'<': left < right, '<=': left <= right,
+                '>': left > right, '>=': left >= right}[op]
+    if kind == 'between':
+        value = _operand(item, node[1])
+        low, high = _operand(item, node[2]), _operand(item, node[3])
+        return (value is not _MISSING and _comparable(value, low)
+                and _comparable(value, high) and low <= value <= high)
+    if kind == 'in':
+        value = _operand(item, node[1])
+        return value is not _MISSING and any(
+            value == _operand(item, option) for option in node[2])
+    if kind == 'func':
+        name, args = node[1], node[2]
+        if name == 'attribute_exists':
+            return _operand(item, args[0]) is not _MISSING
+        if name == 'attribute_not_exists':
+            return _operand(item, args[0]) is _MISSING
+        if name == 'attribute_type':
+            value = _operand(item, args[0])
+            return value is not _MISSING and _type_name(value) == _operand(item, args[1])
+        if name == 'begins_with':
+            value, prefix = _operand(item, args[0]), _operand(item, args[1])
+            if isinstance(value, str) and isinstance(prefix, str):
+                return value.startswith(prefix)
+            if isinstance(value, Binary) and isinstance(prefix, Binary):
+                return value.value.startswith(prefix.value)
+            return False
+        if name == 'contains':
+            value, operand = _operand(item, args[0]), _operand(item, args[1])
+            if isinstance(value, str) and isinstance(operand, str):
+                return operand in value
+            if isinstance(value, (list, set)):
+                return operand in value
+            return False
+    raise ValueError(f'Unsupported condition {node!r}')
+
+
+def _set_path(item, path, value):
+    parts = path[1]
+    target = item
+    for part in parts[:-1]:
+        target = target[part]
+    last = parts[-1]
+    if isinstance(last, int) and last >= len(target):
+        target.append(value)
+    else:
+        target[last] = value
+
+
+def _remove_path(item, path):
+    parts = path[1]
+    target = item
+    for part in parts[:-1]:
+        if isinstance(target, dict) and part not in target:
+            return
+        target = target[part]
+    last = parts[-1]
+    if isinstance(last, int):
+        if last < len(target):
+            del target[last]
+    else:
+        target.pop(last, None)
+
+
+def _apply_update(item, actions):
+    """Apply parsed update actions to item in place."""
+    # Every right-hand side is evaluated against the pre-update item
+    before = _copy(item)
+    for clause, path, node in actions:
+        if clause == 'SET':
+            _set_path(item, path, _copy(_operand(before, node)))
+        elif clause == 'REMOVE':
+            _remove_path(item, path)
+        elif clause == 'ADD':
+            delta = _operand(before, node)
+            current = _resolve(before, path)
+            if current is _MISSING:
+                _set_path(item, path, _copy(delta))
+            elif _is_number(current):
+                _set_path(item, path, current + delta)
+            else:
+                _set_path(item, path, set(current) | set(delta))
+        elif clause == 'DELETE':
+            current = _resolve(before, path)
+            if current is not _MISSING:
+                remaining = set(current) - set(_operand(before, node))
+                if remaining:
+                    _set_path(item, path, remaining)
+                else:
+                    _remove_path(item, path)
+
+
+def _project(item, paths):
+    if paths is None:
+        return _copy(item)
+    result = {}
+    for path in paths:
+        value = _resolve(item, path)
+        if value is _MISSING:
+            continue
+        # Nested projections keep only the outermost attribute
+        result[path[1][0]] = _copy(item[path[1][0]])
+    return result
+
+
+# ============================================================
+# Storage
+# ============================================================
+
+class _SortedIndex:
+    """hash key -> sorted list of (range key, PK, SK) entries."""
+
+    def __init__(self):
+        self.partitions = {}
+        self.hash_keys = []
+
+    def add(self, hash_key, entry):
+        entries = self.partitions.get(hash_key)
+        if entries is None:
+            entries = self.partitions[hash_key] = []
+            bisect.insort(self.hash_keys, hash_key)
+        bisect.insort(entries, entry)
+
+    def remove(self, hash_key, entry):
+        entries = self.partitions.get(hash_key)
+        if not entries:
+            return
+        i = bisect.bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+        if not entries:
+            del self.partitions[hash_key]
+            del self.hash_keys[bisect.bisect_left(self.hash_keys, hash_key)]
+
+
+class MemoryTable:
+    """One single-table-design table: PK/SK primary key plus GSIs."""
+
+    def __init__(self, name, indexes=None):
+        self.name = name
+        self.indexes = dict(DEFAULT_INDEXES if indexes is None else indexes)
+        self._lock = threading.RLock()
+        # (PK, SK) -> (item, size); ordering lives in the sorted indexes
+        self._items = {}
+        self._primary = _SortedIndex()
+        self._secondary = {name: _SortedIndex() for name in self.indexes}
+
+    def __len__(self):
+        return len(self._items)
+
+    # -- raw storage --
+    def _key(self, key, operation):
+        pk, sk = key.get('PK'), key.get('SK')
+        if not isinstance(pk, str) or not isinstance(sk, str) or not pk or not sk:
+            raise _validation_error(
+                'The provided key element does not match the schema', operation)
+        return pk, sk
+
+    def _index_entries(self, item):
+        for name, (hash_attr, range_attr) in self.indexes.items():
+            hash_key, range_key = item.get(hash_attr), item.get(range_attr)
+            if isinstance(hash_key, str) and isinstance(range_key, str):
+                yield name, hash_key, (range_key, item['PK'], item['SK'])
+
+    def _store(self, item):
+        key = (item['PK'], item['SK'])
+        self._discard(key)
+        self._items[key] = (item, item_size(item))
+        self._primary.add(key[0], (key[1], key[0], key[1]))
+        for name, hash_key, entry in self._index_entries(item):
+            self._secondary[name].add(hash_key, entry)
+
+    def _discard(self, key):
+        existing = self._items.pop(key, None)
+        if existing is None:
+            return None
+        item = existing[0]
+        self._primary.remove(key[0], (key[1], key[0], key[1]))
+        for name, hash_key, entry in self._index_entries(item):
+            self._secondary[name].remove(hash_key, entry)
+        return item
+
+    def _get(self, key):
+        stored = self._items.get(key)
+        return stored[0] if stored else None
+
+    def _write_consumed(self, mode, old, new):
+        """Estimate a write: the larger item image, plus each GSI entry touched."""
+        if mode not in ('TOTAL', 'INDEXES'):
+            return None
+        old_size = item_size(old) if old else 0
+        new_size = item_size(new) if new else 0
+        before = {name: (h, e) for name, h, e in self._index_entries(old)} if old else {}
+        after = {name: (h, e) for name, h, e in self._index_entries(new)} if new else {}
+        index_units = {}
+        for name in self.indexes:
+            units = 0
+            if name in before and name in after and before[name] == after[name]:
+                units = write_units(new_size)
+            else:
+                if name in before:
+                    units += write_units(old_size)
+                if name in after:
+                    units += write_units(new_size)
+            if units:
+                index_units[name] = units
+        return _consumed(mode, self.name, 'Write',
+                         write_units(max(old_size, new_size)), index_units)
+
+    def bulk_load(self, items):
+        """Insert many items directly, bypassing request validation (for seeding)."""
+        with self._lock:
+            for item in items:
+                self._store(_normalize(dict(item)))
+
+    # -- expressions --
+    @staticmethod
+    def _expression(expression, names, values, builder, is_key_condition=False):
+        """Turn a boto3 condition object or string into a parsed AST."""
+        names = dict(names or {})
+        values = dict(values or {})
+        if isinstance(expression, ConditionBase):
+            built = builder.build_expression(expression, is_key_condition=is_key_condition)
+            names.update(built.attribute_name_placeholders)
+            values.update(built.attribute_value_placeholders)
+            expression = built.condition_expression
+        return _parse(expression, names, values)
+
+    def _check_condition(self, kwargs, existing, operation):
+        condition = kwargs.get('ConditionExpression')
+        if condition is None:
+            return
+        node = self._expression(condition, kwargs.get('ExpressionAttributeNames'),
+                                kwargs.get('ExpressionAttributeValues'),
+                                ConditionExpressionBuilder())
+        if not _evaluate(existing or {}, node):
+            raise _client_error('ConditionalCheckFailedException',
+                                'The conditional request failed', operation)
+
+    # -- single-item operations --
+    def get_item(self, Key, ConsistentRead=False, ProjectionExpression=None,
+                 ExpressionAttributeNames=None, ReturnConsumedCapacity='NONE', **_):
+        key = self._key(Key, 'GetItem')
+        with self._lock:
+            stored = self._items.get(key)
+            consumed = _consumed(ReturnConsumedCapacity, self.name, 'Read',
+                                 read_units(stored[1] if stored else 0, ConsistentRead))
+            if stored is None:
+                return _respond({}, consumed)
+            paths = None
+            if ProjectionExpression:
+                paths = _parse(ProjectionExpression, ExpressionAttributeNames, None,
+                               'projection')
+            return _respond({'Item': _project(stored[0], paths)}, consumed)
+
+    def put_item(self, Item, ReturnValues='NONE', ReturnConsumedCapacity='NONE',
+                 **kwargs):
+        item = _normalize(dict(Item))
+        key = self._key(item, 'PutItem')
+        with self._lock:
+            existing = self._get(key)
+            self._check_condition(kwargs, existing, 'PutItem')
+            self._store(item)
+        response = {}
+        if ReturnValues == 'ALL_OLD' and existing is not None:
+            response['Attributes'] = _copy(existing)
+        return _respond(response, self._write_consumed(ReturnConsumedCapacity,
+                                                       existing, item))
+
+    def delete_item(self, Key, ReturnValues='NONE', ReturnConsumedCapacity='NONE',
+                    **kwargs):
+        key = self._key(Key, 'DeleteItem')
+        with self._lock:
+            self._check_condition(kwargs, self._get(key), 'DeleteItem')
+            existing = self._discard(key)
+        response = {}
+        if ReturnValues == 'ALL_OLD' and existing is not None:
+            response['Attributes'] = _copy(existing)
+        return _respond(response, self._write_consumed(ReturnConsumedCapacity,
+                                                       existing, None))
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ReturnValues='NONE',
+                    ReturnConsumedCapacity='NONE', **kwargs):
+        key = self._key(Key, 'UpdateItem')
+        actions = _parse(UpdateExpression, ExpressionAttributeNames,
+                         ExpressionAttributeValues, 'update')
+        kwargs['ExpressionAttributeNames'] = ExpressionAttributeNames
+        kwargs['ExpressionAttributeValues'] = ExpressionAttributeValues
+        with self._lock:
+            existing = self._get(key)
+            self._check_condition(kwargs, existing, 'UpdateItem')
+            item = _copy(existing) if existing else {'PK': key[0], 'SK': key[1]}
+            try:
+                _apply_update(item, actions)
+            except (ValueError, KeyError, TypeError, IndexError) as e:
+                raise _validation_error(str(e), 'UpdateItem') from e
+            if (item.get('PK'), item.get('SK')) != key:
+                raise _validation_error(
+                    'Cannot update attribute PK/SK. This attribute is part of the key',
+                    'UpdateItem')
+            self._store(item)
+        response = {}
+        if ReturnValues == 'ALL_NEW':
+            response['Attributes'] = _copy(item)
+        elif ReturnValues == 'ALL_OLD' and existing is not None:
+            response['Attributes'] = _copy(existing)
+        return _respond(response, self._write_consumed(ReturnConsumedCapacity,
+                                                       existing, item))
+
+    # -- query / scan --
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None,
+              ProjectionExpression=None, ExpressionAttributeNames=None,
+              ExpressionAttributeValues=None, Limit=None, ExclusiveStartKey=None,
+              ScanIndexForward=True, ConsistentRead=False, Select=None,
+              ReturnConsumedCapacity='NONE', **_):
+        if IndexName and ConsistentRead:
+            raise _validation_error(
+                'Consistent reads are not supported on global secondary indexes', 'Query')
+        hash_attr, range_attr = 'PK', 'SK'
+        if IndexName:
+            if IndexName not in self.indexes:
+                raise _validation_error(
+                    f'The table does not have the specified index: {IndexName}', 'Query')
+            hash_attr, range_attr = self.indexes[IndexName]
+
+        builder = ConditionExpressionBuilder()
+        key_node = self._expression(KeyConditionExpression, ExpressionAttributeNames,
+                                    ExpressionAttributeValues, builder,
+                                    is_key_condition=True)
+        hash_key, range_node = self._split_key_condition(key_node, hash_attr, range_attr)
+        filter_node = None
+        if FilterExpression is not None:
+            filter_node = self._expression(FilterExpression, ExpressionAttributeNames,
+                                           ExpressionAttributeValues, builder)
+        paths = None
+        if ProjectionExpression:
+            paths = _parse(ProjectionExpression, ExpressionAttributeNames, None,
+                           'projection')
+
+        with self._lock:
+            index = self._secondary[IndexName] if IndexName else self._primary
+            entries = index.partitions.get(hash_key, [])
+            lo, hi = self._range_bounds(entries, range_node)
+            start = None
+            if ExclusiveStartKey:
+                start = (ExclusiveStartKey.get(range_attr), ExclusiveStartKey.get('PK'),
+                         ExclusiveStartKey.get('SK'))
+            if ScanIndexForward:
+                if start is not None:
+                    lo = max(lo, bisect.bisect_right(entries, start))
+                positions = range(lo, hi)
+            else:
+                if start is not None:
+                    hi = min(hi, bisect.bisect_left(entries, start))
+                positions = range(hi - 1, lo - 1, -1)
+            candidates = (entries[i] for i in positions)
+            return self._page(candidates, filter_node, paths, Limit, IndexName, Select,
+                              (ReturnConsumedCapacity, ConsistentRead))
+
+    def scan(self, IndexName=None, FilterExpression=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+             Limit=None, ExclusiveStartKey=None, ConsistentRead=False, Select=None,
+             Segment=None, TotalSegments=None, ReturnConsumedCapacity='NONE', **_):
+        range_attr = 'SK'
+        if IndexName:
+            if IndexName not in self.indexes:
+                raise _validation_error(
+                    f'The table does not have the specified index: {IndexName}', 'Scan')
+            hash_attr, range_attr = self.indexes[IndexName]
+        else:
+            hash_attr = 'PK'
+        filter_node = None
+        if FilterExpression is not None:
+            filter_node = self._expression(FilterExpression, ExpressionAttributeNames,
+                                           ExpressionAttributeValues,
+                                           ConditionExpressionBuilder())
+        paths = None
+        if ProjectionExpression:
+            paths = _parse(ProjectionExpression, ExpressionAttributeNames, None,
+                           'projection')
+
+        with self._lock:
+            index = self._secondary[IndexName] if IndexName else self._primary
+            start = None
+            if ExclusiveStartKey:
+                start = (ExclusiveStartKey.get(hash_attr),
+                         (ExclusiveStartKey.get(range_attr), ExclusiveStartKey.get('PK'),
+                          ExclusiveStartKey.get('SK')))
+
+            def candidates():
+                first = 0
+                if start is not None:
+                    first = bisect.bisect_left(index.hash_keys, start[0])
+                for hash_key in index.hash_keys[first:]:
+                    if TotalSegments and hash(hash_key) % TotalSegments != Segment:
+                        continue
+                    entries = index.partitions[hash_key]
+                    begin = 0
+                    if start is not None and hash_key == start[0]:
+                        begin = bisect.bisect_right(entries, start[1])
+                    for i in range(begin, len(entries)):
+                        yield entries[i]
+
+            return self._page(candidates(), filter_node, paths, Limit, IndexName, Select,
+                              (ReturnConsumedCapacity, ConsistentRead))
+
+    @staticmethod
+    def _split_key_condition(node, hash_attr, range_attr):
+        """Return (hash key value, range condition node or None)."""
+        parts = [node]
+        if node[0] == 'and':
+            parts = [node[1], node[2]]
+        hash_key = None
+        range_node = None
+        for part in parts:
+            if (part[0] == 'cmp' and part[1] == '=' and part[2][0] == 'path'
+                    and part[2][1] == [hash_attr] and part[3][0] == 'value'):
+                hash_key = part[3][1]
+            else:
+                range_node = part
+        if hash_key is None:
+            raise _validation_error('Query condition missed key schema element', 'Query')
+        if range_node is not None:
+            attr_node = {'cmp': lambda n: n[2], 'between': lambda n: n[1],
+                         'func': lambda n: n[2][0]}.get(range_node[0], lambda n: None)(range_node)
+            if (attr_node is None or attr_node[0] != 'path' or attr_node[1] != [range_attr]
+                    or (range_node[0] == 'func' and range_node[1] != 'begins_with')):
+                raise _validation_error(
+                    'Query key condition not supported', 'Query')
+        return hash_key, range_node
+
+    @staticmethod
+    def _range_bounds(entries, node):
+        """Narrow [lo, hi) over sorted entries using the range key condition."""
+        lo, hi = 0, len(entries)
+        if node is None:
+            return lo, hi
+        low_sentinel, high_sentinel = '', '\U0010ffff'
+        if node[0] == 'func' and node[1] == 'begins_with':
+            prefix = node[2][1][1]
+            lo = bisect.bisect_left(entries, (prefix,))
+            hi = bisect.bisect_left(entries, (prefix + high_sentinel,))
+        elif node[0] == 'between':
+            lo = bisect.bisect_left(entries, (node[2][1],))
+            hi = bisect.bisect_right(entries, (node[3][1], high_sentinel))
+        elif node[0] == 'cmp':
+            op, value = node[1], node[3][1]
+            if op == '=':
+                lo = bisect.bisect_left(entries, (value,))
+                hi = bisect.bisect_right(entries, (value, high_sentinel))
+            elif op == '<':
+                hi = bisect.bisect_left(entries, (value,))
+            elif op == '<=':
+                hi = bisect.bisect_right(entries, (value, high_sentinel))
+            elif op == '>':
+                lo = bisect.bisect_right(entries, (value, high_sentinel))
+            elif op == '>=':
+                lo = bisect.bisect_left(entries, (value, low_sentinel))
+        return lo, hi
+
+    def _page(self, candidates, filter_node, paths, limit, index_name, select, capacity):
+        """Read one page: stop at Limit evaluated items or 1 MB, then filter.
+
+        Capacity is charged on the size of every item evaluated, filtered or
+        not, against the index that was read.
+        """
+        items = []
+        scanned = 0
+        size = 0
+        last = None
+        exhausted = True
+        for entry in candidates:
+            if (limit and scanned >= limit) or size >= MAX_PAGE_BYTES:
+                exhausted = False
+                break
+            item, item_bytes = self._items[(entry[1], entry[2])]
+            scanned += 1
+            size += item_bytes
+            last = item
+            if filter_node is None or _evaluate(item, filter_node):
+                items.append(item)
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        if select != 'COUNT':
+            response['Items'] = [_project(item, paths) for item in items]
+        # Like DynamoDB, a page cut short by Limit reports a LastEvaluatedKey
+        # even when nothing is left to read
+        if last is not None and (not exhausted or (limit and scanned >= limit)):
+            response['LastEvaluatedKey'] = self._last_key(last, index_name)
+        mode, consistent = capacity
+        units = read_units(size, consistent)
+        if index_name:
+            consumed = _consumed(mode, self.name, 'Read', 0, {index_name: units})
+        else:
+            consumed = _consumed(mode, self.name, 'Read', units)
+        return _respond(response, consumed)
+
+    def _last_key(self, item, index_name):
+        key = {'PK': item['PK'], 'SK': item['SK']}
+        if index_name:
+            hash_attr, range_attr = self.indexes[index_name]
+            key[hash_attr] = item[hash_attr]
+            key[range_attr] = item[range_attr]
+        return key
+
+    # -- transactions --
+    def _transact_check(self, op, params):
+        """Return the failure reason code for one transaction action, or None."""
+        key = self._key(params.get('Key') or params.get('Item'), 'TransactWriteItems')
+        try:
+            self._check_condition(params, self._get(key), 'TransactWriteItems')
+        except ClientError:
+            return 'ConditionalCheckFailed'
+        return None
+
+    def _transact_apply(self, op, params, mode):
+        """Apply one action; transactional writes cost twice the usual units."""
+        params = {k: v for k, v in params.items()
+                  if k not in ('TableName', 'ConditionExpression',
+                               'ReturnValuesOnConditionCheckFailure')}
+        if op == 'ConditionCheck':
+            stored = self._items.get(self._key(params['Key'], 'TransactWriteItems'))
+            return _consumed(mode, self.name, 'Write',
+                             2 * write_units(stored[1] if stored else 0))
+        response = {'Put': self.put_item, 'Delete': self.delete_item,
+                    'Update': self.update_item}[op](ReturnConsumedCapacity=mode, **params)
+        return _scale_units(response.get('ConsumedCapacity'), 2)
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class _MemoryClient:
+    """The resource.meta.client surface shared.db relies on."""
+
+    def __init__(self, database):
+        self._database = database
+
+    def transact_write_items(self, TransactItems, ReturnConsumedCapacity='NONE', **_):
+        return self._database.transact_write_items(TransactItems, ReturnConsumedCapacity)
+
+
+class MemoryDynamoDB:
+    """Drop-in for boto3.resource('dynamodb') holding tables in memory."""
+
+    def __init__(self, indexes=None):
+        self._indexes = indexes
+        self._tables = {}
+        self._lock = threading.RLock()
+        self.meta = _Meta(_MemoryClient(self))
+
+    def Table(self, name):
+        with self._lock:
+            table = self._tables.get(name)
+            if table is None:
+                table = self._tables[name] = MemoryTable(name, self._indexes)
+            return table
+
+    def batch_get_item(self, RequestItems, ReturnConsumedCapacity='NONE', **_):
+        keys = sum(len(request['Keys']) for request in RequestItems.values())
+        if keys > 100:
+            raise _validation_error(
+                'Too many items requested for the BatchGetItem call', 'BatchGetItem')
+        responses = {}
+        consumed = []
+        for table_name, request in RequestItems.items():
+            table = self.Table(table_name)
+            found = responses.setdefault(table_name, [])
+            seen = set()
+            for key in request['Keys']:
+                pk_sk = table._key(key, 'BatchGetItem')
+                if pk_sk in seen:
+                    raise _validation_error(
+                        'Provided list of item keys contains duplicates', 'BatchGetItem')
+                seen.add(pk_sk)
+                response = table.get_item(
+                    Key=key,
+                    ProjectionExpression=request.get('ProjectionExpression'),
+                    ExpressionAttributeNames=request.get('ExpressionAttributeNames'),
+                    ConsistentRead=request.get('ConsistentRead', False),
+                    ReturnConsumedCapacity=ReturnConsumedCapacity)
+                if 'Item' in response:
+                    found.append(response['Item'])
+                consumed.append(response.get('ConsumedCapacity'))
+        return _respond({'Responses': responses, 'UnprocessedKeys': {}},
+                        _sum_consumed(consumed))
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity='NONE', **_):
+        count = sum(len(requests) for requests in RequestItems.values())
+        if count > 25:
+            raise _validation_error(
+                'Too many items requested for the BatchWriteItem call', 'BatchWriteItem')
+        consumed = []
+        for table_name, requests in RequestItems.items():
+            table = self.Table(table_name)
+            seen = set()
+            for request in requests:
+                body = request.get('PutRequest', {}).get('Item') or \
+                    request.get('DeleteRequest', {}).get('Key')
+                key = table._key(body, 'BatchWriteItem')
+                if key in seen:
+                    raise _validation_error(
+                        'Provided list of item keys contains duplicates', 'BatchWriteItem')
+                seen.add(key)
+            for request in requests:
+                if 'PutRequest' in request:
+                    response = table.put_item(Item=request['PutRequest']['Item'],
+                                              ReturnConsumedCapacity=ReturnConsumedCapacity)
+                else:
+                    response = table.delete_item(Key=request['DeleteRequest']['Key'],
+                                                 ReturnConsumedCapacity=ReturnConsumedCapacity)
+                consumed.append(response.get('ConsumedCapacity'))
+        return _respond({'UnprocessedItems': {}}, _sum_consumed(consumed))
+
+    def transact_write_items(self, TransactItems, ReturnConsumedCapacity='NONE'):
+        if len(TransactItems) > 100:
+            raise _validation_error(
+                'Member must have length less than or equal to 100', 'TransactWriteItems')
+        actions = []
+        seen = set()
+        for action in TransactItems:
+            (op, params), = action.items()
+            table = self.Table(params['TableName'])
+            key = table._key(params.get('Key') or params.get('Item'), 'TransactWriteItems')
+            if (table.name, key) in seen:
+                raise _validation_error(
+                    'Transaction request cannot include multiple operations on one item',
+                    'TransactWriteItems')
+            seen.add((table.name, key))
+            actions.append((table, op, params))
+
+        tables = {id(table): table for table, _, _ in actions}.values()
+        locks = sorted(tables, key=lambda t: t.name)
+        for table in locks:
+            table._lock.acquire()
+        try:
+            reasons = [table._transact_check(op, params) for table, op, params in actions]
+            if any(reasons):
+                codes = ', '.join(reason or 'None' for reason in reasons)
+                raise _client_error(
+                    'TransactionCanceledException',
+                    f'Transaction cancelled, please refer cancellation reasons for '
+                    f'specific reasons [{codes}]',
+                    'TransactWriteItems',
+                    CancellationReasons=[{'Code': reason or 'None'} for reason in reasons])
+            consumed = [table._transact_apply(op, params, ReturnConsumedCapacity)
+                        for table, op, params in actions]
+        finally:
+            for table in locks:
+                table._lock.release()
+        return _respond({}, _sum_consumed(consumed))
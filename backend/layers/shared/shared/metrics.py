@@ -0,0 +1,119 @@
+"""Per-invocation DynamoDB capacity metrics in CloudWatch Embedded Metric Format.
+
+Wrap a lambda_handler with @capacity_metrics to print one EMF log line per
+invocation. CloudWatch turns it into metrics under METRICS_NAMESPACE,
+dimensioned by function and route (e.g. "GET /files/search"):
+
+    ReadCapacityUnits / WriteCapacityUnits          request totals
+    ReadCapacityUnits.<index> / WriteCapacityUnits.<index>
+                                                    per base table ("Table")
+                                                    and per GSI
+
+Capacity comes from shared.db, which requests ReturnConsumedCapacity on every
+call. Set METRICS_ENABLED=false to turn the log line off.
+
+With DB_TRACE set, the decorator also writes one "db_trace" record per
+invocation listing every db call (see db.trace_calls()), for
+scripts/access_report.py to analyze offline.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+
+from shared import db
+
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'FileShare')
+ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() != 'false'
+
+
+def route_name(event):
+    """'METHOD /resource' for API Gateway events, else the function's own name."""
+    method = event.get('httpMethod') if isinstance(event, dict) else None
+    if method:
+        return f"{method} {event.get('resource', '')}"
+    return 'invoke'
+
+
+def capacity_record(function_name, route, capacity, status_code=None, request_id=None):
+    """Build the EMF document for one invocation from db.consumed_capacity()."""
+    values = {'ReadCapacityUnits': 0, 'WriteCapacityUnits': 0}
+    for (_table, index), units in capacity.items():
+        label = index or 'Table'
+        values['ReadCapacityUnits'] += units['read']
+        values['WriteCapacityUnits'] += units['write']
+        values[f'ReadCapacityUnits.{label}'] = (
+            values.get(f'ReadCapacityUnits.{label}', 0) + units['read'])
+        values[f'WriteCapacityUnits.{label}'] = (
+            values.get(f'WriteCapacityUnits.{label}', 0) + units['write'])
+
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE,
+                'Dimensions': [['FunctionName', 'Route'], ['Route']],
+                'Metrics': [{'Name': name, 'Unit': 'Count'} for name in values],
+            }],
+        },
+        'FunctionName': function_name,
+        'Route': route,
+    }
+    record.update(values)
+    if status_code is not None:
+        record['StatusCode'] = status_code
+    if request_id:
+        record['RequestId'] = request_id
+    return record
+
+
+_trace_lock = threading.Lock()
+
+
+def trace_record(function_name, route, calls, status_code=None, request_id=None):
+    """Build the db_trace record for one invocation."""
+    return {
+        'type': 'db_trace',
+        'function': function_name,
+        'route': route,
+        'request_id': request_id,
+        'status': status_code,
+        'calls': calls,
+    }
+
+
+def write_trace(record):
+    """Print the trace record, or append it to the DB_TRACE file."""
+    line = json.dumps(record, separators=(',', ':'))
+    if db.TRACE in ('1', 'stdout'):
+        print(line)
+        return
+    with _trace_lock:
+        with open(db.TRACE, 'a') as f:
+            f.write(line + '\n')
+
+
+def capacity_metrics(handler):
+    """Decorator for lambda_handler: emit the invocation's capacity usage."""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        status_code = 500
+        try:
+            response = handler(event, context)
+            if isinstance(response, dict):
+                status_code = response.get('statusCode')
+            return response
+        finally:
+            function_name = getattr(context, 'function_name', None) or handler.__module__
+            request_id = getattr(context, 'aws_request_id', None)
+            if ENABLED:
+                record = capacity_record(function_name, route_name(event),
+                                         db.consumed_capacity(), status_code, request_id)
+                print(json.dumps(record, separators=(',', ':')))
+            if db.TRACE:
+                write_trace(trace_record(function_name, route_name(event),
+                                         db.trace_calls(), status_code, request_id))
+    return wrapper
@@ -0,0 +1,105 @@
+"""Password hashing with a configurable bcrypt cost.
+
+The cost (log2 rounds) is BCRYPT_ROUNDS, or DEFAULT_ROUNDS when unset. It
+is a deploy-time setting, tuned per stage for login latency:
+scripts/calibrate_bcrypt.py times bcrypt where the Lambda runs (calibrate)
+and recommends a value no lower than the MIN_ROUNDS security floor, so
+every container hashes at the same cost rather than each measuring its own.
+
+Hashes record their own cost, so changing the policy never breaks existing
+passwords: verify() accepts any cost, and login rehashes a password whose
+cost differs from the policy (needs_rehash) while it has the plaintext.
+Lowering BCRYPT_ROUNDS therefore speeds up existing users' logins too.
+"""
+
+import os
+import time
+
+import bcrypt
+
+
+DEFAULT_ROUNDS = 12
+# Lowest cost calibration recommends
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+_ROUNDS = os.environ.get('BCRYPT_ROUNDS', '')
+
+# Cost chosen for this container (resolved on first use)
+_rounds = None
+
+
+def measure(rounds, samples=3):
+    """Best-of-samples milliseconds for one bcrypt hash at the given cost."""
+    salt = bcrypt.gensalt(rounds)
+    best = None
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.hashpw(b'calibration-password', salt)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate(target_ms, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS):
+    """Highest cost whose hash time fits target_ms on this machine (for
+    scripts/calibrate_bcrypt.py).
+
+    Each extra round doubles the work, so one measurement at a cheap cost
+    is extrapolated rather than timing the expensive ones.
+    """
+    base = 8
+    per_round = measure(base) / 2 ** base
+    rounds = min_rounds
+    while rounds < max_rounds and per_round * 2 ** (rounds + 1) <= target_ms:
+        rounds += 1
+    return rounds
+
+
+def rounds():
+    """The cost new hashes are created with."""
+    global _rounds
+    if _rounds is None:
+        _rounds = int(_ROUNDS) if _ROUNDS else DEFAULT_ROUNDS
+    return _rounds
+
+
+def configure(log_rounds=None):
+    """Force the cost (tests, scripts); None re-resolves it from the environment."""
+    global _rounds
+    _rounds = log_rounds
+
+
+def hash_password(password, log_rounds=None):
+    """bcrypt hash of a password at the configured (or given) cost, as a str.
+
+    bcrypt releases the GIL while hashing, so threads hash in parallel.
+    """
+    salt = bcrypt.gensalt(log_rounds or rounds())
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verify(password, stored_hash):
+    """Check a password against a stored hash of any cost."""
+    if isinstance(stored_hash, str):
+        stored_hash = stored_hash.encode('utf-8')
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), stored_hash)
+    except ValueError:  # malformed hash
+        return False
+
+
+def cost(stored_hash):
+    """The cost recorded in a bcrypt hash ('$2b$12$...' -> 12), or None."""
+    if isinstance(stored_hash, bytes):
+        stored_hash = stored_hash.decode('utf-8')
+    parts = stored_hash.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(stored_hash):
+    """True when a hash was made at a different cost than the current policy."""
+    stored = cost(stored_hash)
+    return stored is not None and stored != rounds()
@@ -0,0 +1,142 @@
+"""Per-user token buckets checked by auth_middleware.require_auth.
+
+RATE_LIMITS is a comma-separated list of rules, each '<key>=<rate>/<burst>'
+(tokens refilled per second / bucket size; burst defaults to rate):
+
+    Reader=5/20                   every request by a Reader
+    *=20/100                      every request by any other role
+    GET /files/search=1/5         one route, for every role
+    Admin:GET /files/search=2/10  one route, for one role
+
+A request draws one token from its user's bucket and, when a route rule
+matches, one from the user's bucket for that route. Role-specific rules win
+over '*'. An empty RATE_LIMITS turns limiting off.
+
+Buckets live in the container, so the check costs nothing. With
+RATE_LIMIT_SHARED=true a request that passes is also counted in DynamoDB,
+one item per user, bucket and RATE_LIMIT_WINDOW seconds:
+
+    PK: RATELIMIT#<username>   SK: <bucket>#<window number>
+
+and refused once the count reaches rate * window + burst, so callers spread
+over many containers still get a single budget. That costs a write per
+request; the items expire through the table's ttl attribute.
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+
+from shared import db
+
+
+RATE_LIMITS = os.environ.get('RATE_LIMITS', '')
+SHARED = os.environ.get('RATE_LIMIT_SHARED', 'false').lower() == 'true'
+WINDOW_SECONDS = int(os.environ.get('RATE_LIMIT_WINDOW', '60'))
+MAX_BUCKETS = int(os.environ.get('RATE_LIMIT_BUCKETS', '10000'))
+
+# The whole-user bucket's route key
+ALL_ROUTES = '*'
+
+# (username, route key) -> (tokens, time.monotonic() of the last refill)
+_buckets = OrderedDict()
+
+
+def parse_limits(spec):
+    """'Reader=5/20,GET /files/search=1' -> {(role, route): (rate, burst)}."""
+    rules = {}
+    for rule in filter(None, (part.strip() for part in spec.split(','))):
+        key, _, limit = rule.rpartition('=')
+        rate, _, burst = limit.partition('/')
+        try:
+            rate = float(rate)
+            burst = float(burst) if burst else rate
+        except ValueError:
+            raise ValueError(f'Invalid RATE_LIMITS rule: {rule!r}') from None
+        if not key or rate <= 0 or burst < 1:
+            raise ValueError(f'Invalid RATE_LIMITS rule: {rule!r}')
+        if ':' in key:
+            role, _, route = key.partition(':')
+        elif ' ' in key:
+            role, route = '*', key
+        else:
+            role, route = key, ALL_ROUTES
+        rules[(role.strip(), route.strip())] = (rate, burst)
+    return rules
+
+
+_rules = parse_limits(RATE_LIMITS)
+
+
+def configure(spec, shared=None):
+    """Replace the rules (same format as RATE_LIMITS) and drop every bucket."""
+    global _rules, SHARED
+    _rules = parse_limits(spec)
+    if shared is not None:
+        SHARED = shared
+    clear()
+
+
+def _limit(role, route):
+    return _rules.get((role, route)) or _rules.get(('*', route))
+
+
+def _refill(bucket, rate, burst, now):
+    tokens, updated = _buckets.get(bucket, (burst, now))
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def _store(bucket, tokens, now):
+    _buckets.pop(bucket, None)
+    _buckets[bucket] = (tokens, now)
+    while len(_buckets) > MAX_BUCKETS:
+        _buckets.popitem(last=False)
+
+
+def _take_shared(username, route, rate, burst):
+    """Count a request in the shared window; returns 0 or the seconds left in it."""
+    now = time.time()
+    window = int(now // WINDOW_SECONDS)
+    try:
+        db.update_item(
+            f'RATELIMIT#{username}', f'{route}#{window}',
+            'ADD hits :one SET #ttl = :ttl',
+            {':one': 1, ':ttl': (window + 2) * WINDOW_SECONDS,
+             ':limit': int(rate * WINDOW_SECONDS + burst)},
+            condition_expression='attribute_not_exists(hits) OR hits < :limit',
+            expression_attr_names={'#ttl': 'ttl'})
+    except Exception as e:
+        if 'ConditionalCheckFailedException' not in str(e):
+            raise
+        return (window + 1) * WINDOW_SECONDS - now
+    return 0
+
+
+def check(username, role, route):
+    """Spend one request for a user; returns 0 to proceed or seconds to wait."""
+    limits = [(key, _limit(role, key)) for key in (ALL_ROUTES, route)]
+    limits = [(key, limit) for key, limit in limits if limit]
+    if not limits:
+        return 0
+    # Refused requests spend nothing, so a caller that backs off recovers
+    now = time.monotonic()
+    levels = {key: _refill((username, key), rate, burst, now)
+              for key, (rate, burst) in limits}
+    wait = max(max(0, 1 - levels[key]) / rate for key, (rate, _) in limits)
+    for key, tokens in levels.items():
+        _store((username, key), tokens if wait else tokens - 1, now)
+    if wait or not SHARED:
+        return wait
+    return max(_take_shared(username, key, rate, burst) for key, (rate, burst) in limits)
+
+
+def retry_after(wait):
+    """Retry-After header value (whole seconds, at least 1)."""
+    return str(max(1, math.ceil(wait)))
+
+
+@db.on_use_backend
+def clear():
+    """Drop every local bucket."""
+    _buckets.clear()
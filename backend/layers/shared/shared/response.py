@@ -3,15 +3,37 @@
 import json
 from decimal import Decimal
 
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
 
 class DecimalEncoder(json.JSONEncoder):
     """JSON encoder that handles DynamoDB Decimal types."""
     def default(self, obj):
-        if isinstance(obj, Decimal):
-            if obj % 1 == 0:
-                return int(obj)
-            return float(obj)
-        return super().default(obj)
+        return _decimal_default(obj)
+
+
+def _decimal_default(obj):
+    """Encode a Decimal as int/float; shared.db reads rarely produce them now."""
+    if isinstance(obj, Decimal):
+        if obj % 1 == 0:
+            return int(obj)
+        return float(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def to_json(body):
+    """Serialize a response body, using orjson when it is installed.
+
+    Both encoders give the same output: compact, UTF-8 rather than \\u
+    escapes, and non-str dict keys coerced to strings.
+    """
+    if orjson is not None:
+        return orjson.dumps(body, default=_decimal_default,
+                            option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(body, cls=DecimalEncoder, separators=(',', ':'), ensure_ascii=False)
 
 
 CORS_HEADERS = {
@@ -27,14 +49,14 @@ def success(body, status_code=200):
     return {
         'statusCode': status_code,
         'headers': CORS_HEADERS,
-        'body': json.dumps(body, cls=DecimalEncoder)
+        'body': to_json(body)
     }
 
 
-def error(message, status_code=400):
-    """Return an error API response."""
+def error(message, status_code=400, headers=None):
+    """Return an error API response (headers: extra response headers)."""
     return {
         'statusCode': status_code,
-        'headers': CORS_HEADERS,
-        'body': json.dumps({'error': message})
+        'headers': {**CORS_HEADERS, **headers} if headers else CORS_HEADERS,
+        'body': to_json({'error': message})
     }
@@ -0,0 +1,153 @@
+"""Warm-container cache of session items for auth_middleware.authenticate.
+
+Every authenticated request used to start with a GetItem on its session.
+This cache keeps sessions (and tokens known not to exist) in an LRU that
+survives across invocations of the same container, so a warm container
+authenticates repeat callers without a DynamoDB round trip.
+
+Entries expire on their own:
+  - a session at its 'ttl' attribute (DynamoDB deletes expired items lazily,
+    so the attribute is checked on every hit, cached or not)
+  - any entry after MAX_AGE_SECONDS, and negative entries after
+    NEGATIVE_TTL_SECONDS
+
+Revocation works through a counter per user, on its own small item:
+
+    PK: USER#<username>   SK: REVOCATION   epoch
+
+Logout, disabling a user and role changes bump the user's counter
+(revoke_user); every cache entry remembers the counter it was filled under
+and is dropped once the counter moves. A container re-reads a user's
+counter at most every REVALIDATE_SECONDS, and only for users it is
+authenticating, which bounds how long another container can keep honouring
+a revoked session. The container that revokes drops its own entries
+immediately. Signed tokens (shared.tokens) check the same counters.
+
+Deleting a user gives the counter a ttl (revoke_user's forget_after), so it
+goes away once every token minted under the old value has expired.
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+from shared import db
+
+
+REVOCATION_SK = 'REVOCATION'
+
+MAX_ENTRIES = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+MAX_AGE_SECONDS = float(os.environ.get('SESSION_CACHE_MAX_AGE', '300'))
+NEGATIVE_TTL_SECONDS = float(os.environ.get('SESSION_CACHE_NEGATIVE_TTL', '60'))
+REVALIDATE_SECONDS = float(os.environ.get('SESSION_CACHE_REVALIDATE', '5'))
+
+# token -> (session item or None, expires_at, username epoch when cached)
+_cache = OrderedDict()
+# username -> (revocation counter, time.monotonic() it was read)
+_epochs = OrderedDict()
+
+
+def revocation_key(username):
+    """Table key of a user's revocation counter item."""
+    return {'PK': f'USER#{username}', 'SK': REVOCATION_SK}
+
+
+def _remember_epoch(username, value, checked_at):
+    _epochs[username] = (value, checked_at)
+    _epochs.move_to_end(username)
+    while len(_epochs) > MAX_ENTRIES:
+        _epochs.popitem(last=False)
+
+
+def epoch(username, fresh=False):
+    """The user's revocation counter, re-read if older than REVALIDATE_SECONDS.
+
+    fresh: re-read it now (for minting tokens that must outlive the next check).
+    """
+    now = time.monotonic()
+    known = _epochs.get(username)
+    if known and not fresh and now - known[1] < REVALIDATE_SECONDS:
+        return known[0]
+    key = revocation_key(username)
+    item = db.get_item(key['PK'], key['SK'], consistent_read=True) or {}
+    _remember_epoch(username, item.get('epoch', 0), now)
+    return item.get('epoch', 0)
+
+
+def _store(token, session, expires_at, user_epoch):
+    _cache[token] = (session, expires_at, user_epoch)
+    _cache.move_to_end(token)
+    while len(_cache) > MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def get(token):
+    """Return the live session item for token, or None."""
+    now = time.time()
+    entry = _cache.get(token)
+    if entry:
+        session, expires_at, user_epoch = entry
+        fresh = expires_at > now and (
+            session is None or user_epoch == epoch(session['username']))
+        if fresh:
+            _cache.move_to_end(token)
+            return session
+        del _cache[token]
+
+    session = _read(token, now)
+    if session is not None:
+        # The session must have been read after the counter it is cached
+        # under; otherwise a logout or revocation landing between the two
+        # reads would leave the deleted session cached against the new value
+        known = _epochs.get(session['username'])
+        user_epoch = epoch(session['username'])
+        if _epochs.get(session['username']) is not known:
+            session = _read(token, now)
+    if session is None:
+        _store(token, None, now + NEGATIVE_TTL_SECONDS, None)
+        return None
+    expires_at = now + MAX_AGE_SECONDS
+    if session.get('ttl'):
+        expires_at = min(expires_at, session['ttl'])
+    _store(token, session, expires_at, user_epoch)
+    return session
+
+
+def _read(token, now):
+    """The token's unexpired session item from the table, or None."""
+    # Consistent, so a session created moments ago is never cached as missing
+    session = db.get_item(f'SESSION#{token}', 'SESSION', consistent_read=True)
+    if session and session.get('ttl') and session['ttl'] <= now:
+        return None
+    return session
+
+
+def forget(token):
+    """Drop one token from this container's cache."""
+    _cache.pop(token, None)
+
+
+def revoke_user(username, forget_after=None):
+    """Invalidate every cached session of a user, in every container.
+
+    forget_after: seconds after which the counter item may expire (for a
+    deleted user; at least the longest token lifetime). Otherwise it is kept.
+    """
+    key = revocation_key(username)
+    if forget_after is None:
+        result = db.update_item(key['PK'], key['SK'], 'ADD epoch :one REMOVE #ttl',
+                                {':one': 1}, expression_attr_names={'#ttl': 'ttl'})
+    else:
+        result = db.update_item(key['PK'], key['SK'], 'ADD epoch :one SET #ttl = :ttl',
+                                {':one': 1, ':ttl': int(time.time()) + forget_after},
+                                expression_attr_names={'#ttl': 'ttl'})
+    _remember_epoch(username, result.get('Attributes', {}).get('epoch', 0), time.monotonic())
+    for token in [t for t, (s, _, _) in _cache.items() if s and s['username'] == username]:
+        del _cache[token]
+
+
+@db.on_use_backend
+def clear():
+    """Drop the local cache (done automatically when db.use_backend() is called)."""
+    _cache.clear()
+    _epochs.clear()
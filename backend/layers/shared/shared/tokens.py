@@ -0,0 +1,96 @@
+"""Stateless HMAC-signed session tokens.
+
+With SESSION_TOKEN_MODE=signed, login issues a token that carries the
+username, role and expiry, signed with SESSION_SIGNING_KEY:
+
+    v1.<base64url(JSON payload)>.<base64url(HMAC-SHA256)>
+
+authenticate() verifies it in-process instead of reading a session item.
+Revocation reuses session_cache's per-user counters (one small
+USER#<username>/REVOCATION item each): the payload records the user's
+counter at login, and a token is rejected once the counter has moved. So
+logout signs the user out everywhere, and so does disabling, deleting or
+re-roling them. Issuing reads that one user's counter; verifying re-reads
+it at most every session_cache.REVALIDATE_SECONDS per container.
+
+SESSION_SIGNING_KEY may list several comma-separated keys: the first signs,
+all verify, so a key can be rotated without logging everyone out. Opaque
+tokens issued before switching modes keep working until they expire.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from shared import session_cache
+
+
+PREFIX = 'v1.'
+
+MODE = os.environ.get('SESSION_TOKEN_MODE', 'opaque')
+_keys = [key.encode('utf-8') for key in
+         os.environ.get('SESSION_SIGNING_KEY', '').split(',') if key]
+
+
+def configure(mode, keys):
+    """Replace the token mode and signing keys (first key signs)."""
+    global MODE, _keys
+    MODE = mode
+    _keys = [key.encode('utf-8') for key in keys]
+
+
+def signed_mode():
+    return MODE == 'signed'
+
+
+def is_signed(token):
+    return token.startswith(PREFIX)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(key, body):
+    return hmac.new(key, body.encode('ascii'), hashlib.sha256).digest()
+
+
+def issue(username, role, ttl_seconds):
+    """Mint a signed token for a user; returns (token, expires_at)."""
+    if not _keys:
+        raise RuntimeError('SESSION_SIGNING_KEY is not set')
+    expires_at = int(time.time()) + ttl_seconds
+    payload = {
+        'u': username,
+        'r': role,
+        'e': expires_at,
+        'n': session_cache.epoch(username, fresh=True),
+    }
+    body = PREFIX + _b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    return f'{body}.{_b64encode(_signature(_keys[0], body))}', expires_at
+
+
+def verify(token):
+    """Return {"username", "role", "expires_at"} for a valid token, else None."""
+    body, _, signature = token.rpartition('.')
+    if not body.startswith(PREFIX) or not _keys:
+        return None
+    try:
+        signature = _b64decode(signature)
+        payload = json.loads(_b64decode(body[len(PREFIX):]))
+    except ValueError:
+        return None
+    if not any(hmac.compare_digest(signature, _signature(key, body)) for key in _keys):
+        return None
+    if not isinstance(payload, dict) or payload.get('e', 0) <= time.time():
+        return None
+    if payload.get('n') != session_cache.epoch(payload.get('u')):
+        return None
+    return {'username': payload['u'], 'role': payload['r'], 'expires_at': payload['e']}
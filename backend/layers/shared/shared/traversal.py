@@ -0,0 +1,71 @@
+"""Level-synchronous breadth-first traversal of the folder tree.
+
+walk() expands a whole level at once, running the expand calls for every
+node on it concurrently on a bounded thread pool, so a wide tree costs about
+one query latency per level instead of one per folder (each worker thread
+queries through its own Table; see shared.aws). Nodes are visited
+once even if reached twice, and each walk reports its shape:
+
+    levels      how many levels below the roots were reached
+    visited     nodes found below the roots
+    queries     expand calls made
+    widths      nodes found on each level
+    max_fanout  most children returned by one expand call
+
+Subtree reads normally come from the closure rows (shared.closure);
+descendants() walks the GSI1 parent links instead, for folders whose
+closure rows have not been built yet.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from shared import db
+
+
+MAX_WORKERS = int(os.environ.get('TRAVERSAL_WORKERS', '16'))
+
+
+def walk(roots, expand, max_workers=MAX_WORKERS, max_depth=None):
+    """Breadth-first from roots; expand(node_id) returns the node's child IDs.
+
+    Returns (found, stats): found is [(node_id, depth)] for every node below
+    the roots, shallowest first, depth 1 for the roots' children.
+    """
+    stats = {'levels': 0, 'visited': 0, 'queries': 0, 'widths': [], 'max_fanout': 0}
+    level = list(dict.fromkeys(roots))
+    seen = set(level)
+    found = []
+    depth = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while level and (max_depth is None or depth < max_depth):
+            depth += 1
+            expanded = list(pool.map(lambda node: list(expand(node)), level))
+            stats['queries'] += len(level)
+            next_level = []
+            for children in expanded:
+                stats['max_fanout'] = max(stats['max_fanout'], len(children))
+                for child in children:
+                    if child not in seen:
+                        seen.add(child)
+                        next_level.append(child)
+                        found.append((child, depth))
+            if next_level:
+                stats['widths'].append(len(next_level))
+            level = next_level
+    stats['levels'] = len(stats['widths'])
+    stats['visited'] = len(found)
+    return found, stats
+
+
+def child_folder_ids(folder_id):
+    """IDs of the folders directly beneath a folder (or 'ROOT'), from GSI1."""
+    return [item['PK'][len('FOLDER#'):]
+            for item in db.iter_query(f'PARENT#{folder_id}', index_name='GSI1',
+                                      attributes=['PK', 'SK'])
+            if item.get('SK') == 'META']
+
+
+def descendants(folder_id, max_workers=MAX_WORKERS):
+    """(found, stats) for every folder beneath folder_id, walking GSI1 level by level."""
+    return walk([folder_id], child_folder_ids, max_workers=max_workers)
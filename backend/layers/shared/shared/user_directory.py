@@ -0,0 +1,82 @@
+"""User directory: a copy of each profile's list fields, partitioned by status.
+
+Listing users used to scan the whole table for SK = PROFILE. Each profile
+now also has two small rows in its status's partition:
+
+    PK: USERDIR#<status>   SK: NAME#<username>
+    PK: USERDIR#<status>   SK: CREATED#<created_at:012d>#<username>
+
+holding username, role, status and created_at. A page of users sorted by
+name or creation time, a username prefix or a status filter is then a key
+condition on one partition (or a merge of the STATUSES partitions), so a
+page costs O(page) rather than O(table).
+
+auth_users.handler writes the rows with the profile (create, import,
+update, delete) and scripts/backfill_user_directory.py builds or repairs
+them for existing users.
+"""
+
+from shared import db
+
+
+STATUSES = ('active', 'disabled')
+
+# sort name -> SK prefix
+SORTS = {'username': 'NAME#', 'created_at': 'CREATED#'}
+
+ATTRIBUTES = ['username', 'role', 'status', 'created_at']
+
+
+def _pk(status):
+    return f'USERDIR#{status}'
+
+
+def _sort_keys(profile):
+    username = profile['username']
+    return [f'NAME#{username}', f'CREATED#{int(profile.get("created_at", 0)):012d}#{username}']
+
+
+def rows(profile):
+    """Directory items for a user PROFILE item."""
+    fields = {name: profile.get(name) for name in ATTRIBUTES}
+    return [dict(fields, PK=_pk(profile.get('status', 'active')), SK=sk)
+            for sk in _sort_keys(profile)]
+
+
+def keys(profile):
+    """Table keys of a profile's directory rows (for deleting them)."""
+    return [{'PK': _pk(profile.get('status', 'active')), 'SK': sk}
+            for sk in _sort_keys(profile)]
+
+
+def replace(old_profile, new_profile):
+    """Rewrite a user's rows after a change to any directory field."""
+    puts = rows(new_profile)
+    current = {(item['PK'], item['SK']) for item in puts}
+    deletes = [key for key in keys(old_profile) if (key['PK'], key['SK']) not in current]
+    db.batch_write(puts=puts, deletes=deletes)
+
+
+def page(status=None, sort='username', prefix=None, descending=False,
+         filter_expression=None, limit=None, start_token=None):
+    """Users in directory order: (items, next_token) with a limit, else (iterator, None).
+
+    prefix narrows by username and needs sort='username'. Raises ValueError
+    for an unknown sort or status, or a bad start_token.
+    """
+    if sort not in SORTS:
+        raise ValueError(f'Unknown sort: {sort}')
+    if status is not None and status not in STATUSES:
+        raise ValueError(f'Unknown status: {status}')
+    if prefix and sort != 'username':
+        raise ValueError('A prefix needs sort=username')
+    pks = [_pk(s) for s in ([status] if status else STATUSES)]
+    sk_prefix = SORTS[sort] + (prefix or '')
+    if limit:
+        return db.query_page_many(pks, sk_begins_with=sk_prefix,
+                                  filter_expression=filter_expression,
+                                  attributes=ATTRIBUTES, limit=limit,
+                                  scan_forward=not descending, start_token=start_token)
+    return db.iter_query_many(pks, sk_begins_with=sk_prefix,
+                              filter_expression=filter_expression,
+                              attributes=ATTRIBUTES, scan_forward=not descending), None
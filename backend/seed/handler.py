@@ -6,9 +6,9 @@ Creates an 'admin' user with password 'ChangeMe123!' and force_password_change=T
 
 import json
 import time
-import bcrypt
 
-from shared import db
+from shared import db, passwords, user_directory
+from shared.metrics import capacity_metrics
 from shared.response import success, error
 
 
@@ -16,8 +16,10 @@ DEFAULT_ADMIN_USERNAME = 'admin'
 DEFAULT_ADMIN_PASSWORD = 'ChangeMe123!'
 
 
+@capacity_metrics
 def lambda_handler(event, context):
     """Handle both direct invocation and CloudFormation Custom Resource."""
+    db.begin_request()
     # Check if this is a CloudFormation Custom Resource request
     if 'RequestType' in event:
         return _handle_cfn(event, context)
@@ -80,16 +82,13 @@ def _seed_admin():
         })
 
     # Hash the default password
-    password_hash = bcrypt.hashpw(
-        DEFAULT_ADMIN_PASSWORD.encode('utf-8'),
-        bcrypt.gensalt(12)
-    ).decode('utf-8')
+    password_hash = passwords.hash_password(DEFAULT_ADMIN_PASSWORD)
 
     now = int(time.time())
     user_item = {
         'PK': f'USER#{DEFAULT_ADMIN_USERNAME}',
         'SK': 'PROFILE',
-        'GSI1PK': 'ROLE#Admin',
+        'GSI1PK': db.gsi1_key('ROLE#Admin', f'USER#{DEFAULT_ADMIN_USERNAME}'),
         'GSI1SK': f'USER#{DEFAULT_ADMIN_USERNAME}',
         'username': DEFAULT_ADMIN_USERNAME,
         'password_hash': password_hash,
@@ -100,6 +99,7 @@ def _seed_admin():
     }
 
     db.put_item(user_item)
+    db.batch_put(user_directory.rows(user_item))
 
     return success({
         'message': f'Admin user "{DEFAULT_ADMIN_USERNAME}" created with default password',
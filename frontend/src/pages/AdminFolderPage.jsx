@@ -22,6 +22,7 @@ export default function AdminFolderPage() {
   // Delete confirmation
   const [deleteTarget, setDeleteTarget] = useState(null);
   const [deleting, setDeleting] = useState(false);
+  const [deleteProgress, setDeleteProgress] = useState(null);
 
   // Assignments
   const [assignFolder, setAssignFolder] = useState(null);
@@ -90,14 +91,22 @@ export default function AdminFolderPage() {
   const handleDelete = async () => {
     setDeleting(true);
     try {
-      await api.delete(`/folders/${deleteTarget.folder_id}`);
+      // A large subtree is deleted over several requests: 202 means the
+      // delete stopped part-way and must be repeated, 200 that it finished
+      let res = await api.delete(`/folders/${deleteTarget.folder_id}`);
+      while (res.status === 202) {
+        setDeleteProgress(res.data.deleted);
+        res = await api.delete(`/folders/${deleteTarget.folder_id}`);
+      }
       setDeleteTarget(null);
       fetchFolders();
     } catch (err) {
       setError(err);
       setDeleteTarget(null);
+      fetchFolders();
     } finally {
       setDeleting(false);
+      setDeleteProgress(null);
     }
   };
 
@@ -311,16 +320,21 @@ export default function AdminFolderPage() {
                 <h5 className="modal-title text-danger">
                   <i className="bi bi-exclamation-triangle me-2"></i>Delete Folder
                 </h5>
-                <button className="btn-close" onClick={() => setDeleteTarget(null)}></button>
+                <button className="btn-close" onClick={() => setDeleteTarget(null)} disabled={deleting}></button>
               </div>
               <div className="modal-body">
                 <p>Delete <strong>{deleteTarget.name}</strong>?</p>
                 <p className="text-muted small mb-0">
                   This will also delete all sub-folders, files, and assignments.
                 </p>
+                {deleteProgress && (
+                  <p className="small mt-2 mb-0">
+                    Deleted {deleteProgress.folders} folders and {deleteProgress.files} files so far...
+                  </p>
+                )}
               </div>
               <div className="modal-footer">
-                <button className="btn btn-secondary" onClick={() => setDeleteTarget(null)}>Cancel</button>
+                <button className="btn btn-secondary" onClick={() => setDeleteTarget(null)} disabled={deleting}>Cancel</button>
                 <button className="btn btn-danger" onClick={handleDelete} disabled={deleting}>
                   {deleting ? 'Deleting...' : 'Delete'}
                 </button>
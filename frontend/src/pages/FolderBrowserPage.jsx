@@ -14,6 +14,8 @@ export default function FolderBrowserPage() {
   const [error, setError] = useState(null);
   const [currentFolder, setCurrentFolder] = useState(null);
   const [breadcrumbs, setBreadcrumbs] = useState([]);
+  const [foldersToken, setFoldersToken] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Upload state
   const fileInputRef = useRef(null);
@@ -36,13 +38,15 @@ export default function FolderBrowserPage() {
     setLoading(true);
     setError(null);
     try {
-      const { data } = await api.get('/folders');
-      setFolders(data.folders || []);
+      // One level at a time, first page only: the rest load on request
+      const { data } = await api.get(`/folders/${folderId || 'ROOT'}/children`);
+      const folder = data.folder;
+      setFolders(data.children || []);
+      setFoldersToken(data.next_token || null);
 
       if (folderId) {
-        const found = findFolder(data.folders || [], folderId);
-        setCurrentFolder(found);
-        setBreadcrumbs(found ? buildBreadcrumbs(data.folders || [], folderId) : []);
+        setCurrentFolder(folder);
+        setBreadcrumbs(folder?.breadcrumbs || []);
 
         // Fetch files for this folder
         const filesRes = await api.get(`/folders/${folderId}/files`);
@@ -63,29 +67,19 @@ export default function FolderBrowserPage() {
 
   useEffect(() => { fetchData(); }, [folderId]);
 
-  const findFolder = (tree, targetId) => {
-    for (const f of tree) {
-      if (f.folder_id === targetId) return f;
-      if (f.children) {
-        const found = findFolder(f.children, targetId);
-        if (found) return found;
-      }
+  const loadMoreFolders = async () => {
+    setLoadingMore(true);
+    try {
+      const { data } = await api.get(`/folders/${folderId || 'ROOT'}/children`, {
+        params: { next_token: foldersToken },
+      });
+      setFolders((prev) => [...prev, ...(data.children || [])]);
+      setFoldersToken(data.next_token || null);
+    } catch (err) {
+      setError(err);
+    } finally {
+      setLoadingMore(false);
     }
-    return null;
-  };
-
-  const buildBreadcrumbs = (tree, targetId) => {
-    const path = [];
-    const search = (nodes, trail) => {
-      for (const f of nodes) {
-        const current = [...trail, { folder_id: f.folder_id, name: f.name }];
-        if (f.folder_id === targetId) { path.push(...current); return true; }
-        if (f.children && search(f.children, current)) return true;
-      }
-      return false;
-    };
-    search(tree, []);
-    return path;
   };
 
   const handleUpload = async (e) => {
@@ -221,9 +215,7 @@ export default function FolderBrowserPage() {
     return new Date(ts * 1000).toLocaleString();
   };
 
-  const displayFolders = folderId && currentFolder
-    ? currentFolder.children || []
-    : folders;
+  const displayFolders = folders;
 
   if (loading) {
     return (
@@ -317,9 +309,9 @@ export default function FolderBrowserPage() {
                 <div className="card-body text-center py-4">
                   <i className="bi bi-folder-fill text-fs-primary" style={{ fontSize: '2.5rem' }}></i>
                   <h6 className="mt-2 mb-1">{folder.name}</h6>
-                  {folder.children?.length > 0 && (
+                  {folder.has_children && (
                     <small className="text-muted">
-                      {folder.children.length} sub-folder{folder.children.length !== 1 ? 's' : ''}
+                      {folder.child_count} sub-folder{folder.child_count !== 1 ? 's' : ''}
                     </small>
                   )}
                 </div>
@@ -328,6 +320,14 @@ export default function FolderBrowserPage() {
           ))}
         </div>
       )}
+      {foldersToken && (
+        <div className="text-center mb-4">
+          <button className="btn btn-outline-primary" onClick={loadMoreFolders} disabled={loadingMore}>
+            {loadingMore && <span className="spinner-border spinner-border-sm me-2" role="status"></span>}
+            Load more folders
+          </button>
+        </div>
+      )}
 
       {/* Files table */}
       {folderId && (
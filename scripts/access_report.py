@@ -0,0 +1,195 @@
+"""Rank hot partitions and per-route access costs from DB_TRACE output.
+
+Reads the "db_trace" records shared.metrics writes when DB_TRACE is set
+(one JSON object per invocation, listing every shared.db call) and prints:
+
+  - hot partitions: calls, items and capacity per (index, partition key)
+  - key prefixes: the same totals per entity type (PARENT#, USER#, ...)
+  - fan-out by route: db calls and distinct partitions per request
+  - read amplification by route: items scanned per item returned, RCU per
+    item returned, and identity-map hit rate
+
+Input is any mix of trace files and CloudWatch Logs exports (text before the
+JSON object on a line is ignored). Reads stdin when no files are given.
+
+Collect locally with, e.g.:
+    DB_TRACE=/tmp/trace.jsonl python3 scripts/local_api.py --quiet
+    DB_TRACE=/tmp/trace.jsonl python3 scripts/bench_handlers.py
+
+Usage:
+    python3 scripts/access_report.py /tmp/trace.jsonl [--top 20] [--sort units]
+"""
+
+import argparse
+import fileinput
+import json
+from collections import defaultdict
+
+READ_OPS = {'GetItem', 'BatchGetItem', 'Query', 'Scan'}
+
+
+def read_traces(paths):
+    """Yield db_trace records from trace files or log exports."""
+    for line in fileinput.input(paths or ['-']):
+        start = line.find('{')
+        if start < 0 or '"db_trace"' not in line:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get('type') == 'db_trace':
+            yield record
+
+
+def call_units(call):
+    return call.get('rcu', 0) + call.get('wcu', 0)
+
+
+def partition_shares(call):
+    """Split one call across the partitions it touched: [(pk, calls, items, units)].
+
+    A batch call counts as one call for each partition it touches; its items
+    and capacity are shared out by key count.
+    """
+    partitions = call.get('partitions')
+    if not partitions:
+        if call.get('pk'):
+            return [(call['pk'], 1, call.get('items', 0), call_units(call))]
+        return [('<scan>', 1, call.get('items', 0), call_units(call))]
+    keys = sum(partitions.values())
+    units = call_units(call)
+    items = call.get('items', keys)
+    return [(pk, 1, items * n / keys, units * n / keys) for pk, n in partitions.items()]
+
+
+def prefix_of(pk):
+    head, sep, _ = pk.partition('#')
+    return head + sep
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Report:
+    def __init__(self):
+        self.requests = 0
+        self.partitions = defaultdict(lambda: {'calls': 0, 'items': 0, 'units': 0,
+                                               'requests': set()})
+        self.prefixes = defaultdict(lambda: {'calls': 0, 'items': 0, 'units': 0})
+        self.routes = defaultdict(lambda: {
+            'requests': 0, 'calls': [], 'fanout': [], 'units': 0,
+            'scanned': 0, 'returned': 0, 'read_units': 0, 'read_items': 0,
+            'gets': 0, 'cached': 0,
+        })
+        self.totals = {'calls': 0, 'rcu': 0, 'wcu': 0}
+
+    def add(self, record):
+        self.requests += 1
+        route = self.routes[record.get('route') or '?']
+        route['requests'] += 1
+        calls = 0
+        touched = set()
+        for call in record.get('calls', []):
+            op = call.get('op')
+            if op == 'GetItem':
+                route['gets'] += 1
+            if call.get('cached'):
+                route['cached'] += 1
+                continue
+            calls += 1
+            self.totals['calls'] += 1
+            self.totals['rcu'] += call.get('rcu', 0)
+            self.totals['wcu'] += call.get('wcu', 0)
+            route['units'] += call_units(call)
+            index = call.get('index') or 'table'
+            prefixes = set()
+            for pk, n, items, units in partition_shares(call):
+                touched.add((index, pk))
+                entry = self.partitions[(index, pk)]
+                entry['calls'] += n
+                entry['items'] += items
+                entry['units'] += units
+                entry['requests'].add(record.get('request_id') or id(record))
+                prefix = self.prefixes[(index, prefix_of(pk))]
+                prefix['items'] += items
+                prefix['units'] += units
+                prefixes.add((index, prefix_of(pk)))
+            # A batch call spanning many partitions of one type counts once
+            for key in prefixes:
+                self.prefixes[key]['calls'] += 1
+            if op in READ_OPS:
+                route['read_units'] += call.get('rcu', 0)
+                route['read_items'] += call.get('items', 0)
+            if op in ('Query', 'Scan'):
+                route['scanned'] += call.get('scanned', call.get('items', 0))
+                route['returned'] += call.get('items', 0)
+        route['calls'].append(calls)
+        route['fanout'].append(len(touched))
+
+    def print(self, top, sort):
+        print(f'{self.requests:,} requests, {self.totals["calls"]:,} db calls, '
+              f'{self.totals["rcu"]:,.1f} RCU, {self.totals["wcu"]:,.1f} WCU')
+        total_calls = self.totals['calls'] or 1
+        total_units = (self.totals['rcu'] + self.totals['wcu']) or 1
+
+        print(f'\nHot partitions (top {top} by {sort})')
+        print(f'{"index":<7} {"partition key":<40} {"calls":>8} {"%calls":>7} '
+              f'{"items":>10} {"units":>10} {"%units":>7} {"requests":>9}')
+        ranked = sorted(self.partitions.items(), key=lambda kv: kv[1][sort], reverse=True)
+        for (index, pk), e in ranked[:top]:
+            print(f'{index:<7} {pk[:40]:<40} {e["calls"]:>8,} '
+                  f'{100 * e["calls"] / total_calls:>6.1f}% {e["items"]:>10,.0f} '
+                  f'{e["units"]:>10,.1f} {100 * e["units"] / total_units:>6.1f}% '
+                  f'{len(e["requests"]):>9,}')
+
+        print('\nKey prefixes')
+        print(f'{"index":<7} {"prefix":<20} {"calls":>8} {"%calls":>7} {"items":>10} '
+              f'{"units":>10} {"%units":>7}')
+        ranked = sorted(self.prefixes.items(), key=lambda kv: kv[1][sort], reverse=True)
+        for (index, prefix), e in ranked:
+            print(f'{index:<7} {prefix:<20} {e["calls"]:>8,} '
+                  f'{100 * e["calls"] / total_calls:>6.1f}% {e["items"]:>10,.0f} '
+                  f'{e["units"]:>10,.1f} {100 * e["units"] / total_units:>6.1f}%')
+
+        print('\nFan-out by route (db calls and distinct partitions per request)')
+        print(f'{"route":<44} {"reqs":>6} {"calls avg":>9} {"p95":>6} {"max":>6} '
+              f'{"parts avg":>9} {"units/req":>10}')
+        by_units = sorted(self.routes.items(), key=lambda kv: kv[1]['units'], reverse=True)
+        for name, r in by_units:
+            n = r['requests']
+            print(f'{name[:44]:<44} {n:>6,} {sum(r["calls"]) / n:>9.1f} '
+                  f'{percentile(r["calls"], 0.95):>6} {max(r["calls"]):>6} '
+                  f'{sum(r["fanout"]) / n:>9.1f} {r["units"] / n:>10.1f}')
+
+        print('\nRead amplification by route')
+        print(f'{"route":<44} {"scanned/returned":>16} {"RCU/item":>9} {"map hits":>9}')
+        for name, r in by_units:
+            amplification = r['scanned'] / r['returned'] if r['returned'] else 0
+            per_item = r['read_units'] / r['read_items'] if r['read_items'] else 0
+            hits = f'{100 * r["cached"] / r["gets"]:.0f}%' if r['gets'] else '-'
+            print(f'{name[:44]:<44} {amplification:>16.1f} {per_item:>9.3f} {hits:>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='*', help='trace files (default: stdin)')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', choices=('calls', 'items', 'units'), default='calls')
+    args = parser.parse_args()
+
+    report = Report()
+    for record in read_traces(args.paths):
+        report.add(record)
+    if not report.requests:
+        print('No db_trace records found (was DB_TRACE set?)')
+        return
+    report.print(args.top, args.sort)
+
+
+if __name__ == '__main__':
+    main()
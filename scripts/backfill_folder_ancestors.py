@@ -0,0 +1,96 @@
+"""Store ancestor chains on folder META items that lack them (or have stale ones).
+
+Folder items now carry ancestor_ids / ancestor_names (root first, parent
+last), written by folders.handler on create and kept current on rename.
+This job scans every folder, works out the true chains from parent_id and
+name, and rewrites the items whose stored chain is missing or differs. It
+is idempotent and safe to re-run; run it once after deploying, and any time
+a rename was interrupted.
+
+Usage:
+    TABLE_NAME=FileShareTable-dev python3 scripts/backfill_folder_ancestors.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+from shared import db, folder_cache  # noqa: E402
+
+
+def load_folders():
+    """folder_id -> META item for every folder in the table."""
+    items = db.iter_scan(
+        filter_expression=Attr('SK').eq('META') & Attr('PK').begins_with('FOLDER#'),
+        attributes=['parent_id', 'name', 'created_at', 'ancestor_ids', 'ancestor_names'])
+    return {item['PK'][len('FOLDER#'):]: item for item in items}
+
+
+def chains(folders):
+    """folder_id -> (ancestor_ids, ancestor_names), computed from parent links."""
+    result = {}
+    for folder_id in folders:
+        # Walk up to ROOT, a missing parent, a cycle or an already-resolved folder
+        path = []
+        current = folder_id
+        while current in folders and current not in result and current not in path:
+            path.append(current)
+            current = folders[current].get('parent_id')
+        if current in result:
+            ids, names = result[current]
+            ids, names = ids + [current], names + [folders[current].get('name')]
+        else:
+            ids, names = [], []
+        # ...then resolve the walked folders top-down
+        for fid in reversed(path):
+            result[fid] = (ids, names)
+            ids, names = ids + [fid], names + [folders[fid].get('name')]
+    return result
+
+
+def backfill(dry_run=False, workers=16):
+    """Rewrite every folder whose stored chain is wrong; returns counts."""
+    folders = load_folders()
+    pending = []
+    for folder_id, (ids, names) in chains(folders).items():
+        item = folders[folder_id]
+        if item.get('ancestor_ids') != ids or item.get('ancestor_names') != names:
+            pending.append((folder_id, ids, names))
+
+    def write(job):
+        folder_id, ids, names = job
+        db.update_item(f'FOLDER#{folder_id}', 'META',
+                       'SET ancestor_ids = :ids, ancestor_names = :names',
+                       {':ids': ids, ':names': names},
+                       condition_expression='attribute_exists(PK)')
+
+    if pending and not dry_run:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(write, pending))
+        folder_cache.bump_generation()
+    return {'folders': len(folders), 'updated': len(pending)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true',
+                        help='count the folders that would change without writing')
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    started = time.time()
+    counts = backfill(args.dry_run, args.workers)
+    verb = 'would update' if args.dry_run else 'updated'
+    print(f'{counts["folders"]:,} folders, {verb} {counts["updated"]:,} '
+          f'in {time.time() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
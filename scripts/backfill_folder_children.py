@@ -0,0 +1,82 @@
+"""Build the name-sorted child listing rows (CHILDREN#<parent>) for existing trees.
+
+folders.handler keeps each folder's row in its parent's listing current
+(see shared/folder_children.py), which GET /folders/{folderId}/children
+reads. Folders created before that have none. This job derives every row,
+child_count included, from the folders' parent_id and name, writes the
+rows that are missing or wrong and deletes rows for folders that no longer
+exist, were renamed or are keyed by an unnormalized name.
+
+The rows are also the sibling-name claims that folder create and rename
+check. Until this job has finished with no duplicate names (sibling folders
+whose names normalize alike, which it lists for renaming), the handlers
+also check siblings over GSI1 on every create and rename. Running it
+(idempotent) once after deploying is a required step: it records its
+completion with folder_children.mark_migrated(), which switches that
+fallback off.
+
+Usage:
+    TABLE_NAME=FileShareTable-dev python3 scripts/backfill_folder_children.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+from shared import db, folder_children  # noqa: E402
+from backfill_folder_ancestors import load_folders  # noqa: E402
+
+
+def backfill(dry_run=False):
+    """Write missing or stale listing rows and delete stray ones; returns counts."""
+    folders = load_folders()
+    counts = {}
+    for folder in folders.values():
+        parent_id = folder.get('parent_id', 'ROOT')
+        counts[parent_id] = counts.get(parent_id, 0) + 1
+    wanted, duplicates = {}, []
+    for folder_id, folder in folders.items():
+        row = folder_children.row(folder, counts.get(folder_id, 0))
+        if (row['PK'], row['SK']) in wanted:
+            duplicates.append((wanted[(row['PK'], row['SK'])]['folder_id'], folder_id))
+            continue
+        wanted[(row['PK'], row['SK'])] = row
+    existing = {(item['PK'], item['SK']): item for item in db.iter_scan(
+        filter_expression=Attr('PK').begins_with('CHILDREN#'))}
+
+    puts = [row for key, row in wanted.items() if existing.get(key) != row]
+    deletes = [{'PK': pk, 'SK': sk} for pk, sk in existing.keys() - wanted.keys()]
+    if not dry_run and (puts or deletes):
+        db.batch_write(puts=puts, deletes=deletes)
+    if not dry_run:
+        if duplicates:
+            db.delete_item(folder_children.MIGRATION_PK, folder_children.MIGRATION_SK)
+        else:
+            folder_children.mark_migrated()
+    return {'folders': len(folders), 'written': len(puts), 'deleted': len(deletes),
+            'duplicates': duplicates}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true',
+                        help='count the rows that would change without writing')
+    args = parser.parse_args()
+
+    started = time.time()
+    counts = backfill(args.dry_run)
+    verbs = ('would write', 'would delete') if args.dry_run else ('wrote', 'deleted')
+    print(f'{counts["folders"]:,} folders, {verbs[0]} {counts["written"]:,} rows and '
+          f'{verbs[1]} {counts["deleted"]:,} in {time.time() - started:.1f}s')
+    for kept, other in counts['duplicates']:
+        print(f'folder {other} has the same name as its sibling {kept}; rename one and rerun')
+
+
+if __name__ == '__main__':
+    main()
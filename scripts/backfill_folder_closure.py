@@ -0,0 +1,71 @@
+"""Build the folder closure-table rows (ANCESTOR#<id> / DESC#...) for existing trees.
+
+folders.handler writes a folder's closure rows when it is created and
+deletes them with it (see shared/closure.py). Folders created before that
+have none, so subtree reads (admin tree, access sets, rename, delete)
+would miss them. This job works out every folder's chain from parent_id,
+writes the rows that are missing or out of date (including the name,
+parent_id and created_at snapshot on ROOT rows) and deletes rows for
+folders that no longer exist or have moved. It is idempotent; run it once
+after deploying, and again after any interrupted delete. When it finishes
+it records so with closure.mark_migrated(); until then the admin tree is
+walked over GSI1 instead of read from the closure rows.
+
+Usage:
+    TABLE_NAME=FileShareTable-dev python3 scripts/backfill_folder_closure.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+from shared import closure, db  # noqa: E402
+from backfill_folder_ancestors import chains, load_folders  # noqa: E402
+
+
+def existing_rows():
+    """(PK, SK) -> item for every closure row currently in the table."""
+    items = db.iter_scan(filter_expression=Attr('PK').begins_with('ANCESTOR#'))
+    return {(item['PK'], item['SK']): item for item in items}
+
+
+def backfill(dry_run=False):
+    """Write missing or stale closure rows and delete stray ones; returns counts."""
+    folders = load_folders()
+    wanted = {}
+    for folder_id, (ids, _) in chains(folders).items():
+        for row in closure.rows(folder_id, ids, folders[folder_id]):
+            wanted[(row['PK'], row['SK'])] = row
+    existing = existing_rows()
+
+    puts = [row for key, row in wanted.items() if existing.get(key) != row]
+    deletes = [{'PK': pk, 'SK': sk} for pk, sk in existing.keys() - wanted.keys()]
+    if not dry_run:
+        if puts or deletes:
+            db.batch_write(puts=puts, deletes=deletes)
+        closure.mark_migrated()
+    return {'folders': len(folders), 'written': len(puts), 'deleted': len(deletes)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true',
+                        help='count the rows that would change without writing')
+    args = parser.parse_args()
+
+    started = time.time()
+    counts = backfill(args.dry_run)
+    verb = 'would write' if args.dry_run else 'wrote'
+    print(f'{counts["folders"]:,} folders, {verb} {counts["written"]:,} rows and '
+          f'{"would delete" if args.dry_run else "deleted"} {counts["deleted"]:,} '
+          f'in {time.time() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Build the user directory rows (USERDIR#<status>) for existing users.
+
+auth_users.handler keeps each profile's directory rows current (see
+shared/user_directory.py). Users created before that have none and would
+be missing from GET /users. This job scans every profile, writes the rows
+that are missing or out of date and deletes rows for users that no longer
+exist or changed status. It is idempotent; run it once after deploying.
+
+Usage:
+    TABLE_NAME=FileShareTable-dev python3 scripts/backfill_user_directory.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+from shared import db, user_directory  # noqa: E402
+
+
+def backfill(dry_run=False):
+    """Write missing or stale directory rows and delete stray ones; returns counts."""
+    profiles = db.iter_scan(filter_expression=Attr('SK').eq('PROFILE'),
+                            attributes=user_directory.ATTRIBUTES)
+    wanted = {}
+    users = 0
+    for profile in profiles:
+        users += 1
+        for row in user_directory.rows(profile):
+            wanted[(row['PK'], row['SK'])] = row
+    existing = {(item['PK'], item['SK']): item for item in db.iter_scan(
+        filter_expression=Attr('PK').begins_with('USERDIR#'))}
+
+    puts = [row for key, row in wanted.items() if existing.get(key) != row]
+    deletes = [{'PK': pk, 'SK': sk} for pk, sk in existing.keys() - wanted.keys()]
+    if not dry_run and (puts or deletes):
+        db.batch_write(puts=puts, deletes=deletes)
+    return {'users': users, 'written': len(puts), 'deleted': len(deletes)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true',
+                        help='count the rows that would change without writing')
+    args = parser.parse_args()
+
+    started = time.time()
+    counts = backfill(args.dry_run)
+    verbs = ('would write', 'would delete') if args.dry_run else ('wrote', 'deleted')
+    print(f'{counts["users"]:,} users, {verbs[0]} {counts["written"]:,} rows and '
+          f'{verbs[1]} {counts["deleted"]:,} in {time.time() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
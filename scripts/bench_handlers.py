@@ -0,0 +1,171 @@
+"""Profile the Lambda handlers against a large synthetic dataset in memory.
+
+Builds a folder tree with files, users and assignments directly in the
+in-memory DynamoDB engine, then times representative API calls through the
+real handlers, with the DynamoDB capacity each call would consume. Use
+--profile to print the hottest functions.
+
+Usage:
+    python3 scripts/bench_handlers.py [--items 1000000] [--profile]
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Capacity is printed in the table below instead of as EMF log lines
+os.environ.setdefault('METRICS_ENABLED', 'false')
+
+import local_api  # noqa: E402  (sets DB_BACKEND=memory and the layer path)
+from shared import closure, db, folder_children, user_directory  # noqa: E402
+from shared.memory_backend import MemoryDynamoDB  # noqa: E402
+
+ADMIN_TOKEN = 'bench-admin-token'
+READER_TOKEN = 'bench-reader-token'
+
+
+def session(token, username, role):
+    return {
+        'PK': f'SESSION#{token}', 'SK': 'SESSION',
+        'GSI1PK': f'USER#{username}', 'GSI1SK': f'SESSION#{token}',
+        'username': username, 'role': role,
+        'created_at': 1700000000, 'ttl': 4102444800,
+    }
+
+
+def build_dataset(total_items, fanout, files_per_folder):
+    """Yield folder, file, user and session items until ~total_items exist."""
+    folders_needed = max(1, total_items // (files_per_folder + 1))
+    folder_ids = []
+    folders = []
+    child_counts = {}
+    queue = [('ROOT', 0, [], [])]
+    count = 0
+    while queue and count < folders_needed:
+        parent_id, depth, ancestor_ids, ancestor_names = queue.pop(0)
+        for i in range(fanout):
+            if count >= folders_needed:
+                break
+            folder_id = f'{count:08x}'
+            count += 1
+            folder_ids.append(folder_id)
+            name = f'folder-{depth}-{i}'
+            folder = {
+                'PK': f'FOLDER#{folder_id}', 'SK': 'META',
+                'GSI1PK': db.gsi1_key(f'PARENT#{parent_id}', f'FOLDER#{folder_id}'),
+                'GSI1SK': f'FOLDER#{folder_id}',
+                'name': name, 'parent_id': parent_id,
+                'ancestor_ids': ancestor_ids, 'ancestor_names': ancestor_names,
+                'created_at': 1700000000,
+            }
+            yield folder
+            yield from closure.rows(folder_id, ancestor_ids, folder)
+            folders.append(folder)
+            child_counts[parent_id] = child_counts.get(parent_id, 0) + 1
+            for f in range(files_per_folder):
+                file_id = f'{folder_id}{f:04x}'
+                yield {
+                    'PK': f'FOLDER#{folder_id}', 'SK': f'FILE#{file_id}',
+                    'GSI1PK': f'FILE#{file_id}', 'GSI1SK': f'FOLDER#{folder_id}',
+                    'file_id': file_id, 'folder_id': folder_id,
+                    'file_name': f'report-{f}.pdf' if f % 10 == 0 else f'data-{f}.csv',
+                    'file_size': 1024 * f, 's3_key': f'files/{folder_id}/{file_id}/x',
+                    'uploaded_by': 'admin', 'uploaded_at': 1700000000,
+                }
+            queue.append((folder_id, depth + 1,
+                          ancestor_ids + [folder_id], ancestor_names + [name]))
+    for folder in folders:
+        yield folder_children.row(folder, child_counts.get(folder['PK'][len('FOLDER#'):], 0))
+    # Every folder has its closure and listing rows, as after the backfills
+    for module in (closure, folder_children):
+        yield {'PK': module.MIGRATION_PK, 'SK': module.MIGRATION_SK, 'completed_at': 1700000000}
+
+    for username, role in (('admin', 'Admin'), ('reader', 'Reader')):
+        profile = {
+            'PK': f'USER#{username}', 'SK': 'PROFILE',
+            'GSI1PK': db.gsi1_key(f'ROLE#{role}', f'USER#{username}'),
+            'GSI1SK': f'USER#{username}',
+            'username': username, 'password_hash': 'x', 'role': role,
+            'status': 'active', 'force_password_change': False,
+            'created_at': 1700000000,
+        }
+        yield profile
+        yield from user_directory.rows(profile)
+    yield session(ADMIN_TOKEN, 'admin', 'Admin')
+    yield session(READER_TOKEN, 'reader', 'Reader')
+    # Give the reader the first top-level folder's subtree
+    first = folder_ids[0]
+    yield {
+        'PK': f'FOLDER#{first}', 'SK': 'ASSIGN#reader',
+        'GSI1PK': 'USER#reader', 'GSI1SK': f'ASSIGN#FOLDER#{first}',
+        'username': 'reader', 'folder_id': first, 'assigned_at': 1700000000,
+    }
+    yield {'first_folder': first, 'last_folder': folder_ids[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--files-per-folder', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+
+    resource = MemoryDynamoDB()
+    db.use_backend(resource)
+    table = resource.Table(db.TABLE_NAME)
+
+    started = time.perf_counter()
+    items = list(build_dataset(args.items, args.fanout, args.files_per_folder))
+    marker = items.pop()
+    table.bulk_load(items)
+    print(f'Loaded {len(table):,} items in {time.perf_counter() - started:.1f}s')
+
+    api = local_api.LocalApi(os.path.join(local_api.ROOT, 'template.yaml'))
+    calls = [
+        ('admin  GET /folders', 'GET', '/folders', ADMIN_TOKEN),
+        ('reader GET /folders', 'GET', '/folders', READER_TOKEN),
+        ('admin  GET /folders/ROOT/children', 'GET', '/folders/ROOT/children', ADMIN_TOKEN),
+        ('reader GET /folders/ROOT/children', 'GET', '/folders/ROOT/children', READER_TOKEN),
+        ('reader GET /folders/{id}/children', 'GET',
+         f'/folders/{marker["first_folder"]}/children', READER_TOKEN),
+        ('admin  GET /files/search', 'GET', '/files/search?q=report', ADMIN_TOKEN),
+        ('reader GET /files/search', 'GET', '/files/search?q=report', READER_TOKEN),
+        ('admin  GET /folders/{id}/files', 'GET',
+         f'/folders/{marker["last_folder"]}/files', ADMIN_TOKEN),
+        ('reader GET /folders/{id}/files', 'GET',
+         f'/folders/{marker["first_folder"]}/files', READER_TOKEN),
+        ('admin  GET /users', 'GET', '/users', ADMIN_TOKEN),
+    ]
+
+    profiler = cProfile.Profile() if args.profile else None
+    print(f'\n{"call":<34} {"status":>6} {"best ms":>10} {"bytes":>12} {"RCU":>10} {"WCU":>8}')
+    for label, method, path, token in calls:
+        best = None
+        for _ in range(args.repeat):
+            headers = {'Authorization': f'Bearer {token}'}
+            if profiler:
+                profiler.enable()
+            t0 = time.perf_counter()
+            status, _, body = api.invoke(method, path, headers, None)
+            elapsed = (time.perf_counter() - t0) * 1000
+            if profiler:
+                profiler.disable()
+            best = elapsed if best is None else min(best, elapsed)
+        usage = db.consumed_capacity().values()
+        rcu = sum(units['read'] for units in usage)
+        wcu = sum(units['write'] for units in usage)
+        print(f'{label:<34} {status:>6} {best:>10.1f} {len(body):>12,} {rcu:>10,.1f} {wcu:>8,.1f}')
+
+    if profiler:
+        print()
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark item decoding and response encoding on a large payload.
+
+Compares the old path (boto3's Decimal deserializer + DecimalEncoder) with
+shared.db's NativeDeserializer and shared.response.to_json (orjson when
+installed, stdlib json otherwise).
+
+Usage:
+    python3 scripts/bench_json_encode.py [--items 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'backend', 'layers', 'shared'))
+
+from boto3.dynamodb.types import TypeDeserializer  # noqa: E402
+
+from shared import response  # noqa: E402
+from shared.db import NativeDeserializer  # noqa: E402
+
+
+def wire_items(count):
+    """Items in DynamoDB wire format, shaped like search results."""
+    return [{
+        'file_id': {'S': f'{i:08x}'},
+        'file_name': {'S': f'quarterly_report_{i}.pdf'},
+        'file_size': {'N': str(1024 * i + 17)},
+        'uploaded_by': {'S': 'uploader1'},
+        'uploaded_at': {'N': str(1700000000 + i)},
+        'folder_id': {'S': f'{i % 97:08x}'},
+        'folder_path': {'S': '/Projects/Alpha/Reports'},
+    } for i in range(count)]
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    wire = wire_items(args.items)
+    decimal_deserializer = TypeDeserializer()
+    native_deserializer = NativeDeserializer()
+
+    def decode(deserializer):
+        return [{k: deserializer.deserialize(v) for k, v in item.items()} for item in wire]
+
+    decimal_items = decode(decimal_deserializer)
+    native_items = decode(native_deserializer)
+
+    rows = [
+        ('decode  Decimal (boto3 default)', lambda: decode(decimal_deserializer)),
+        ('decode  native int/float', lambda: decode(native_deserializer)),
+        ('encode  Decimal + DecimalEncoder',
+         lambda: json.dumps({'files': decimal_items}, cls=response.DecimalEncoder)),
+        ('encode  native + stdlib json', lambda: json.dumps({'files': native_items})),
+    ]
+    if response.orjson is not None:
+        rows.append(('encode  native + orjson', lambda: response.to_json({'files': native_items})))
+    else:
+        print('(orjson not installed; to_json uses the stdlib fallback)')
+
+    print(f'{args.items:,} items, best of {args.repeat}\n')
+    results = {}
+    for label, fn in rows:
+        results[label] = best_of(args.repeat, fn)
+        print(f'{label:<36} {results[label]:>9.2f} ms')
+
+    old = results['decode  Decimal (boto3 default)'] + results['encode  Decimal + DecimalEncoder']
+    new = results['decode  native int/float'] + best_of(
+        args.repeat, lambda: response.to_json({'files': native_items}))
+    print(f'\nold path {old:.2f} ms -> new path {new:.2f} ms ({old / new:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Compare botocore retry modes against a throttling DynamoDB stand-in.
+
+Starts a local HTTP server that speaks just enough of the DynamoDB JSON
+protocol to answer GetItem, admitting requests through a token bucket and
+answering the rest with ProvisionedThroughputExceededException. A pool of
+threads then hammers it through clients built by shared.aws, once per
+retry mode, and reports how many calls succeeded, how many attempts the
+server saw and how many of them were throttled.
+
+Usage:
+    python3 scripts/bench_throttling.py [--rate 300] [--workers 32] [--calls 50]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+from shared import aws  # noqa: E402
+
+MODES = ('legacy', 'standard', 'adaptive')
+
+
+class TokenBucket:
+    """Provisioned capacity: `rate` requests/second with a `burst` allowance."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class ThrottlingDynamoDB(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, rate, burst):
+        super().__init__(address, make_handler())
+        self.bucket = TokenBucket(rate, burst)
+        self.stats_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.stats_lock:
+            self.attempts = 0
+            self.throttled = 0
+
+    def record(self, admitted):
+        with self.stats_lock:
+            self.attempts += 1
+            if not admitted:
+                self.throttled += 1
+
+
+def make_handler():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            admitted = self.server.bucket.take()
+            self.server.record(admitted)
+            if admitted:
+                status = 200
+                body = {'Item': dict(request.get('Key', {}), name={'S': 'bench'})}
+            else:
+                status = 400
+                body = {
+                    '__type': 'com.amazonaws.dynamodb.v20120810#'
+                              'ProvisionedThroughputExceededException',
+                    'message': 'The level of configured provisioned throughput '
+                               'for the table was exceeded.',
+                }
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/x-amz-json-1.0')
+            self.send_header('x-amzn-RequestId', 'bench')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def run_mode(server, endpoint, mode, workers, calls, max_attempts):
+    client = aws.get_client('dynamodb', endpoint_url=endpoint,
+                            access_key='dummy', secret_key='dummy',
+                            retry_mode=mode, max_attempts=max_attempts,
+                            max_pool_connections=workers)
+    server.reset()
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def worker(n):
+        nonlocal failures
+        for i in range(calls):
+            t0 = time.perf_counter()
+            try:
+                client.get_item(TableName='bench',
+                                Key={'PK': {'S': f'USER#{n}-{i}'}, 'SK': {'S': 'PROFILE'}})
+                ok = True
+            except ClientError:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(worker, range(workers)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(f'{mode:<10} {len(latencies):>8} {failures:>8} {server.attempts:>9} '
+          f'{server.throttled:>9} {wall:>8.2f} {p50:>9.1f} {p99:>9.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=float, default=300, help='admitted requests/second')
+    parser.add_argument('--burst', type=float, default=50)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--calls', type=int, default=50, help='GetItem calls per worker')
+    parser.add_argument('--max-attempts', type=int, default=aws.MAX_ATTEMPTS)
+    parser.add_argument('--modes', default=','.join(MODES))
+    args = parser.parse_args()
+
+    server = ThrottlingDynamoDB(('127.0.0.1', 0), args.rate, args.burst)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f'http://127.0.0.1:{server.server_address[1]}'
+
+    print(f'{args.workers} workers x {args.calls} GetItem calls, capacity '
+          f'{args.rate:g}/s (burst {args.burst:g}), max_attempts={args.max_attempts}\n')
+    print(f'{"mode":<10} {"ok":>8} {"failed":>8} {"attempts":>9} {"throttled":>9} '
+          f'{"wall s":>8} {"p50 ms":>9} {"p99 ms":>9}')
+    for mode in args.modes.split(','):
+        # Let the bucket refill so every mode starts from the same state
+        time.sleep(args.burst / args.rate)
+        run_mode(server, endpoint, mode, args.workers, args.calls, args.max_attempts)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Measure bcrypt cost on this machine and recommend BCRYPT_ROUNDS.
+
+Times one hash at each cost and prints the highest cost that fits a target
+hash time, never below the security floor of passwords.MIN_ROUNDS (10).
+Logins rehash to whatever cost is deployed, so a lower value also speeds up
+existing users. Run it where the Lambda runs (or
+with the same CPU share: a 256 MB function gets ~1/7 of a vCPU) and deploy
+the result as the stage's BcryptRounds parameter (BCRYPT_ROUNDS).
+
+Usage:
+    python3 scripts/calibrate_bcrypt.py [--target-ms 250] [--max-rounds 14]
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+
+from shared import passwords  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target-ms', type=float, default=250)
+    parser.add_argument('--min-rounds', type=int, default=passwords.MIN_ROUNDS)
+    parser.add_argument('--max-rounds', type=int, default=14)
+    args = parser.parse_args()
+
+    print(f'{"rounds":>6} {"ms/hash":>10}')
+    for rounds in range(8, args.max_rounds + 1):
+        ms = passwords.measure(rounds, samples=1 if rounds > 12 else 3)
+        marker = '  <= target' if ms <= args.target_ms else ''
+        print(f'{rounds:>6} {ms:>10.1f}{marker}')
+
+    chosen = passwords.calibrate(args.target_ms, args.min_rounds, args.max_rounds)
+    print(f'\nA {args.target_ms:g} ms target fits {chosen} rounds '
+          f'(floor {args.min_rounds}); deploy with BCRYPT_ROUNDS={chosen}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Serve the Lambda handlers in-process on a local HTTP port.
+
+A lightweight alternative to `sam local start-api` for tests and profiling:
+routes are read from template.yaml, every handler runs in this process, and
+the shared layer uses the in-memory DynamoDB engine (DB_BACKEND=memory) so
+no Docker, DynamoDB Local or network access is needed. The default admin
+account is seeded on startup.
+
+Usage:
+    python3 scripts/local_api.py [--port 3000] [--no-seed]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('DB_BACKEND', 'memory')
+os.environ.setdefault('TABLE_NAME', 'FileShareTable-dev')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'dummy')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'dummy')
+# Pre-signed URLs are generated offline; point best-effort S3 deletes at a
+# closed local port so they fail fast instead of reaching out to AWS
+os.environ.setdefault('S3_ENDPOINT', 'http://127.0.0.1:9')
+# ...and do not retry them with backoff
+os.environ.setdefault('AWS_MAX_ATTEMPTS', '1')
+# Same GSI1 write sharding as template.yaml Globals
+os.environ.setdefault('GSI1_SHARDS', 'PARENT#ROOT=4,ROLE#*=4')
+# Cheap password hashes locally
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+
+# Lambda's default timeout from template.yaml Globals
+TIMEOUT_MS = 30000
+
+
+def load_routes(template_path):
+    """Map (METHOD, resource) -> handler directory by reading template.yaml."""
+    routes = {}
+    code_dir = None
+    path = None
+    with open(template_path) as f:
+        for line in f:
+            match = re.match(r'\s+CodeUri: backend/(\w+)/', line)
+            if match:
+                code_dir = match.group(1)
+                continue
+            match = re.match(r'\s+Path: (\S+)', line)
+            if match:
+                path = match.group(1)
+                continue
+            match = re.match(r'\s+Method: (\w+)', line)
+            if match and code_dir and path:
+                routes[(match.group(1).upper(), path)] = code_dir
+                path = None
+    return routes
+
+
+def load_handler(code_dir):
+    """Import backend/<code_dir>/handler.py under a unique module name."""
+    module_name = f'{code_dir}_handler'
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(ROOT, 'backend', code_dir, 'handler.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module.lambda_handler
+
+
+def compile_resource(resource):
+    """Turn '/folders/{folderId}' into a regex with named groups."""
+    pattern = re.sub(r'\\{(\w+)\\}', r'(?P<\1>[^/]+)', re.escape(resource))
+    return re.compile(f'^{pattern}$')
+
+
+class LambdaContext:
+    """The parts of the Lambda context object the handlers use."""
+
+    def __init__(self, function_name):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self._deadline = time.monotonic() + TIMEOUT_MS / 1000
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class LocalApi:
+    def __init__(self, template_path):
+        self.handlers = {}
+        self.routes = []
+        for (method, resource), code_dir in load_routes(template_path).items():
+            if code_dir not in self.handlers:
+                self.handlers[code_dir] = load_handler(code_dir)
+            self.routes.append((method, resource, compile_resource(resource), code_dir))
+        # API Gateway prefers literal segments over {params}
+        self.routes.sort(key=lambda r: (r[1].count('{'), -len(r[1])))
+
+    def match(self, method, path):
+        for route_method, resource, pattern, code_dir in self.routes:
+            found = pattern.match(path)
+            if found and (route_method == method or method == 'OPTIONS'):
+                return resource, found.groupdict(), code_dir
+        return None, None, None
+
+    def invoke(self, method, raw_path, headers, body):
+        url = urlsplit(raw_path)
+        resource, path_params, code_dir = self.match(method, url.path)
+        if resource is None:
+            return 403, {'Content-Type': 'application/json'}, '{"message":"Missing Authentication Token"}'
+        event = {
+            'httpMethod': method,
+            'resource': resource,
+            'path': url.path,
+            'pathParameters': path_params or None,
+            'queryStringParameters': dict(parse_qsl(url.query)) or None,
+            'headers': headers,
+            'body': body,
+            'requestContext': {'requestId': str(uuid.uuid4())},
+        }
+        response = self.handlers[code_dir](event, LambdaContext(code_dir))
+        return response['statusCode'], response.get('headers') or {}, response.get('body') or ''
+
+    def seed(self):
+        seed = load_handler('seed')
+        return json.loads(seed({}, LambdaContext('seed'))['body'])
+
+
+def make_request_handler(api, quiet):
+    class RequestHandler(BaseHTTPRequestHandler):
+        def _handle(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8') if length else None
+            status, headers, payload = api.invoke(
+                self.command, self.path, dict(self.headers.items()), body)
+            data = payload.encode('utf-8')
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = _handle
+
+        def log_message(self, fmt, *args):
+            if not quiet:
+                super().log_message(fmt, *args)
+
+    return RequestHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--no-seed', action='store_true', help='skip creating the admin user')
+    parser.add_argument('--quiet', action='store_true', help='do not log each request')
+    args = parser.parse_args()
+
+    api = LocalApi(os.path.join(ROOT, 'template.yaml'))
+    if not args.no_seed:
+        print(f">>> {api.seed().get('message')}", flush=True)
+
+    server = HTTPServer((args.host, args.port), make_request_handler(api, args.quiet))
+    print(f'>>> Local API ({os.environ["DB_BACKEND"]} backend) on '
+          f'http://{args.host}:{args.port}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
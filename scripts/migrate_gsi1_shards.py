@@ -0,0 +1,118 @@
+"""Re-key GSI1 partition keys to match the current GSI1_SHARDS rules.
+
+Items written before a key was sharded (or under a different shard count)
+keep their old GSI1PK. shared.db still reads the unsuffixed key alongside
+the shards, so nothing disappears, but hot writes keep landing on one
+partition until existing items are moved. This script scans the table and
+rewrites every GSI1PK whose target differs from db.gsi1_key(); each update
+is conditional on the old value, so it is safe to re-run or to run while
+the API is live.
+
+To change a shard count, pass the old rules with --previous so suffixed
+keys under them are recognized and re-spread; to un-shard a key, drop it
+from GSI1_SHARDS and list it in --previous.
+
+Usage:
+    GSI1_SHARDS='PARENT#ROOT=4,ROLE#*=4' TABLE_NAME=FileShareTable-dev \\
+        python3 scripts/migrate_gsi1_shards.py [--previous 'PARENT#ROOT=2'] [--dry-run]
+"""
+
+import argparse
+import itertools
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+from shared import db  # noqa: E402
+
+SHARD_SUFFIX = re.compile(r'^(.*)#(\d+)$')
+CHUNK_SIZE = 1000
+
+
+def logical_key(gsi1pk, previous_rules):
+    """Strip a shard suffix from a physical GSI1PK, if it has one.
+
+    A '#<n>' suffix only counts as a shard when the remaining key is sharded
+    under the current or previous rules (so e.g. 'FILE#123' is left alone).
+    """
+    match = SHARD_SUFFIX.match(gsi1pk)
+    if not match:
+        return gsi1pk
+    base = match.group(1)
+    if db.shard_count(base) > 1 or db.shard_count(base, previous_rules) > 1:
+        return base
+    return gsi1pk
+
+
+def plan(previous_spec=''):
+    """Yield (item, target GSI1PK) for every item stored under the wrong key."""
+    previous_rules = db.parse_shards(previous_spec)
+    items = db.iter_scan(filter_expression=Attr('GSI1PK').exists(),
+                         attributes=['GSI1PK', 'GSI1SK'])
+    for item in items:
+        target = db.gsi1_key(logical_key(item['GSI1PK'], previous_rules), item['GSI1SK'])
+        if target != item['GSI1PK']:
+            yield item, target
+
+
+def rekey(item, target):
+    """Move one item to its target GSI1PK; False if it changed underneath us."""
+    try:
+        db.update_item(item['PK'], item['SK'], 'SET GSI1PK = :new',
+                       {':new': target, ':old': item['GSI1PK']},
+                       condition_expression='GSI1PK = :old')
+    except Exception as e:
+        if 'ConditionalCheckFailedException' in str(e):
+            return False
+        raise
+    return True
+
+
+def migrate(previous_spec='', dry_run=False, workers=16):
+    """Re-key every misplaced item; returns counts by outcome."""
+    counts = {'moved': 0, 'skipped': 0}
+    pending = plan(previous_spec)
+    if dry_run:
+        counts['moved'] = sum(1 for _ in pending)
+        return counts
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Executor.map submits everything up front; feed it one chunk at a time
+        while True:
+            chunk = list(itertools.islice(pending, CHUNK_SIZE))
+            if not chunk:
+                return counts
+            for moved in pool.map(lambda job: rekey(*job), chunk):
+                counts['moved' if moved else 'skipped'] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--previous', default='',
+                        help='GSI1_SHARDS rules the existing items were written under')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='count the items that would move without writing')
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    if not db.GSI1_SHARDS and not args.previous:
+        sys.exit('Set GSI1_SHARDS (and/or --previous); nothing to migrate')
+
+    started = time.time()
+    counts = migrate(args.previous, args.dry_run, args.workers)
+    capacity = db.consumed_capacity().values()
+    verb = 'would move' if args.dry_run else 'moved'
+    print(f'{verb} {counts["moved"]:,} items, {counts["skipped"]:,} changed concurrently '
+          f'in {time.time() - started:.1f}s '
+          f'({sum(u["read"] for u in capacity):,.1f} RCU, '
+          f'{sum(u["write"] for u in capacity):,.1f} WCU)')
+
+
+if __name__ == '__main__':
+    main()
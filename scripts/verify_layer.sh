@@ -6,11 +6,24 @@
 # Lambda Layer Structure (required by AWS Lambda runtime):
 #
 #   backend/layers/shared/           # ContentUri for SAM
-#   ├── requirements.txt              # Python dependencies (bcrypt)
+#   ├── requirements.txt              # Python dependencies (bcrypt, orjson)
 #   └── shared/                       # Importable as "from shared import ..."
 #       ├── __init__.py
-#       ├── db.py                     # DynamoDB client + Decimal serializer
+#       ├── access.py                 # Materialized per-user effective-access sets
+#       ├── aws.py                    # Shared boto3 sessions/clients (pool, retries)
+#       ├── closure.py                # Closure-table rows (ANCESTOR#/DESC#) for subtree reads
+#       ├── db.py                     # DynamoDB client (native int/float numbers)
+#       ├── folder_cache.py           # Warm LRU of folder META items (generation-checked)
+#       ├── folder_children.py        # Name-sorted CHILDREN# listing rows (lazy browser)
+#       ├── memory_backend.py         # In-process DynamoDB engine for local runs
+#       ├── metrics.py                # EMF capacity metrics per invocation
+#       ├── passwords.py              # bcrypt hashing with configurable/calibrated cost
+#       ├── rate_limit.py             # Per-user/per-route token buckets (429 + Retry-After)
 #       ├── response.py               # success() / error() response helpers
+#       ├── session_cache.py          # Warm TTL/LRU of sessions (revocation epochs)
+#       ├── tokens.py                 # HMAC-signed stateless session tokens
+#       ├── traversal.py              # Level-synchronous parallel BFS (closure fallback)
+#       ├── user_directory.py         # Per-status user list rows (GET /users pagination)
 #       └── auth_middleware.py         # authenticate(), require_auth, require_admin
 #
 # When SAM builds the layer (BuildMethod: python3.12), it:
@@ -11,6 +11,14 @@
 #
 # Usage:
 #   bash tests/run_e2e.sh
+#
+# In-memory mode (no Docker, SAM or DynamoDB Local; only the Python packages):
+#   E2E_BACKEND=memory bash tests/run_e2e.sh
+# Each suite then runs against a fresh scripts/local_api.py server backed by
+# the shared layer's in-memory DynamoDB engine.
+#
+# Signed session tokens instead of stored sessions (see shared/tokens.py):
+#   SESSION_TOKEN_MODE=signed SESSION_SIGNING_KEY=test E2E_BACKEND=memory bash tests/run_e2e.sh
 
 set -e
 
@@ -22,9 +30,21 @@ export AWS_ACCESS_KEY_ID=dummy
 export AWS_SECRET_ACCESS_KEY=dummy
 export AWS_PAGER=""
 
+E2E_BACKEND="${E2E_BACKEND:-sam}"
+
 SAM_PID=""
+LOCAL_API_PID=""
+
+stop_local_api() {
+    if [ -n "$LOCAL_API_PID" ]; then
+        kill "$LOCAL_API_PID" 2>/dev/null || true
+        wait "$LOCAL_API_PID" 2>/dev/null || true
+        LOCAL_API_PID=""
+    fi
+}
 
 cleanup() {
+    stop_local_api
     if [ -n "$SAM_PID" ]; then
         echo ""
         echo ">>> Stopping SAM local API (pid $SAM_PID)..."
@@ -37,7 +57,9 @@ trap cleanup EXIT
 # ------------------------------------------------------------------
 # Start SAM local API if not already running
 # ------------------------------------------------------------------
-if curl -s -o /dev/null http://127.0.0.1:3000 2>/dev/null; then
+if [ "$E2E_BACKEND" = "memory" ]; then
+    echo ">>> Using in-memory local API (scripts/local_api.py)"
+elif curl -s -o /dev/null http://127.0.0.1:3000 2>/dev/null; then
     echo ">>> SAM local API already running on port 3000"
 else
     echo ">>> Starting SAM local API..."
@@ -70,6 +92,21 @@ fi
 # Helper: reset DynamoDB and seed admin user
 # ------------------------------------------------------------------
 reset_db() {
+    if [ "$E2E_BACKEND" = "memory" ]; then
+        # A fresh server process is a fresh, seeded in-memory table
+        stop_local_api
+        echo ">>> Starting in-memory local API..."
+        python3 scripts/local_api.py --quiet > /tmp/local-api.log 2>&1 &
+        LOCAL_API_PID=$!
+        for i in $(seq 1 30); do
+            if curl -s -o /dev/null "$API_URL" 2>/dev/null; then
+                return
+            fi
+            sleep 0.2
+        done
+        echo ">>> ERROR: local API did not start. Check /tmp/local-api.log"
+        exit 1
+    fi
     echo ">>> Resetting DynamoDB table..."
     aws dynamodb delete-table \
         --table-name "$TABLE_NAME" \
@@ -117,6 +154,7 @@ run_suite() {
 # ------------------------------------------------------------------
 # Run all suites
 # ------------------------------------------------------------------
+run_suite "tests/test_shared_db.py"
 run_suite "tests/test_auth_users.py"
 run_suite "tests/test_folders.py"
 run_suite "tests/test_files.py"
@@ -1,38 +1,24 @@
-"""Seed admin user directly into DynamoDB Local for testing."""
-import time
-import bcrypt
-import boto3
+"""Seed admin user directly into DynamoDB Local for testing.
 
-ENDPOINT = "http://localhost:8000"
-REGION = "us-east-1"
-TABLE_NAME = "FileShareTable-dev"
+Runs the seed Lambda's code against the local table, so the admin gets the
+same profile, sharded GSI1 key and user directory rows as a deployed seed.
+"""
+import importlib.util
+import os
+import sys
 
-dynamodb = boto3.resource(
-    "dynamodb",
-    endpoint_url=ENDPOINT,
-    region_name=REGION,
-    aws_access_key_id="dummy",
-    aws_secret_access_key="dummy",
-)
-table = dynamodb.Table(TABLE_NAME)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-password_hash = bcrypt.hashpw(
-    "ChangeMe123!".encode("utf-8"), bcrypt.gensalt(12)
-).decode("utf-8")
+os.environ.setdefault('TABLE_NAME', 'FileShareTable-dev')
+os.environ.setdefault('DYNAMODB_ENDPOINT', 'http://localhost:8000')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+# As set for every function in template.yaml's Globals
+os.environ.setdefault('GSI1_SHARDS', 'PARENT#ROOT=4,ROLE#*=4')
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
 
-table.put_item(
-    Item={
-        "PK": "USER#admin",
-        "SK": "PROFILE",
-        "GSI1PK": "ROLE#Admin",
-        "GSI1SK": "USER#admin",
-        "username": "admin",
-        "password_hash": password_hash,
-        "role": "Admin",
-        "status": "active",
-        "force_password_change": True,
-        "created_at": int(time.time()),
-    }
-)
+spec = importlib.util.spec_from_file_location(
+    'seed_handler', os.path.join(ROOT, 'backend', 'seed', 'handler.py'))
+seed = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(seed)
 
-print('"created": true')
+print(seed.lambda_handler({}, None)['body'])
@@ -1,5 +1,6 @@
 """Integration tests for auth/user endpoints against SAM local API."""
 import json
+import os
 import sys
 import urllib.request
 import urllib.error
@@ -30,6 +31,18 @@ def request(method, path, body=None, token=None):
             return e.code, {'raw': body_str}
 
 
+def request_csv(path, text, token):
+    """POST a CSV body and return (status_code, response_body_dict)."""
+    req = urllib.request.Request(f"{BASE_URL}{path}", data=text.encode('utf-8'), method='POST')
+    req.add_header('Content-Type', 'text/csv')
+    req.add_header('Authorization', f'Bearer {token}')
+    try:
+        resp = urllib.request.urlopen(req)
+        return resp.status, json.loads(resp.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode('utf-8'))
+
+
 def test(name, condition, detail=""):
     global passed, failed
     if condition:
@@ -141,6 +154,58 @@ def main():
     usernames = [u['username'] for u in users]
     test("List includes admin", 'admin' in usernames)
     test("List includes uploader1", 'uploader1' in usernames)
+    test("List omits password_hash", all('password_hash' not in u for u in users))
+
+    # Paginated listing walks every user exactly once
+    paged = []
+    next_token = None
+    for _ in range(20):
+        path = '/users?limit=2' + (f'&next_token={next_token}' if next_token else '')
+        status, body = request('GET', path, token=admin_token)
+        if status != 200:
+            break
+        paged.extend(u['username'] for u in body.get('users', []))
+        next_token = body.get('next_token')
+        if not next_token:
+            break
+    test("Paginated list returns 200", status == 200, f"got {status}")
+    test("Paginated list matches full list", sorted(paged) == sorted(usernames),
+         f"got {paged}")
+
+    status, body = request('GET', '/users?limit=2&next_token=bogus', token=admin_token)
+    test("Invalid next_token returns 400", status == 400, f"got {status}")
+
+    # Sorting, prefix and status come from the user directory's keys
+    test("Users are sorted by username", usernames == sorted(usernames), f"got {usernames}")
+    status, body = request('GET', '/users?prefix=upl', token=admin_token)
+    prefixed = [u['username'] for u in body.get('users', [])]
+    test("Prefix narrows by username",
+         status == 200 and prefixed and all(u.startswith('upl') for u in prefixed),
+         f"got {status} {prefixed}")
+    status, body = request('GET', '/users?sort=created_at&order=desc', token=admin_token)
+    created = [u['created_at'] for u in body.get('users', [])]
+    test("Sort by created_at descending", status == 200 and created == sorted(created, reverse=True)
+         and len(created) == len(usernames), f"got {created}")
+    paged = []
+    next_token = None
+    for _ in range(20):
+        path = '/users?sort=created_at&limit=2' + (f'&next_token={next_token}' if next_token else '')
+        status, body = request('GET', path, token=admin_token)
+        paged.extend(u['username'] for u in body.get('users', []))
+        next_token = body.get('next_token')
+        if status != 200 or not next_token:
+            break
+    test("Paginated created_at list matches full list", sorted(paged) == sorted(usernames),
+         f"got {paged}")
+    status, body = request('GET', '/users?status=active&role=Admin&sort=created_at',
+                           token=admin_token)
+    test("Role filter works on the directory",
+         status == 200 and [u['username'] for u in body.get('users', [])] == ['admin'],
+         f"got {body}")
+    status, body = request('GET', '/users?sort=shoe_size', token=admin_token)
+    test("Unknown sort returns 400", status == 400, f"got {status}")
+    status, body = request('GET', '/users?sort=created_at&prefix=a', token=admin_token)
+    test("Prefix with created_at sort returns 400", status == 400, f"got {status}")
 
     # Non-admin cannot list
     status, body = request('GET', '/users', token=uploader_token)
@@ -157,6 +222,9 @@ def main():
     }, token=admin_token)
     test("Admin updates role returns 200", status == 200, f"got {status}")
     test("Updated role is Reader", body.get('role') == 'Reader', f"got {body}")
+    status, body = request('GET', '/users?prefix=viewer1', token=admin_token)
+    test("Directory reflects the new role",
+         [u['role'] for u in body.get('users', [])] == ['Reader'], f"got {body}")
 
     # Update status to disabled
     status, body = request('PUT', '/users/reader1', {
@@ -164,6 +232,11 @@ def main():
     }, token=admin_token)
     test("Admin disables user returns 200", status == 200, f"got {status}")
     test("Status is disabled", body.get('status') == 'disabled')
+    status, body = request('GET', '/users?status=disabled', token=admin_token)
+    test("Disabled user moves to the disabled listing",
+         [u['username'] for u in body.get('users', [])] == ['reader1'], f"got {body}")
+    status, body = request('GET', '/users?status=active&prefix=reader1', token=admin_token)
+    test("Disabled user leaves the active listing", body.get('users') == [], f"got {body}")
 
     # Disabled user cannot login
     status, body = request('POST', '/auth/login', {
@@ -189,6 +262,19 @@ def main():
     }, token=admin_token)
     test("Update non-existent user returns 404", status == 404, f"got {status}")
 
+    # Role changes apply to sessions that are already open (and cached);
+    # signed tokens carry the role, so they are revoked instead
+    signed = os.environ.get('SESSION_TOKEN_MODE') == 'signed'
+    request('GET', '/users', token=uploader_token)
+    status, body = request('PUT', '/users/uploader1', {'role': 'Admin'}, token=admin_token)
+    status, body = request('GET', '/users', token=uploader_token)
+    test("Promoted user's open session gains Admin", status == (401 if signed else 200),
+         f"got {status}")
+    request('PUT', '/users/uploader1', {'role': 'Uploader'}, token=admin_token)
+    status, body = request('GET', '/users', token=uploader_token)
+    test("Demoted user's open session loses Admin", status == (401 if signed else 403),
+         f"got {status}")
+
     # ============================================================
     # T2.29: Reset Password (Admin only)
     # ============================================================
@@ -286,6 +372,65 @@ def main():
     status, body = request('DELETE', '/users/nouser', token=admin_token)
     test("Delete non-existent returns 404", status == 404, f"got {status}")
 
+    # ============================================================
+    # Bulk import
+    # ============================================================
+    print("\n=== POST /users/import ===")
+
+    status, body = request('POST', '/folders', {'name': 'Import Target'}, token=admin_token)
+    import_folder = body.get('folder_id')
+    status, body = request('POST', '/users/import', {'users': [
+        {'username': 'imp_one', 'password': 'ImportPass1', 'role': 'Reader',
+         'folders': [import_folder]},
+        {'username': 'imp_two', 'password': 'ImportPass2', 'role': 'Uploader'},
+        {'username': 'imp_one', 'password': 'ImportPass1', 'role': 'Reader'},
+        {'username': 'imp_bad', 'password': 'ImportPass3', 'role': 'Wizard'},
+        {'username': 'imp_short', 'password': 'short', 'role': 'Reader'},
+        {'username': 'admin', 'password': 'ImportPass4', 'role': 'Reader'},
+        {'username': 'imp_lost', 'password': 'ImportPass5', 'role': 'Reader',
+         'folders': ['no-such-folder']},
+    ]}, token=admin_token)
+    test("Import returns 200", status == 200, f"got {status}: {body}")
+    statuses = [r.get('status') for r in body.get('results', [])]
+    test("Each row gets a result in order",
+         statuses == ['created', 'created', 'duplicate', 'invalid', 'invalid', 'exists', 'invalid'],
+         f"got {statuses}")
+    test("Summary counts rows by status",
+         body.get('summary') == {'created': 2, 'duplicate': 1, 'invalid': 3, 'exists': 1},
+         f"got {body.get('summary')}")
+    test("Rejected rows explain why", 'not found' in body['results'][6].get('error', ''))
+    test("Assignments are applied", body.get('assignments') == 1)
+
+    status, body = request('POST', '/auth/login', {'username': 'imp_one', 'password': 'ImportPass1'})
+    test("Imported user can log in", status == 200, f"got {status}")
+    test("Imported user must change password", body.get('force_password_change') is True)
+    imported_token = body.get('token')
+    status, body = request('GET', '/folders', token=imported_token)
+    test("Imported user sees assigned folder",
+         import_folder in [f.get('folder_id') for f in body.get('folders', [])], f"got {body}")
+
+    status, body = request('POST', '/users/import', {'users': [
+        {'username': 'imp_one', 'password': 'ImportPass1', 'role': 'Reader'}]}, token=admin_token)
+    test("Re-import reports existing users",
+         status == 200 and body['results'][0]['status'] == 'exists', f"got {body}")
+
+    status, body = request_csv('/users/import',
+                               'username,password,role,folders\n'
+                               f'imp_csv,CsvPass123 ,Viewer,{import_folder}\n'
+                               'imp_csv2,CsvPass456,Reader,\n', admin_token)
+    test("CSV import creates users", status == 200 and body.get('summary') == {'created': 2},
+         f"got {status}: {body}")
+    status, body = request('POST', '/auth/login', {'username': 'imp_csv', 'password': 'CsvPass123 '})
+    test("CSV passwords are taken verbatim", status == 200, f"got {status}")
+
+    status, body = request('POST', '/users/import', {'users': []}, token=admin_token)
+    test("Empty import returns 400", status == 400, f"got {status}")
+    status, body = request('POST', '/users/import', {'users': 'nope'}, token=admin_token)
+    test("Malformed import returns 400", status == 400, f"got {status}")
+    status, body = request('POST', '/users/import', {'users': [
+        {'username': 'imp_x', 'password': 'ImportPass9', 'role': 'Reader'}]}, token=imported_token)
+    test("Non-admin import returns 403", status == 403, f"got {status}")
+
     # ============================================================
     # Summary
     # ============================================================
@@ -130,10 +130,27 @@ def main():
     test("Rename folder returns 200", status == 200, f"got {status}: {body}")
     test("Name updated", body.get('name') == 'Sub-A2-Renamed')
 
+    # The admin tree is built from the ROOT closure rows' name snapshot
+    status, body = request('GET', '/folders', token=admin_token)
+    stack = list(body.get('folders', []))
+    tree_names = {}
+    while stack:
+        node = stack.pop()
+        tree_names[node['folder_id']] = node['name']
+        stack.extend(node.get('children', []))
+    test("Admin tree shows the new name", tree_names.get(sub_a2_id) == 'Sub-A2-Renamed',
+         f"got {tree_names.get(sub_a2_id)}")
+
     # Name conflict
     status, body = request('PUT', f'/folders/{sub_a2_id}', {'name': 'Sub-A1'}, token=admin_token)
     test("Rename to conflict returns 409", status == 409, f"got {status}")
 
+    # A rename frees the old name for its siblings
+    status, body = request('PUT', f'/folders/{sub_a1_id}', {'name': 'Sub-A2'}, token=admin_token)
+    test("Renamed folder's old name can be reused", status == 200, f"got {status}: {body}")
+    status, body = request('PUT', f'/folders/{sub_a1_id}', {'name': 'Sub-A1'}, token=admin_token)
+    test("Rename back returns 200", status == 200, f"got {status}: {body}")
+
     # Non-existent folder
     status, body = request('PUT', '/folders/nonexistent', {'name': 'X'}, token=admin_token)
     test("Rename non-existent returns 404", status == 404, f"got {status}")
@@ -195,11 +212,78 @@ def main():
              len(alpha_user.get('children', [])) >= 2,
              f"children: {[c['name'] for c in alpha_user.get('children', [])]}")
 
+    # A folder created under an assigned one is visible at once, and gone once deleted
+    status, body = request('POST', '/folders', {'name': 'Sub-A3', 'parent_id': sub_a1_id},
+                           token=admin_token)
+    sub_a3_id = body.get('folder_id')
+    status, body = request('GET', f'/folders/{sub_a1_id}/children', token=uploader_token)
+    test("New folder under an assigned one is visible",
+         [c['folder_id'] for c in body.get('children', [])] == [sub_a3_id], f"got {body}")
+    request('DELETE', f'/folders/{sub_a3_id}', token=admin_token)
+    status, body = request('GET', f'/folders/{sub_a1_id}/children', token=uploader_token)
+    test("Deleted folder disappears for the assigned user",
+         body.get('children') == [], f"got {status}: {body}")
+
     # User should NOT see Project Beta (not assigned)
     beta_user = next((f for f in user_folders if f['name'] == 'Project Beta'), None)
     test("User does not see unassigned folder", beta_user is None,
          f"found: {beta_user}")
 
+    # ============================================================
+    # Lazy children listing
+    # ============================================================
+    print("\n=== GET /folders/{folderId}/children ===")
+
+    status, body = request('GET', '/folders/ROOT/children', token=admin_token)
+    test("Admin lists ROOT children", status == 200, f"got {status}: {body}")
+    top = {c['name']: c for c in body.get('children', [])}
+    test("Top level is sorted by name",
+         [c['name'] for c in body.get('children', [])] == sorted(top), f"got {list(top)}")
+    test("has_children flags folders with sub-folders",
+         top.get('Project Alpha', {}).get('has_children') is True, f"got {top}")
+
+    status, body = request('GET', f'/folders/{folder_a_id}/children', token=admin_token)
+    test("Children come back by name",
+         [c['name'] for c in body.get('children', [])] == ['Sub-A1', 'Sub-A2-Renamed'],
+         f"got {body}")
+    test("Leaves have no children",
+         all(c['has_children'] is False for c in body.get('children', [])))
+    status, body = request('GET', f'/folders/{sub_a1_id}/children', token=admin_token)
+    test("Folder breadcrumbs come from its ancestor chain",
+         [b['name'] for b in (body.get('folder') or {}).get('breadcrumbs', [])]
+         == ['Project Alpha', 'Sub-A1'], f"got {body}")
+
+    status, body = request('GET', f'/folders/{folder_a_id}/children?limit=1', token=admin_token)
+    first_page = [c['name'] for c in body.get('children', [])]
+    status, body = request('GET', f"/folders/{folder_a_id}/children?limit=1"
+                           f"&next_token={body.get('next_token')}", token=admin_token)
+    test("Children paginate", first_page + [c['name'] for c in body.get('children', [])]
+         == ['Sub-A1', 'Sub-A2-Renamed'], f"got {first_page} then {body}")
+
+    status, body = request('GET', '/folders/ROOT/children', token=uploader_token)
+    test("Assigned user's top level is their assigned folder",
+         [c['folder_id'] for c in body.get('children', [])] == [folder_a_id], f"got {body}")
+    request('POST', f'/folders/{folder_b_id}/assignments', {'usernames': ['uploader1']},
+            token=admin_token)
+    status, body = request('GET', '/folders/ROOT/children?limit=1', token=uploader_token)
+    first_page = [c['name'] for c in body.get('children', [])]
+    status, body = request('GET', f"/folders/ROOT/children?limit=1"
+                           f"&next_token={body.get('next_token')}", token=uploader_token)
+    test("Assigned user's top level pages by cursor",
+         first_page + [c['name'] for c in body.get('children', [])]
+         == ['Project Alpha', 'Project Beta'] and body.get('next_token') is None,
+         f"got {first_page} then {body}")
+    request('DELETE', f'/folders/{folder_b_id}/assignments/uploader1', token=admin_token)
+    status, body = request('GET', f'/folders/{folder_a_id}/children', token=uploader_token)
+    test("Assigned user lists inherited children",
+         status == 200 and len(body.get('children', [])) == 2, f"got {status}: {body}")
+    status, body = request('GET', f'/folders/{folder_b_id}/children', token=uploader_token)
+    test("Unassigned folder children return 403", status == 403, f"got {status}")
+    status, body = request('GET', '/folders/nonexistent/children', token=admin_token)
+    test("Missing folder children return 404", status == 404, f"got {status}")
+    status, body = request('GET', '/folders/ROOT/children?limit=0', token=admin_token)
+    test("Bad limit returns 400", status == 400, f"got {status}")
+
     # ============================================================
     # T3.21: List and unassign
     # ============================================================
@@ -220,19 +304,80 @@ def main():
     test("After unassign user sees no folders", len(body.get('folders', [])) == 0,
          f"got {len(body.get('folders', []))} folders")
 
+    # ============================================================
+    # Bulk assignments (users x folders)
+    # ============================================================
+    print("\n=== POST /folders/assignments ===")
+
+    status, body = request('POST', '/folders/assignments', {
+        'assign': {'usernames': ['uploader1', 'ghost'], 'folder_ids': [folder_a_id, folder_b_id]},
+    }, token=admin_token)
+    test("Bulk assign returns 200", status == 200, f"got {status}: {body}")
+    test("Bulk assign reports each pair",
+         body.get('summary') == {'assigned': 2, 'invalid': 2}, f"got {body}")
+    test("Unknown user is invalid",
+         {r['error'] for r in body.get('results', []) if r['username'] == 'ghost'}
+         == {'User not found'}, f"got {body}")
+    status, body = request('GET', '/folders/ROOT/children', token=uploader_token)
+    test("Bulk-assigned user sees both folders",
+         {folder_a_id, folder_b_id} <= {c['folder_id'] for c in body.get('children', [])},
+         f"got {body}")
+
+    status, body = request('POST', '/folders/assignments', {
+        'assign': {'usernames': ['uploader1'], 'folder_ids': [folder_a_id, 'nonexistent']},
+        'unassign': [{'usernames': ['uploader1'], 'folder_ids': [folder_b_id, folder_b_id]}],
+    }, token=admin_token)
+    test("Mixed assign and unassign in one request",
+         [r['status'] for r in body.get('results', [])]
+         == ['exists', 'invalid', 'unassigned', 'duplicate'], f"got {body}")
+    status, body = request('POST', '/folders/assignments', {
+        'assign': {'usernames': ['uploader1'], 'folder_ids': [folder_b_id]},
+        'unassign': {'usernames': ['uploader1'], 'folder_ids': [folder_b_id, folder_a_id]},
+    }, token=admin_token)
+    test("Conflicting pair is invalid, the rest applies",
+         [r['status'] for r in body.get('results', [])]
+         == ['invalid', 'invalid', 'unassigned'], f"got {body}")
+    status, body = request('GET', '/folders', token=uploader_token)
+    test("Bulk unassign revokes access", body.get('folders') == [], f"got {body}")
+
+    status, body = request('POST', '/folders/assignments', {'assign': {'usernames': ['uploader1']}},
+                           token=admin_token)
+    test("Block without folder_ids returns 400", status == 400, f"got {status}")
+    status, body = request('POST', '/folders/assignments', {}, token=admin_token)
+    test("Empty bulk request returns 400", status == 400, f"got {status}")
+    status, body = request('POST', '/folders/assignments', {
+        'assign': {'usernames': ['uploader1'], 'folder_ids': [folder_a_id]},
+    }, token=uploader_token)
+    test("Non-admin bulk assign returns 403", status == 403, f"got {status}")
+
     # ============================================================
     # T3.18: Delete folder (cascade)
     # ============================================================
     print("\n=== T3.18: DELETE /folders/{folderId} ===")
 
+    # A file in a sub-folder goes with it (S3 object included)
+    status, body = request('POST', '/files/confirm-upload', {
+        'file_id': 'cascade-file', 'folder_id': sub_a1_id, 'file_name': 'nested.txt',
+        'file_size': 10, 's3_key': f'files/{sub_a1_id}/cascade-file/nested.txt',
+    }, token=admin_token)
+    test("File in sub-folder confirmed", status == 200, f"got {status}: {body}")
+
     # Delete folder with sub-folders (cascade)
     status, body = request('DELETE', f'/folders/{folder_a_id}', token=admin_token)
     test("Delete folder with children returns 200", status == 200, f"got {status}")
+    deleted = body.get('deleted', {})
+    test("Delete reports the folders and files removed",
+         deleted.get('folders') == 3 and deleted.get('files') == 1, f"got {body}")
+    test("Delete tries the file's S3 object",
+         deleted.get('objects', 0) + deleted.get('objects_failed', 0) == 1, f"got {body}")
 
     # Verify sub-folders deleted
     status, body = request('GET', '/folders', token=admin_token)
     folder_names = [f['name'] for f in body.get('folders', [])]
     test("Deleted folder removed from list", 'Project Alpha' not in folder_names, f"names: {folder_names}")
+    status, body = request('GET', '/folders/ROOT/children', token=admin_token)
+    test("Deleted folder removed from children listing",
+         'Project Alpha' not in [c['name'] for c in body.get('children', [])], f"got {body}")
 
     # Delete non-existent
     status, body = request('DELETE', f'/folders/{folder_a_id}', token=admin_token)
@@ -75,6 +75,10 @@ def main():
     files = body.get('files', [])
     test("Admin finds all 'report' files (3)", len(files) == 3, f"got {len(files)}: {[f['name'] for f in files]}")
 
+    status, body = request('GET', '/files/search?q=report&limit=2', token=admin_token)
+    test("Limited search returns 2 files", len(body.get('files', [])) == 2, f"got {body}")
+    test("Limited search reports truncation", body.get('truncated') is True, f"got {body}")
+
     # ============================================================
     # T5.12: Non-admin search (scoped to assignments)
     # ============================================================
@@ -133,6 +137,23 @@ def main():
         test("Folder path includes folder name", 'Reports' in files[0].get('folder_path', ''),
              f"path: {files[0].get('folder_path')}")
 
+    # Nested paths follow renames of any ancestor
+    _, sub = request('POST', '/folders', {'name': 'Q1', 'parent_id': folder1_id}, token=admin_token)
+    _, deep = request('POST', '/folders', {'name': 'Drafts', 'parent_id': sub['folder_id']},
+                      token=admin_token)
+    request('POST', '/files/confirm-upload', {
+        'file_id': 'f006', 'folder_id': deep['folder_id'], 'file_name': 'draft_memo.txt',
+        'file_size': 10, 's3_key': 'files/deep/f006/draft_memo.txt'}, token=admin_token)
+    status, body = request('GET', '/files/search?q=draft_memo', token=admin_token)
+    files = body.get('files', [])
+    test("Nested folder path", files and files[0]['folder_path'] == '/Reports/Q1/Drafts',
+         f"got {files}")
+    request('PUT', f'/folders/{folder1_id}', {'name': 'Reporting'}, token=admin_token)
+    status, body = request('GET', '/files/search?q=draft_memo', token=user_token)
+    files = body.get('files', [])
+    test("Renaming an ancestor updates nested paths",
+         files and files[0]['folder_path'] == '/Reporting/Q1/Drafts', f"got {files}")
+
     # ============================================================
     print(f"\n{'='*50}")
     print(f"Results: {passed} passed, {failed} failed out of {passed + failed}")
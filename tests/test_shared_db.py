@@ -0,0 +1,910 @@
+"""In-process tests for shared.db running on the in-memory DynamoDB backend."""
+import contextlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'layers', 'shared'))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from boto3.dynamodb.conditions import Attr  # noqa: E402
+
+from shared import (access, aws, closure, db, folder_cache, folder_children,  # noqa: E402
+                    passwords, rate_limit,
+                    session_cache, tokens, traversal, user_directory)
+from shared import response  # noqa: E402
+from shared.response import error  # noqa: E402
+from shared.memory_backend import MemoryDynamoDB  # noqa: E402
+import backfill_folder_ancestors  # noqa: E402
+import backfill_folder_children  # noqa: E402
+import backfill_folder_closure  # noqa: E402
+import backfill_user_directory  # noqa: E402
+import migrate_gsi1_shards  # noqa: E402
+
+passed = 0
+failed = 0
+
+
+def test(name, condition, detail=""):
+    global passed, failed
+    if condition:
+        passed += 1
+        print(f"  PASS: {name}")
+    else:
+        failed += 1
+        print(f"  FAIL: {name} {detail}")
+
+
+@contextlib.contextmanager
+def boto3_backend():
+    """Run db on real boto3 resources (pointed at a closed port), then on a fresh memory engine."""
+    saved = {name: os.environ.pop(name, None) for name in ('DB_BACKEND', 'DYNAMODB_ENDPOINT')}
+    os.environ['DYNAMODB_ENDPOINT'] = 'http://127.0.0.1:9'
+    db.use_backend(None)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+        db.use_backend(MemoryDynamoDB())
+
+
+def raises(fn, text):
+    """Return True if fn() raises an exception whose message contains text."""
+    try:
+        fn()
+    except Exception as e:
+        return text in str(e)
+    return False
+
+
+def folder(folder_id, parent_id='ROOT', name=None):
+    return {
+        'PK': f'FOLDER#{folder_id}',
+        'SK': 'META',
+        'GSI1PK': f'PARENT#{parent_id}',
+        'GSI1SK': f'FOLDER#{folder_id}',
+        'name': name or folder_id,
+        'parent_id': parent_id,
+        'created_at': 1700000000,
+    }
+
+
+def main():
+    db.use_backend(MemoryDynamoDB())
+
+    # ============================================================
+    # Single-item operations
+    # ============================================================
+    print("\n=== get/put/update/delete ===")
+
+    db.put_item(folder('a'))
+    item = db.get_item('FOLDER#a', 'META')
+    test("put then get returns item", item and item['name'] == 'a', f"got {item}")
+    test("Missing item returns None", db.get_item('FOLDER#zz', 'META') is None)
+
+    test("Conditional put on existing key fails",
+         raises(lambda: db.put_item(folder('a'), condition_expression='attribute_not_exists(PK)'),
+                'ConditionalCheckFailedException'))
+
+    result = db.update_item('FOLDER#a', 'META', 'SET #n = :n, hits = if_not_exists(hits, :z) + :one',
+                            {':n': 'renamed', ':z': 0, ':one': 1},
+                            expression_attr_names={'#n': 'name'})
+    attrs = result.get('Attributes', {})
+    test("update_item returns ALL_NEW", attrs.get('name') == 'renamed' and attrs.get('hits') == 1,
+         f"got {attrs}")
+    test("Identity map is refreshed after update",
+         db.get_item('FOLDER#a', 'META')['name'] == 'renamed')
+
+    db.delete_item('FOLDER#a', 'META')
+    test("Deleted item is gone", db.get_item('FOLDER#a', 'META') is None)
+
+    # ============================================================
+    # Query ordering, begins_with and GSI maintenance
+    # ============================================================
+    print("\n=== query / GSI1 ===")
+
+    db.batch_put([folder(f'f{i:02d}', parent_id='ROOT') for i in range(30)]
+                 + [folder('c1', parent_id='f01'), folder('c2', parent_id='f01')])
+    roots = db.query('PARENT#ROOT', index_name='GSI1')
+    test("GSI1 query returns all root folders", len(roots) == 30, f"got {len(roots)}")
+    test("GSI1 query is sorted by GSI1SK",
+         [r['GSI1SK'] for r in roots] == sorted(r['GSI1SK'] for r in roots))
+    desc = list(db.iter_query('PARENT#ROOT', index_name='GSI1', scan_forward=False, limit=3))
+    test("scan_forward=False reverses order",
+         [d['GSI1SK'] for d in desc] == ['FOLDER#f29', 'FOLDER#f28', 'FOLDER#f27'],
+         f"got {[d['GSI1SK'] for d in desc]}")
+    prefixed = db.query('PARENT#ROOT', sk_begins_with='FOLDER#f1', index_name='GSI1')
+    test("begins_with narrows the range", len(prefixed) == 10, f"got {len(prefixed)}")
+
+    db.update_item('FOLDER#c1', 'META', 'SET GSI1PK = :p, parent_id = :pid',
+                   {':p': 'PARENT#f02', ':pid': 'f02'})
+    test("GSI1 entry moves when GSI1PK changes",
+         len(db.query('PARENT#f01', index_name='GSI1')) == 1
+         and len(db.query('PARENT#f02', index_name='GSI1')) == 1)
+
+    # ============================================================
+    # Pagination and projection
+    # ============================================================
+    print("\n=== pagination ===")
+
+    seen = []
+    token = None
+    while True:
+        page, token = db.query_page('PARENT#ROOT', index_name='GSI1', limit=7,
+                                    start_token=token)
+        seen.extend(p['GSI1SK'] for p in page)
+        if not token:
+            break
+    test("query_page walks every item once", seen == [r['GSI1SK'] for r in roots],
+         f"got {len(seen)} items")
+    test("parse_limit caps and passes through absent limits",
+         db.parse_limit('500', 100) == 100 and db.parse_limit('7', 100) == 7
+         and db.parse_limit(None, 100) is None and db.parse_limit('', 100) is None)
+    test("parse_limit rejects non-positive limits",
+         raises(lambda: db.parse_limit('0', 100), 'positive')
+         and raises(lambda: db.parse_limit('x', 100), 'invalid literal'))
+
+    odd = Attr('name').is_in([f'f{i:02d}' for i in range(1, 30, 2)])
+    seen = []
+    token = None
+    while True:
+        page, token = db.query_page('PARENT#ROOT', index_name='GSI1', filter_expression=odd,
+                                    limit=4, start_token=token)
+        seen.extend(p['name'] for p in page)
+        if not token:
+            break
+    test("Filtered pages resume mid-page correctly", len(seen) == 15 and len(set(seen)) == 15,
+         f"got {seen}")
+
+    projected = list(db.iter_query('PARENT#ROOT', index_name='GSI1', attributes=['name']))
+    test("Projection drops other attributes",
+         'created_at' not in projected[0] and projected[0]['name'] == 'f00',
+         f"got {projected[0]}")
+
+    scanned = db.scan(filter_expression=Attr('SK').eq('META'))
+    test("Scan sees every item", len(scanned) == 32, f"got {len(scanned)}")
+    seen = []
+    token = None
+    while True:
+        page, token = db.scan_page(limit=5, start_token=token)
+        seen.extend((p['PK'], p['SK']) for p in page)
+        if not token:
+            break
+    test("scan_page walks every item once", len(seen) == 32 and len(set(seen)) == 32,
+         f"got {len(seen)}")
+
+    # ============================================================
+    # Batch and transactional writes
+    # ============================================================
+    print("\n=== batch / transactions ===")
+
+    db.begin_request()
+    items = db.get_items([('FOLDER#f00', 'META'), ('FOLDER#nope', 'META'), ('FOLDER#f00', 'META')])
+    test("get_items aligns results with keys",
+         items[0]['name'] == 'f00' and items[1] is None and items[2] is items[0])
+
+    db.batch_delete([{'PK': f'FOLDER#f{i:02d}', 'SK': 'META'} for i in range(30)])
+    test("batch_delete removes items and index entries",
+         db.query('PARENT#ROOT', index_name='GSI1') == [])
+
+    db.transact_write([
+        {'Put': {'Item': folder('t1'), 'ConditionExpression': 'attribute_not_exists(PK)'}},
+        {'Put': {'Item': folder('t2')}},
+    ])
+    test("transact_write applies all actions",
+         db.get_item('FOLDER#t1', 'META') and db.get_item('FOLDER#t2', 'META'))
+
+    cancelled = raises(lambda: db.transact_write([
+        {'Put': {'Item': folder('t3')}},
+        {'Put': {'Item': folder('t1'), 'ConditionExpression': 'attribute_not_exists(PK)'}},
+    ]), 'ConditionalCheckFailed')
+    test("Failed condition cancels the transaction", cancelled)
+    test("Cancelled transaction writes nothing", db.get_item('FOLDER#t3', 'META') is None)
+
+    # ============================================================
+    # Consumed capacity
+    # ============================================================
+    print("\n=== consumed capacity ===")
+
+    db.begin_request()
+    test("begin_request resets capacity", db.consumed_capacity() == {})
+    db.put_item(folder('cap'))
+    db.get_item('FOLDER#cap', 'META')
+    db.query('PARENT#ROOT', index_name='GSI1')
+    usage = db.consumed_capacity()
+    table = usage.get((db.TABLE_NAME, None), {})
+    index = usage.get((db.TABLE_NAME, 'GSI1'), {})
+    test("Put charges the table and GSI1",
+         table.get('write') == 1 and index.get('write') == 1, f"got {usage}")
+    test("Eventually consistent get costs half a unit", table.get('read') == 0.5,
+         f"got {usage}")
+    test("Index query is charged to the index", index.get('read') == 0.5, f"got {usage}")
+
+    db.begin_request()
+    db.transact_write([{'Put': {'Item': folder('cap2')}}])
+    usage = db.consumed_capacity()
+    test("Transactional writes cost double",
+         usage.get((db.TABLE_NAME, None), {}).get('write') == 2, f"got {usage}")
+
+    # ============================================================
+    # Folder metadata cache
+    # ============================================================
+    print("\n=== folder cache ===")
+
+    db.put_item(folder('fc', name='cached'))
+    db.begin_request()
+    test("Cache loads a folder", folder_cache.get('fc')['name'] == 'cached')
+    db.begin_request()
+    folder_cache.get('fc')
+    reads = db.consumed_capacity().get((db.TABLE_NAME, None), {}).get('read')
+    test("Warm hit costs only the generation check", reads == 1, f"got {reads}")
+
+    db.update_item('FOLDER#fc', 'META', 'SET #n = :n', {':n': 'renamed'},
+                   expression_attr_names={'#n': 'name'})
+    db.begin_request()
+    test("Unbumped change is not seen", folder_cache.get('fc')['name'] == 'cached')
+    folder_cache.bump_generation()
+    db.begin_request()
+    test("Bumping the generation invalidates the cache",
+         folder_cache.get('fc')['name'] == 'renamed')
+    test("Missing folders are cached as None",
+         folder_cache.get_many(['fc', 'gone']) == [folder_cache.get('fc'), None])
+
+    # ============================================================
+    # Access tracing
+    # ============================================================
+    print("\n=== DB_TRACE ===")
+
+    db.TRACE = 'stdout'
+    db.begin_request()
+    db.get_item('FOLDER#fc', 'META')
+    db.get_item('FOLDER#fc', 'META')
+    db.query('PARENT#ROOT', sk_begins_with='FOLDER#', index_name='GSI1')
+    db.batch_delete([{'PK': 'FOLDER#t1', 'SK': 'META'}, {'PK': 'FOLDER#t2', 'SK': 'META'}])
+    calls = db.trace_calls()
+    db.TRACE = ''
+    test("Every call is traced", [c['op'] for c in calls] ==
+         ['GetItem', 'GetItem', 'Query', 'BatchWriteItem'], f"got {calls}")
+    test("Identity-map hits are marked cached",
+         calls[1].get('cached') is True and 'cached' not in calls[0])
+    test("Query records partition, prefix and index",
+         calls[2]['pk'] == 'PARENT#ROOT' and calls[2]['prefix'] == 'PARENT#'
+         and calls[2]['index'] == 'GSI1' and calls[2]['sk_prefix'] == 'FOLDER#', f"got {calls[2]}")
+    test("Batch calls count keys per partition",
+         calls[3]['partitions'] == {'FOLDER#t1': 1, 'FOLDER#t2': 1}, f"got {calls[3]}")
+
+    # ============================================================
+    # GSI1 write sharding
+    # ============================================================
+    print("\n=== GSI1 sharding ===")
+
+    db.use_backend(MemoryDynamoDB())
+    for i in range(30):
+        db.put_item(folder(f's{i:02d}'))
+    expected = [f'FOLDER#s{i:02d}' for i in range(30)]
+    db.configure_shards('PARENT#ROOT=4,ROLE#*=2')
+    test("Exact and prefix rules", db.shard_count('PARENT#ROOT') == 4
+         and db.shard_count('ROLE#Reader') == 2 and db.shard_count('PARENT#x') == 1)
+    test("Unsharded keys are written as-is", db.gsi1_key('PARENT#x', 'FOLDER#y') == 'PARENT#x')
+    test("Invalid rules are rejected", raises(lambda: db.parse_shards('PARENT#ROOT'), 'Invalid'))
+    test("Unmigrated items stay visible", [i['PK'] for i in db.query(
+        'PARENT#ROOT', index_name='GSI1')] == expected)
+
+    counts = migrate_gsi1_shards.migrate(dry_run=True)
+    test("Dry run counts without writing", counts['moved'] == 30
+         and db.get_item('FOLDER#s00', 'META', consistent_read=True)['GSI1PK'] == 'PARENT#ROOT')
+    counts = migrate_gsi1_shards.migrate(workers=4)
+    keys = {db.get_item(f'FOLDER#s{i:02d}', 'META', consistent_read=True)['GSI1PK']
+            for i in range(30)}
+    test("Migration spreads items over every shard",
+         counts['moved'] == 30 and keys == {f'PARENT#ROOT#{n}' for n in range(4)}, f"got {keys}")
+    test("Migration is idempotent", migrate_gsi1_shards.migrate()['moved'] == 0)
+
+    db.put_item(folder('s30'))
+    expected.append('FOLDER#s30')
+    test("query merges shards in sort-key order",
+         [i['PK'] for i in db.query('PARENT#ROOT', index_name='GSI1')] == expected)
+    test("iter_query merges in reverse and honours limit",
+         [i['PK'] for i in db.iter_query('PARENT#ROOT', index_name='GSI1',
+                                          scan_forward=False, limit=5)] == expected[::-1][:5])
+    test("sk_begins_with applies to every shard",
+         len(db.query('PARENT#ROOT', sk_begins_with='FOLDER#s1', index_name='GSI1')) == 10)
+
+    seen, token, pages = [], None, 0
+    while True:
+        page, token = db.query_page('PARENT#ROOT', index_name='GSI1', limit=7, start_token=token)
+        seen.extend(i['PK'] for i in page)
+        pages += 1
+        if not token:
+            break
+    test("query_page walks every shard once, in order", seen == expected and pages == 5,
+         f"got {pages} pages")
+    page, token = db.query_page('PARENT#ROOT', index_name='GSI1', limit=40,
+                                filter_expression=Attr('name').begins_with('s'))
+    test("A page holding everything has no token", len(page) == 31 and token is None)
+    test("Unsharded tokens are rejected for sharded keys",
+         raises(lambda: db.query_page('PARENT#ROOT', index_name='GSI1',
+                                      start_token=db.encode_token({'PK': 'x'})), 'Invalid'))
+
+    db.configure_shards('PARENT#ROOT=2')
+    counts = migrate_gsi1_shards.migrate(previous_spec='PARENT#ROOT=4')
+    test("Changing the shard count re-spreads items with --previous",
+         counts['moved'] > 0 and {i['GSI1PK'] for i in db.query('PARENT#ROOT', index_name='GSI1')}
+         <= {'PARENT#ROOT#0', 'PARENT#ROOT#1'})
+    db.configure_shards('')
+
+    # ============================================================
+    # Session cache
+    # ============================================================
+    print("\n=== session cache ===")
+
+    def session(token, username, ttl=4102444800):
+        return {'PK': f'SESSION#{token}', 'SK': 'SESSION', 'GSI1PK': f'USER#{username}',
+                'GSI1SK': f'SESSION#{token}', 'username': username, 'role': 'Reader',
+                'ttl': ttl}
+
+    db.use_backend(MemoryDynamoDB())
+    db.put_item(session('t1', 'alice'))
+    db.put_item(session('t2', 'bob'))
+    db.put_item(session('old', 'carol', ttl=1))
+    db.begin_request()
+    test("Cache loads a session", session_cache.get('t1')['username'] == 'alice')
+    session_cache.get('t2')
+    test("Expired sessions are rejected", session_cache.get('old') is None)
+    test("Unknown tokens are rejected", session_cache.get('nope') is None)
+    db.begin_request()
+    session_cache.get('t1')
+    session_cache.get('nope')
+    test("Warm hits and known-bad tokens cost nothing",
+         db.consumed_capacity() == {}, f"got {db.consumed_capacity()}")
+
+    # Another container revokes alice: seen once the counters are re-read
+    db.update_item('USER#alice', session_cache.REVOCATION_SK, 'ADD epoch :one', {':one': 1})
+    db.delete_item('SESSION#t1', 'SESSION')
+    test("Revocations wait for revalidation", session_cache.get('t1') is not None)
+    for username in ('alice', 'bob'):
+        value, checked_at = session_cache._epochs[username]
+        session_cache._epochs[username] = (value, checked_at - session_cache.REVALIDATE_SECONDS)
+    db.begin_request()
+    test("Revoked user's sessions are dropped", session_cache.get('t1') is None)
+    test("Other users stay cached", session_cache.get('t2') is not None)
+    test("Revalidation reads only the users being authenticated",
+         db.consumed_capacity().get((db.TABLE_NAME, None), {}).get('read') == 3,
+         f"got {db.consumed_capacity()}")
+
+    db.begin_request()
+    session_cache.revoke_user('bob')
+    session_cache.get('t2')
+    test("revoke_user drops local entries at once",
+         db.consumed_capacity().get((db.TABLE_NAME, None), {}).get('read') == 1)
+
+    # Another container revokes erin between the session read and the counter read
+    db.put_item(session('t3', 'erin'))
+    real_get_item = db.get_item
+
+    def revoke_after_read(pk, sk, **kwargs):
+        item = real_get_item(pk, sk, **kwargs)
+        if pk == 'SESSION#t3' and item:
+            db.update_item('USER#erin', session_cache.REVOCATION_SK, 'ADD epoch :one',
+                           {':one': 1})
+            db.delete_item('SESSION#t3', 'SESSION')
+        return item
+    db.get_item = revoke_after_read
+    try:
+        session_cache.get('t3')
+    finally:
+        db.get_item = real_get_item
+    test("A session revoked mid-read is not cached against the new counter",
+         session_cache.get('t3') is None, f"got {session_cache._cache.get('t3')}")
+
+    # ============================================================
+    # Signed session tokens
+    # ============================================================
+    print("\n=== signed tokens ===")
+
+    tokens.configure('signed', ['k1'])
+    db.begin_request()
+    token, expires_at = tokens.issue('dave', 'Reader', 60)
+    test("Issuing reads only the user's own counter",
+         db.consumed_capacity().get((db.TABLE_NAME, None), {}).get('read') == 1,
+         f"got {db.consumed_capacity()}")
+    db.begin_request()
+    tokens.verify(token)
+    test("Verifying within the revalidate interval costs nothing",
+         db.consumed_capacity() == {}, f"got {db.consumed_capacity()}")
+    claims = tokens.verify(token)
+    test("Signed token round-trips", tokens.is_signed(token) and claims
+         and claims['username'] == 'dave' and claims['role'] == 'Reader', f"got {claims}")
+    body, _, signature = token.rpartition('.')
+    forged = body[:-2] + ('A' if body[-2] != 'A' else 'B') + body[-1] + '.' + signature
+    test("Tampered payload is rejected", tokens.verify(forged) is None)
+    test("Garbage is rejected", tokens.verify('v1.%%%.!!!') is None)
+    tokens.configure('signed', ['k2', 'k1'])
+    test("Old key still verifies after rotation", tokens.verify(token) is not None)
+    tokens.configure('signed', ['k2'])
+    test("Retired key no longer verifies", tokens.verify(token) is None)
+    expired, _ = tokens.issue('dave', 'Reader', -1)
+    test("Expired token is rejected", tokens.verify(expired) is None)
+    token, _ = tokens.issue('dave', 'Reader', 60)
+    session_cache.revoke_user('dave')
+    test("Revoking the user rejects the token", tokens.verify(token) is None)
+    test("Tokens minted after revocation are valid",
+         tokens.verify(tokens.issue('dave', 'Reader', 60)[0]) is not None)
+    session_cache.revoke_user('dave', forget_after=60)
+    counter = db.get_item('USER#dave', session_cache.REVOCATION_SK)
+    test("A deleted user's counter expires", counter['epoch'] == 2 and counter.get('ttl'),
+         f"got {counter}")
+    session_cache.revoke_user('dave')
+    test("A later revocation keeps the counter",
+         'ttl' not in db.get_item('USER#dave', session_cache.REVOCATION_SK))
+    tokens.configure('opaque', [])
+
+    # ============================================================
+    # Password hashing
+    # ============================================================
+    print("\n=== passwords ===")
+
+    passwords.configure(4)
+    hashed = passwords.hash_password('s3cret-pw')
+    test("Hash records the configured cost", passwords.cost(hashed) == 4, f"got {hashed}")
+    test("Correct password verifies", passwords.verify('s3cret-pw', hashed))
+    test("Wrong password fails", not passwords.verify('wrong', hashed))
+    test("Malformed hash fails closed", not passwords.verify('s3cret-pw', 'not-a-hash'))
+    test("Same cost needs no rehash", not passwords.needs_rehash(hashed))
+    passwords.configure(5)
+    test("Policy change flags a rehash", passwords.needs_rehash(hashed))
+    passwords.configure(4)
+    test("Hashes above the policy are rehashed down",
+         passwords.needs_rehash(passwords.hash_password('s3cret-pw', 5)))
+    test("Unrecognized hashes are left alone", not passwords.needs_rehash('not-a-hash'))
+    test("Old-cost hash still verifies", passwords.verify('s3cret-pw', hashed))
+    test("Calibration respects the floor and ceiling",
+         passwords.calibrate(0, min_rounds=6, max_rounds=8) == 6
+         and passwords.calibrate(10 ** 9, min_rounds=6, max_rounds=8) == 8)
+    test("Calibration can recommend below the default, down to the floor",
+         passwords.calibrate(0) == passwords.MIN_ROUNDS < passwords.DEFAULT_ROUNDS)
+    passwords.configure()
+
+    # ============================================================
+    # Effective-access sets
+    # ============================================================
+    print("\n=== access sets ===")
+
+    def assign(username, folder_id):
+        db.put_item({'PK': f'FOLDER#{folder_id}', 'SK': f'ASSIGN#{username}',
+                     'GSI1PK': f'USER#{username}', 'GSI1SK': f'ASSIGN#FOLDER#{folder_id}',
+                     'username': username, 'folder_id': folder_id})
+
+    db.use_backend(MemoryDynamoDB())
+    for fid, parent in (('a1', 'ROOT'), ('a2', 'a1'), ('a3', 'a2'), ('b1', 'ROOT')):
+        db.put_item(folder(fid, parent))
+    backfill_folder_closure.backfill()
+    assign('erin', 'a2')
+    db.begin_request()
+    test("Set holds assigned folders and descendants",
+         access.folder_ids('erin') == {'a2', 'a3'}, f"got {access.folder_ids('erin')}")
+    db.begin_request()
+    access.folder_ids('erin')
+    reads = db.consumed_capacity().get((db.TABLE_NAME, None), {}).get('read')
+    test("A current set costs one read (plus the generation check)", reads == 2,
+         f"got {reads}")
+
+    db.put_item(folder('a4', 'a3'))
+    db.batch_put(closure.rows('a4', ['a1', 'a2', 'a3']))
+    db.begin_request()
+    test("Unbumped tree change is not seen", 'a4' not in access.folder_ids('erin'))
+    test("assigned_users finds users on the new folder's chain",
+         access.assigned_users(['a1', 'a2', 'a3']) == {'erin'}
+         and access.assigned_users(['b1']) == set())
+    access.invalidate_many(access.assigned_users(['a1', 'a2', 'a3']))
+    db.begin_request()
+    test("Invalidating those users makes the set stale", 'a4' in access.folder_ids('erin'))
+    db.put_item(folder('a5', 'a3'))
+    db.batch_put(closure.rows('a5', ['a1', 'a2', 'a3']))
+    folder_cache.bump_generation(structural=True)
+    db.begin_request()
+    test("A structural bump still makes every set stale", 'a5' in access.folder_ids('erin'))
+    db.delete_item('FOLDER#a5', 'META')
+    db.batch_delete(closure.keys('a5', ['a1', 'a2', 'a3']))
+    access.invalidate('erin')
+
+    # GSI1 lags the assignment rows: a new assignment is not listed yet...
+    indexed = access._indexed_folder_ids
+    access._indexed_folder_ids = lambda username: {'a2'}
+    assign('erin', 'b1')
+    access.invalidate('erin', ['b1'])
+    db.begin_request()
+    test("Pending assignments count before GSI1 lists them", 'b1' in access.folder_ids('erin'))
+    access._indexed_folder_ids = indexed
+    access.invalidate('erin')
+    db.begin_request()
+    access.folder_ids('erin')
+    test("Pending IDs clear once GSI1 lists them",
+         not db.get_item('USER#erin', 'ACCESS', consistent_read=True).get('pending'))
+    # ...and a removed one is still listed
+    access._indexed_folder_ids = lambda username: {'a2', 'b1'}
+    db.delete_item('FOLDER#b1', 'ASSIGN#erin')
+    access.invalidate('erin')
+    db.begin_request()
+    test("Removed assignments GSI1 still lists are dropped",
+         'b1' not in access.folder_ids('erin'))
+    access._indexed_folder_ids = indexed
+    assign('erin', 'b1')
+    access.invalidate('erin', ['b1'])
+
+    # A rebuild that started before an assignment change must not win
+    stale = db.get_item('USER#erin', 'ACCESS', consistent_read=True)
+    db.delete_item('FOLDER#b1', 'ASSIGN#erin')
+    access.invalidate('erin')
+    access._rebuild('erin', stale, folder_cache.tree_generation())
+    db.begin_request()
+    test("Invalidation beats a racing rebuild", 'b1' not in access.folder_ids('erin'))
+
+    access.COMPRESS_BYTES, saved = 4, access.COMPRESS_BYTES
+    access.invalidate('erin')
+    access.folder_ids('erin')
+    item = db.get_item('USER#erin', 'ACCESS', consistent_read=True)
+    access.COMPRESS_BYTES = saved
+    test("Large sets are stored compressed",
+         'folder_ids_z' in item and 'folder_ids' not in item, f"got {item}")
+    db.begin_request()
+    test("Compressed sets decode", access.folder_ids('erin') == {'a2', 'a3', 'a4'})
+    test("Users without assignments get an empty set", access.folder_ids('nobody') == set())
+    assign('erin', 'a3')
+    access.invalidate('erin', ['a3'])
+    test("Top folders omit those under another assigned folder",
+         access.top_folder_ids('erin') == {'a2'}, f"got {access.top_folder_ids('erin')}")
+    db.update_item('USER#erin', 'ACCESS', 'REMOVE top_ids, top_ids_z', {})
+    test("Sets stored without top folders are rebuilt",
+         access.top_folder_ids('erin') == {'a2'}, f"got {access.top_folder_ids('erin')}")
+
+    # ============================================================
+    # Ancestor chains
+    # ============================================================
+    print("\n=== ancestor chains ===")
+
+    db.use_backend(MemoryDynamoDB())
+    db.put_item(folder('c1', name='Top'))
+    db.put_item(dict(folder('c2', 'c1', name='Mid'), ancestor_ids=['c1'], ancestor_names=['Top']))
+    db.put_item(folder('c3', 'c2', name='Leaf'))
+    db.begin_request()
+    test("Legacy folders walk up to the nearest stored chain",
+         folder_cache.ancestry(folder_cache.get('c3')) == (['c1', 'c2'], ['Top', 'Mid']))
+    test("Stored chains are used as-is",
+         folder_cache.ancestry(folder_cache.get('c2')) == (['c1'], ['Top']))
+
+    test("Backfill dry run counts folders missing a chain",
+         backfill_folder_ancestors.backfill(dry_run=True) == {'folders': 3, 'updated': 2})
+    backfill_folder_ancestors.backfill(workers=2)
+    leaf = db.get_item('FOLDER#c3', 'META', consistent_read=True)
+    test("Backfill stores chains", leaf['ancestor_ids'] == ['c1', 'c2']
+         and leaf['ancestor_names'] == ['Top', 'Mid'], f"got {leaf}")
+    test("Backfill is idempotent", backfill_folder_ancestors.backfill()['updated'] == 0)
+
+    # ============================================================
+    # Closure table
+    # ============================================================
+    print("\n=== closure table ===")
+
+    db.use_backend(MemoryDynamoDB())
+    for fid, parent in (('d1', 'ROOT'), ('d2', 'd1'), ('d3', 'd2'), ('d4', 'd1'), ('e1', 'ROOT')):
+        db.put_item(folder(fid, parent))
+    test("Closure backfill dry run counts missing rows",
+         backfill_folder_closure.backfill(dry_run=True)
+         == {'folders': 5, 'written': 9, 'deleted': 0} and not closure.migrated())
+    backfill_folder_closure.backfill()
+    test("Closure backfill records the migration", closure.migrated())
+    test("Descendants come back shallowest first",
+         closure.descendant_ids('d1') == ['d2', 'd4', 'd3'], f"got {closure.descendant_ids('d1')}")
+    test("ROOT covers the whole tree",
+         sorted(closure.descendant_ids('ROOT')) == ['d1', 'd2', 'd3', 'd4', 'e1'])
+    test("max_depth stops early",
+         list(closure.iter_descendants('d1', max_depth=1)) == [('d2', 1), ('d4', 1)])
+    test("Leaves have no descendants", closure.descendant_ids('d3') == [])
+    test("Rows and keys agree",
+         [{'PK': r['PK'], 'SK': r['SK']} for r in closure.rows('d3', ['d1', 'd2'])]
+         == closure.keys('d3', ['d1', 'd2']))
+
+    db.delete_item('FOLDER#d4', 'META')
+    db.put_item(folder('d5', 'd3'))
+    test("Closure backfill repairs drift",
+         backfill_folder_closure.backfill() == {'folders': 5, 'written': 4, 'deleted': 2})
+    test("Repaired rows are queryable",
+         closure.descendant_ids('d1') == ['d2', 'd3', 'd5'], f"got {closure.descendant_ids('d1')}")
+    test("Closure backfill is idempotent",
+         backfill_folder_closure.backfill() == {'folders': 5, 'written': 0, 'deleted': 0})
+
+    db.begin_request()
+    tree = list(closure.iter_tree())
+    test("The tree is one query of ROOT rows",
+         [(r['folder_id'], r['parent_id']) for r in tree]
+         == [('d1', 'ROOT'), ('e1', 'ROOT'), ('d2', 'd1'), ('d3', 'd2'), ('d5', 'd3')]
+         and db.consumed_capacity().get((db.TABLE_NAME, None), {}).get('read') <= 1,
+         f"got {tree}")
+    closure.rename('d3', ['d1', 'd2'], 'Renamed')
+    closure.rename('gone', ['d1'], 'Nothing')
+    test("rename updates the ROOT row only where it exists",
+         {r['folder_id']: r['name'] for r in closure.iter_tree()}['d3'] == 'Renamed'
+         and 'gone' not in {r['folder_id'] for r in closure.iter_tree()})
+    test("Closure backfill restores the snapshot from META",
+         backfill_folder_closure.backfill()['written'] == 1
+         and {r['folder_id']: r['name'] for r in closure.iter_tree()}['d3'] == 'd3')
+
+    # ============================================================
+    # Level-synchronous traversal
+    # ============================================================
+    print("\n=== traversal ===")
+
+    db.use_backend(MemoryDynamoDB())
+    for fid, parent in (('t1', 'ROOT'), ('t2', 't1'), ('t3', 't1'), ('t4', 't2'),
+                        ('t5', 't3'), ('t6', 't3'), ('t7', 't6')):
+        db.put_item(folder(fid, parent))
+    found, stats = traversal.descendants('t1')
+    test("Traversal finds the subtree level by level",
+         found == [('t2', 1), ('t3', 1), ('t4', 2), ('t5', 2), ('t6', 2), ('t7', 3)],
+         f"got {found}")
+    test("Traversal reports the tree's shape",
+         stats == {'levels': 3, 'visited': 6, 'queries': 7, 'widths': [2, 3, 1],
+                   'max_fanout': 2}, f"got {stats}")
+    found, _ = traversal.walk(['a', 'b'], {'a': ['c', 'b'], 'b': ['c'], 'c': ['a']}.get)
+    test("Traversal visits each node once", found == [('c', 1)], f"got {found}")
+    test("max_depth stops the walk",
+         traversal.walk(['t1'], traversal.child_folder_ids, max_depth=1)[0]
+         == [('t2', 1), ('t3', 1)])
+
+    def slow_children(node):
+        time.sleep(0.05)
+        return [f'{node}.{i}' for i in range(10)] if '.' not in node else []
+
+    started = time.time()
+    found, stats = traversal.walk(['n'], slow_children, max_workers=16)
+    test("A level's expansions run concurrently",
+         stats['queries'] == 11 and time.time() - started < 0.3,
+         f"{stats['queries']} queries in {time.time() - started:.2f}s")
+
+    tables = set()
+
+    def table_children(node):
+        tables.add(db._get_table().meta.client)
+        return slow_children(node)
+    with boto3_backend():
+        traversal.walk(['n'], table_children, max_workers=16)
+    test("Concurrent expansions query through separate Tables", len(tables) >= 10,
+         f"got {len(tables)}")
+    for fid, parent in (('t1', 'ROOT'), ('t2', 't1'), ('t3', 't1'), ('t4', 't2'),
+                        ('t5', 't3'), ('t6', 't3'), ('t7', 't6')):
+        db.put_item(folder(fid, parent))
+
+    test("subtree_ids walks GSI1 when a folder has no closure rows",
+         closure.subtree_ids('t3', ['t1']) == ['t5', 't6', 't7'])
+    backfill_folder_closure.backfill()
+    db.delete_item('FOLDER#t7', 'META')
+    test("subtree_ids reads the closure rows once they exist",
+         closure.subtree_ids('t3', ['t1']) == ['t5', 't6', 't7'])
+    db.put_item(folder('t8', 't5'))
+    test("verify adds folders the closure rows miss",
+         closure.subtree_ids('t3', ['t1']) == ['t5', 't6', 't7']
+         and closure.subtree_ids('t3', ['t1'], verify=True) == ['t5', 't6', 't7', 't8'],
+         f"got {closure.subtree_ids('t3', ['t1'], verify=True)}")
+
+    # ============================================================
+    # Child listings
+    # ============================================================
+    print("\n=== child listings ===")
+
+    db.use_backend(MemoryDynamoDB())
+    for fid, parent, name in (('f1', 'ROOT', 'zeta'), ('f2', 'ROOT', 'alpha'),
+                              ('f3', 'f1', 'child'), ('f4', 'f1', 'another')):
+        db.put_item(folder(fid, parent, name))
+    test("Children backfill dry run counts rows",
+         backfill_folder_children.backfill(dry_run=True)
+         == {'folders': 4, 'written': 4, 'deleted': 0, 'duplicates': []}
+         and not folder_children.migrated())
+    test("Siblings without rows are checked over GSI1",
+         folder_children.legacy_conflict('ROOT', 'alpha')
+         and not folder_children.legacy_conflict('ROOT', 'alpha', 'f2')
+         and not folder_children.legacy_conflict('f1', 'alpha'))
+    backfill_folder_children.backfill()
+    test("Backfill records the migration", folder_children.migrated())
+    rows, token = folder_children.page('ROOT')
+    test("Listing is sorted by name with child counts",
+         [(r['name'], r['child_count']) for r in rows] == [('alpha', 0), ('zeta', 2)]
+         and token is None, f"got {rows}")
+    db.transact_write(folder_children.rename_actions(folder('f1', name='zeta'), 'omega'))
+    rows, _ = folder_children.page('ROOT')
+    test("rename moves the row and keeps the count",
+         [(r['name'], r['child_count']) for r in rows] == [('alpha', 0), ('omega', 2)])
+    cancelled = raises(lambda: db.transact_write(
+        folder_children.rename_actions(folder('f2', name='alpha'), 'omega')), 'ConditionalCheckFailed')
+    test("rename to a sibling's name is cancelled", cancelled)
+    try:
+        db.transact_write([folder_children.claim(folder('f5', name='cafe\u0301'))])
+        db.transact_write([folder_children.claim(folder('f6', name='caf\u00e9'))])
+        reasons = []
+    except Exception as e:
+        reasons = db.cancellation_reasons(e)
+    test("Names are claimed in normalized form", reasons == ['ConditionalCheckFailed'],
+         f"got {reasons}")
+    claimed = folder_children.key(folder('f5', name='caf\u00e9'))
+    db.delete_item(claimed['PK'], claimed['SK'])
+    folder_children.adjust_count(folder('f2', name='alpha'), 1)
+    folder_children.adjust_count(folder('gone', name='gone'), 1)
+    rows, _ = folder_children.page('ROOT')
+    test("adjust_count only touches existing rows",
+         [r['child_count'] for r in rows] == [1, 2] and len(rows) == 2, f"got {rows}")
+    test("Children backfill repairs drift",
+         backfill_folder_children.backfill()
+         == {'folders': 4, 'written': 2, 'deleted': 1, 'duplicates': []})
+    rows, _ = folder_children.page('ROOT', limit=1)
+    test("Pages honour the limit", [r['name'] for r in rows] == ['alpha'])
+
+    legacy = folder('f7', 'f1', 'cafe\u0301')
+    db.put_item(legacy)
+    db.put_item(dict(folder_children.row(legacy), SK='NAME#cafe\u0301'))
+    folder_children.adjust_count(legacy, 1)
+    db.transact_write(folder_children.rename_actions(legacy, 'tea'))
+    rows, _ = folder_children.page('f1')
+    test("Rows under an unnormalized name are counted and renamed",
+         [(r['name'], r['child_count']) for r in rows]
+         == [('another', 0), ('child', 0), ('tea', 1)], f"got {rows}")
+    db.put_item(dict(folder_children.row(legacy), SK='NAME#cafe\u0301'))
+    db.put_item(folder('f8', 'f1', 'caf\u00e9'))
+    result = backfill_folder_children.backfill()
+    test("Backfill reports names that normalize alike and rekeys the rest",
+         result['duplicates'] in ([('f7', 'f8')], [('f8', 'f7')])
+         and db.get_item(folder_children.MIGRATION_PK, folder_children.MIGRATION_SK) is None
+         and db.get_item(folder_children.key(legacy)['PK'], 'NAME#cafe\u0301') is None,
+         f"got {result}")
+
+    # ============================================================
+    # Rate limiting
+    # ============================================================
+    print("\n=== rate limiting ===")
+
+    db.use_backend(MemoryDynamoDB())
+    test("Rules parse roles and routes", rate_limit.parse_limits(
+        'Reader=1/2, GET /files/search=3, Admin:GET /users=4/8') == {
+            ('Reader', '*'): (1.0, 2.0), ('*', 'GET /files/search'): (3.0, 3.0),
+            ('Admin', 'GET /users'): (4.0, 8.0)})
+    try:
+        rate_limit.parse_limits('Reader=fast')
+        test("Bad rules are rejected", False)
+    except ValueError:
+        test("Bad rules are rejected", True)
+
+    rate_limit.configure('Reader=0.001/2,GET /files/search=0.001/1')
+    test("Burst is allowed", [rate_limit.check('rita', 'Reader', 'GET /folders')
+                              for _ in range(2)] == [0, 0])
+    wait = rate_limit.check('rita', 'Reader', 'GET /folders')
+    test("Empty bucket refuses with a wait", wait > 0, f"got {wait}")
+    test("Refused requests spend nothing",
+         rate_limit.check('rita', 'Reader', 'GET /folders') <= wait)
+    test("Buckets are per user", rate_limit.check('rob', 'Reader', 'GET /folders') == 0)
+    test("Roles without a rule are unlimited",
+         all(rate_limit.check('ada', 'Admin', 'GET /folders') == 0 for _ in range(5)))
+    test("Route rules apply to every role",
+         rate_limit.check('ada', 'Admin', 'GET /files/search') == 0
+         and rate_limit.check('ada', 'Admin', 'GET /files/search') > 0)
+    test("Retry-After is whole seconds, at least 1",
+         rate_limit.retry_after(0.2) == '1' and rate_limit.retry_after(2.5) == '3')
+    refused = error('Too many requests', 429, headers={'Retry-After': '3'})
+    test("error() merges extra headers",
+         refused['headers']['Retry-After'] == '3'
+         and refused['headers']['Access-Control-Allow-Origin'] == '*')
+    body = {1: 'a', 'name': 'caf\u00e9', 'n': 2}
+    encoded = response.to_json(body)
+    stdlib = response.json.dumps(body, cls=response.DecimalEncoder, separators=(',', ':'),
+                                 ensure_ascii=False)
+    test("to_json coerces non-str keys like the stdlib encoder", encoded == stdlib,
+         f"got {encoded} vs {stdlib}")
+    test("error() goes through to_json",
+         error('caf\u00e9')['body'] == response.to_json({'error': 'caf\u00e9'}))
+
+    first = aws.get_client('s3', endpoint_url='http://127.0.0.1:9', access_key='k', secret_key='s1')
+    test("Clients are cached per credential set",
+         aws.get_client('s3', endpoint_url='http://127.0.0.1:9', access_key='k',
+                        secret_key='s1') is first
+         and aws.get_client('s3', endpoint_url='http://127.0.0.1:9', access_key='k',
+                            secret_key='s2') is not first)
+
+    def thread_clients(get, workers=4):
+        """The clients behind get()'s resource on workers concurrent threads."""
+        barrier = threading.Barrier(workers)
+
+        def grab(_):
+            barrier.wait()
+            return get().meta.client
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return set(pool.map(grab, range(workers)))
+
+    def dynamodb():
+        return aws.get_resource('dynamodb', endpoint_url='http://127.0.0.1:9',
+                                access_key='k', secret_key='s1')
+    clients = thread_clients(dynamodb)
+    test("Each thread builds requests on its own resource", len(clients) == 4)
+    test("Resources of ended threads are reused", thread_clients(dynamodb) == clients)
+    with boto3_backend():
+        test("Each thread queries through its own Table",
+             len(thread_clients(db._get_table)) == 4)
+
+    # Shared counting: clear() stands in for the request landing on a new container
+    rate_limit.configure('*=0.001/2', shared=True)
+    results = []
+    for _ in range(3):
+        rate_limit.clear()
+        results.append(rate_limit.check('sam', 'Editor', 'GET /folders'))
+    test("Shared counter limits across containers", results[:2] == [0, 0] and results[2] > 0,
+         f"got {results}")
+    rate_limit.configure('', shared=False)
+    test("No rules means no limit", rate_limit.check('sam', 'Editor', 'GET /folders') == 0)
+
+    # ============================================================
+    # User directory
+    # ============================================================
+    print("\n=== user directory ===")
+
+    def profile(username, role='Reader', status='active', created_at=1700000000):
+        return {'PK': f'USER#{username}', 'SK': 'PROFILE', 'username': username,
+                'role': role, 'status': status, 'created_at': created_at}
+
+    db.use_backend(MemoryDynamoDB())
+    people = [profile('carol', created_at=3), profile('alice', 'Admin', created_at=5),
+              profile('bob', status='disabled', created_at=1), profile('alan', created_at=4)]
+    for p in people:
+        db.put_item(p)
+        db.put_item(dict(PK='FOLDER#noise', SK=f'FILE#{p["username"]}'))
+    test("Directory backfill dry run counts rows",
+         backfill_user_directory.backfill(dry_run=True) == {'users': 4, 'written': 8, 'deleted': 0})
+    backfill_user_directory.backfill()
+
+    def names(items):
+        return [item['username'] for item in items]
+
+    items, _ = user_directory.page()
+    test("All statuses merge in username order",
+         names(items) == ['alan', 'alice', 'bob', 'carol'])
+    items, _ = user_directory.page(sort='created_at', descending=True)
+    test("created_at order, newest first", names(items) == ['alice', 'alan', 'carol', 'bob'])
+    items, _ = user_directory.page(prefix='al')
+    test("Prefix is a key condition", names(items) == ['alan', 'alice'])
+    items, _ = user_directory.page(status='disabled')
+    test("Status picks one partition", names(items) == ['bob'])
+
+    pages = []
+    token = None
+    db.begin_request()
+    while True:
+        items, token = user_directory.page(limit=3, start_token=token)
+        pages.append(names(items))
+        if not token:
+            break
+    test("Pages resume across partitions",
+         pages == [['alan', 'alice', 'bob'], ['carol']], f"got {pages}")
+    reads = db.consumed_capacity().get((db.TABLE_NAME, None), {}).get('read')
+    test("Paging reads only directory rows", reads <= 4, f"got {reads}")
+
+    user_directory.replace(people[2], dict(people[2], status='active', role='Uploader'))
+    items, _ = user_directory.page(status='active')
+    test("replace moves a user between partitions",
+         names(items) == ['alan', 'alice', 'bob', 'carol']
+         and list(user_directory.page(status='disabled')[0]) == [])
+    test("Directory backfill repairs drift",
+         backfill_user_directory.backfill() == {'users': 4, 'written': 2, 'deleted': 2})
+    test("Directory backfill is idempotent",
+         backfill_user_directory.backfill() == {'users': 4, 'written': 0, 'deleted': 0})
+
+    print(f"\n{'='*50}")
+    print(f"Results: {passed} passed, {failed} failed out of {passed + failed}")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed.")
+
+
+if __name__ == '__main__':
+    main()